@@ -0,0 +1,308 @@
+import time
+import logging
+from flask import Blueprint, request, jsonify, current_app, g, abort, stream_with_context
+from sqlalchemy import delete, insert, update
+from models import db, Game, validate_game
+from image_jobs import IMAGE_PENDING, JOB_FETCH_IMAGE
+from export import EXPORT_FORMATS, EXPORT_IMAGE_MODES, export_lines
+from pagination import InvalidCursor, cursor_types, decode_cursor, keyset_page
+from page_cache import invalidate_pages
+from catalogue_events import publish as publish_catalogue_change
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+logger = logging.getLogger(__name__)
+
+def _game_json(game):
+    image_url = None
+    if game.image_hash:
+        image_url = current_app.jinja_env.globals['image_url'](game)
+    return {
+        'id': game.id,
+        'title': game.title,
+        'genre': game.genre,
+        'platform': game.platform,
+        'image_url': image_url,
+        'image_status': game.image_status
+    }
+
+
+def _game_query():
+    return db.session.query(Game.id, Game.title, Game.genre, Game.platform, Game.image_hash, Game.image_status)
+
+
+def _parse_ids(raw):
+    """Parse '1,2,3' into a de-duplicated list of ints, or abort with 400"""
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        abort(400, description="ids must be a comma-separated list of integers")
+    return list(dict.fromkeys(ids))
+
+
+def _bulk_items(key):
+    """The JSON array of a bulk request (a bare array or {key: [...]}), capped at API_BULK_MAX_ITEMS"""
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get(key)
+    if not isinstance(payload, list):
+        abort(400, description=f"Expected a JSON array or an object with a '{key}' array")
+    if len(payload) > current_app.config['API_BULK_MAX_ITEMS']:
+        abort(413, description=f"At most {current_app.config['API_BULK_MAX_ITEMS']} items per request")
+    return payload
+
+
+def _audit(operation, started, results, **fields):
+    """One audit record per bulk call instead of one per row"""
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    logger.info("Bulk game API call", extra={
+        'extra_fields': {
+            'request_id': getattr(g, 'request_id', 'unknown'),
+            'operation': operation,
+            'items_count': len(results),
+            'status_counts': counts,
+            'game_ids': [result['id'] for result in results if result.get('id') is not None],
+            'duration_ms': round((time.time() - started) * 1000, 2),
+            **fields
+        }
+    })
+    return counts
+
+
+@api_bp.route('/games', methods=['GET'])
+def list_games():
+    """Multi-get with ?ids=1,2,3, otherwise one keyset-paginated page of the catalogue"""
+    if request.args.get('ids'):
+        ids = _parse_ids(request.args['ids'])
+        if len(ids) > current_app.config['API_BULK_MAX_ITEMS']:
+            abort(413, description=f"At most {current_app.config['API_BULK_MAX_ITEMS']} ids per request")
+        games = {game.id: game for game in _game_query().filter(Game.id.in_(ids))}
+        return jsonify({
+            'games': [_game_json(games[game_id]) for game_id in ids if game_id in games],
+            'missing_ids': [game_id for game_id in ids if game_id not in games]
+        })
+
+    after, before = request.args.get('after'), request.args.get('before')
+    try:
+        for cursor in (after, before):
+            if cursor is not None:
+                decode_cursor(cursor, cursor_types((Game.title, Game.id)))
+    except InvalidCursor:
+        abort(400, description="Invalid cursor")
+    limit = min(request.args.get('limit', current_app.config['GAMES_PAGE_SIZE'], type=int) or 1,
+                current_app.config['API_BULK_MAX_ITEMS'])
+    page = keyset_page(_game_query(), (Game.title, Game.id), limit, after=after, before=before)
+    return jsonify({
+        'games': [_game_json(game) for game in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
+
+@api_bp.route('/games/export', methods=['GET'])
+def export_games():
+    """Stream the whole catalogue as NDJSON or CSV, optionally with image hashes or URLs (never bytes)"""
+    fmt = request.args.get('format', 'ndjson')
+    images = request.args.get('images', 'none')
+    if fmt not in EXPORT_FORMATS:
+        abort(400, description=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if images not in EXPORT_IMAGE_MODES:
+        abort(400, description=f"images must be one of {', '.join(EXPORT_IMAGE_MODES)}")
+    response = current_app.response_class(
+        stream_with_context(export_lines(fmt, images, batch_size=current_app.config['EXPORT_BATCH_SIZE'])),
+        mimetype=EXPORT_FORMATS[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=games.{fmt}'
+    return response
+
+
+@api_bp.route('/games/<int:id>', methods=['GET'])
+def get_game(id):
+    game = _game_query().filter(Game.id == id).first()
+    if game is None:
+        abort(404)
+    return jsonify(_game_json(game))
+
+
+@api_bp.route('/games', methods=['POST'])
+def create_games():
+    """Insert an array of games with one multi-row INSERT in a single transaction"""
+    started = time.time()
+    items = _bulk_items('games')
+    results = [None] * len(items)
+    rows, row_indexes, image_urls = [], [], []
+    for index, item in enumerate(items):
+        values, image_url, error = validate_game(item)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+            continue
+        values['image_status'] = IMAGE_PENDING if image_url else None
+        rows.append(values)
+        row_indexes.append(index)
+        image_urls.append(image_url)
+
+    if rows:
+        try:
+            # One column set for every row, so PostgreSQL sends batched multi-row INSERT ... RETURNING;
+            # SQLite cannot order multi-row RETURNING and runs the rows one by one in the same transaction
+            game_table = Game.__table__
+            ids = db.session.scalars(
+                insert(game_table).returning(game_table.c.id, sort_by_parameter_order=True), rows
+            ).all()
+            # Image URLs (remote or data:) are processed by the image job queue
+            current_app.image_jobs.enqueue_many(
+                (game_id, JOB_FETCH_IMAGE, image_url)
+                for game_id, image_url in zip(ids, image_urls) if image_url
+            )
+            publish_catalogue_change('bulk')
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Bulk game insert failed", extra={
+                'extra_fields': {
+                    'request_id': getattr(g, 'request_id', 'unknown'),
+                    'operation': 'api_bulk_create_error',
+                    'items_count': len(rows),
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+            return jsonify({'error': 'Could not create games'}), 500
+
+        for game_id, index, values in zip(ids, row_indexes, rows):
+            current_app.games_summary.game_added(Game(id=game_id, **values))
+            results[index] = {'index': index, 'status': 'created', 'id': game_id}
+        invalidate_pages()
+        current_app.image_jobs.notify()
+
+    counts = _audit('api_bulk_create', started, results)
+    return jsonify({'results': results, 'counts': counts}), 201 if counts.get('created') == len(items) else 200
+
+
+@api_bp.route('/games', methods=['PATCH'])
+def update_games():
+    """Update an array of games by id with one executemany UPDATE in a single transaction"""
+    started = time.time()
+    items = _bulk_items('games')
+    results = [None] * len(items)
+    candidates = []
+    for index, item in enumerate(items):
+        values, image_url, error = validate_game(item, partial=True)
+        game_id = item.get('id') if isinstance(item, dict) else None
+        if error is None and (not isinstance(game_id, int) or isinstance(game_id, bool)):
+            error = "'id' must be an integer"
+        if error is None and not values and not image_url:
+            error = 'nothing to update'
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'id': game_id, 'error': error}
+            continue
+        candidates.append((index, game_id, values, image_url))
+
+    existing = set()
+    if candidates:
+        existing = {row.id for row in db.session.query(Game.id).filter(
+            Game.id.in_({game_id for _, game_id, _, _ in candidates}))}
+    rows, updated, jobs = [], [], []
+    for index, game_id, values, image_url in candidates:
+        if game_id not in existing:
+            results[index] = {'index': index, 'status': 'not_found', 'id': game_id}
+            continue
+        if image_url:
+            values['image_status'] = IMAGE_PENDING
+            jobs.append((game_id, JOB_FETCH_IMAGE, image_url))
+        rows.append({'id': game_id, **values})
+        updated.append(index)
+
+    if rows:
+        try:
+            # ORM bulk UPDATE by primary key; rows are grouped by the set of columns they change
+            db.session.execute(update(Game), rows)
+            current_app.image_jobs.enqueue_many(jobs)
+            publish_catalogue_change('bulk')
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Bulk game update failed", extra={
+                'extra_fields': {
+                    'request_id': getattr(g, 'request_id', 'unknown'),
+                    'operation': 'api_bulk_update_error',
+                    'items_count': len(rows),
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+            return jsonify({'error': 'Could not update games'}), 500
+
+        changed = {row.id: row for row in db.session.query(Game.id, Game.title, Game.genre, Game.platform)
+                   .filter(Game.id.in_([row['id'] for row in rows]))}
+        for game in changed.values():
+            current_app.games_summary.game_updated(game)
+        for index, row in zip(updated, rows):
+            results[index] = {'index': index, 'status': 'updated', 'id': row['id']}
+        invalidate_pages()
+        current_app.image_jobs.notify()
+
+    counts = _audit('api_bulk_update', started, results)
+    return jsonify({'results': results, 'counts': counts})
+
+
+@api_bp.route('/games', methods=['DELETE'])
+def delete_games():
+    """Delete games listed in ?ids= or a JSON array of ids with one DELETE statement"""
+    from routes import release_image_blob
+
+    started = time.time()
+    if request.args.get('ids'):
+        ids = _parse_ids(request.args['ids'])
+        if len(ids) > current_app.config['API_BULK_MAX_ITEMS']:
+            abort(413, description=f"At most {current_app.config['API_BULK_MAX_ITEMS']} ids per request")
+    else:
+        ids = _bulk_items('ids')
+        if not all(isinstance(game_id, int) and not isinstance(game_id, bool) for game_id in ids):
+            abort(400, description="ids must be integers")
+        ids = list(dict.fromkeys(ids))
+
+    image_hashes = {}
+    try:
+        if ids:
+            image_hashes = {row.id: row.image_hash for row in db.session.query(Game.id, Game.image_hash)
+                            .filter(Game.id.in_(ids))}
+            db.session.execute(delete(Game).where(Game.id.in_(list(image_hashes))))
+            if image_hashes:
+                publish_catalogue_change('bulk')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Bulk game delete failed", extra={
+            'extra_fields': {
+                'request_id': getattr(g, 'request_id', 'unknown'),
+                'operation': 'api_bulk_delete_error',
+                'items_count': len(ids),
+                'error_type': type(e).__name__,
+                'error_message': str(e)
+            }
+        })
+        return jsonify({'error': 'Could not delete games'}), 500
+
+    results = []
+    for index, game_id in enumerate(ids):
+        if game_id in image_hashes:
+            current_app.games_summary.game_removed(game_id)
+            results.append({'index': index, 'status': 'deleted', 'id': game_id})
+        else:
+            results.append({'index': index, 'status': 'not_found', 'id': game_id})
+    if image_hashes:
+        invalidate_pages()
+    for image_hash in set(image_hashes.values()):
+        release_image_blob(image_hash)
+
+    counts = _audit('api_bulk_delete', started, results)
+    return jsonify({'results': results, 'counts': counts})
+
+
+@api_bp.errorhandler(400)
+@api_bp.errorhandler(404)
+@api_bp.errorhandler(413)
+def api_error(error):
+    return jsonify({'error': error.description}), error.code
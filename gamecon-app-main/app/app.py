@@ -1,81 +1,72 @@
 import os
 import logging
 import time
-import json
 import uuid
-from flask import Flask, request, g
+from flask import Flask, request, g, current_app
 from config import Config
-from models import db
-from routes import bp
+from models import db, upgrade_schema
+from routes import bp, health_report
+from api import api_bp
+from probes import PROBE_ENDPOINTS, PROBE_PATHS, CachedCheck, check_readiness, probes_bp
 from prometheus_flask_exporter import PrometheusMetrics
-from prometheus_client import Counter, Histogram, Gauge
-
-class JSONFormatter(logging.Formatter):
-    """Custom JSON formatter for structured logging"""
-    
-    def format(self, record):
-        log_entry = {
-            'timestamp': self.formatTime(record, self.datetimeformat),
-            'level': record.levelname,
-            'logger': record.name,
-            'message': record.getMessage(),
-            'module': record.module,
-            'function': record.funcName,
-            'line': record.lineno,
-        }
-        
-        # Add request context if available
-        if hasattr(g, 'request_id'):
-            log_entry['request_id'] = g.request_id
-            
-        if request:
-            try:
-                log_entry.update({
-                    'http_method': request.method,
-                    'http_url': request.url,
-                    'http_path': request.path,
-                    'http_query_string': request.query_string.decode('utf-8'),
-                    'http_user_agent': request.headers.get('User-Agent', ''),
-                    'http_remote_addr': request.remote_addr,
-                    'http_referrer': request.headers.get('Referer', ''),
-                })
-            except RuntimeError:
-                # Outside of request context
-                pass
-        
-        # Add exception info if present
-        if record.exc_info:
-            log_entry['exception'] = self.formatException(record.exc_info)
-            
-        # Add extra fields
-        if hasattr(record, 'extra_fields'):
-            log_entry.update(record.extra_fields)
-            
-        return json.dumps(log_entry, ensure_ascii=False)
+from prometheus_client import Counter, Histogram, Gauge, REGISTRY
+from app_state import GamesSummaryCache, empty_games_summary
+from log_pipeline import create_batching_handler
+from blob_store import create_blob_store
+from http_client import create_image_http_client
+from page_cache import create_page_cache
+from catalogue_events import CatalogueEvents, ensure_catalogue_state
+from image_jobs import ImageJobQueue
+from commands import register_commands
+from search import install_search_indexes
+from image_pipeline import choose_rendition
+from db_pool import engine_options, instrument_pool, prewarm_pool
+from db_routing import REPLICA_BIND, install_read_routing
+from sql_instrumentation import install_sql_instrumentation
+from request_phases import install_request_phases, request_phase
+from profiling import create_profiler, profiling_bp
+from metrics_multiprocess import multiprocess_dir, create_registry as create_metrics_registry
+from log_policy import LogSamplingFilter, parse_sample_rates, DEFAULT_SAMPLE_RATES
+from log_format import JSONFormatter
 
 def setup_logging():
     """Setup structured logging for Kibana"""
     log_level_str = os.environ.get('LOG_LEVEL', 'INFO').upper()
     log_level = getattr(logging, log_level_str, logging.INFO)
     
-    # Clear existing handlers
-    logging.getLogger().handlers.clear()
+    # Close and remove existing handlers, so a replaced batching handler flushes and stops its writer thread
+    root_logger = logging.getLogger()
+    for old_handler in root_logger.handlers[:]:
+        root_logger.removeHandler(old_handler)
+        old_handler.close()
     
-    # Create handler
-    handler = logging.StreamHandler()
+    # Create handler: either write on the calling thread, or enqueue and let a
+    # background writer format and flush records to stdout in batches
+    log_async = os.environ.get('LOG_ASYNC', 'false').lower() == 'true'
+    if log_async:
+        handler = create_batching_handler()
+    else:
+        handler = logging.StreamHandler()
     
     # Use JSON formatter for production, simple for development
     if os.environ.get('ENVIRONMENT') == 'production':
-        formatter = JSONFormatter()
+        formatter = JSONFormatter(field_max_bytes=int(os.environ.get('LOG_FIELD_MAX_BYTES', '2048')))
     else:
         formatter = logging.Formatter(
             '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
         )
     
     handler.setFormatter(formatter)
+
+    # Keep errors and slow requests, sample routine high-volume operations 1-in-N
+    sample_rates = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', DEFAULT_SAMPLE_RATES))
+    if sample_rates:
+        handler.addFilter(LogSamplingFilter(
+            sample_rates,
+            slow_request_ms=float(os.environ.get('LOG_SLOW_REQUEST_MS', '1000'))
+        ))
     
     # Configure root logger
-    root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
     root_logger.addHandler(handler)
     
@@ -85,7 +76,9 @@ def setup_logging():
         'extra_fields': {
             'log_level': log_level_str,
             'environment': os.environ.get('ENVIRONMENT', 'development'),
-            'app_name': 'gamecon'
+            'app_name': 'gamecon',
+            'log_pipeline': 'batching_queue' if log_async else 'stream',
+            'log_sample_rates': sample_rates
         }
     })
     
@@ -93,49 +86,88 @@ def setup_logging():
 
 def get_app_games_summary():
     """Get summary of games in the app for logging context"""
-    try:
-        from models import Game
-        games = Game.query.with_entities(Game.id, Game.title, Game.genre, Game.platform).all()
-        
-        summary = {
-            'total_games': len(games),
-            'game_names': [game.title for game in games],
-            'genres': list(set([game.genre for game in games])) if games else [],
-            'platforms': list(set([game.platform for game in games])) if games else [],
-            'games_detail': [
-                {
-                    'id': game.id, 
-                    'title': game.title, 
-                    'genre': game.genre, 
-                    'platform': game.platform
-                } for game in games
-            ]
-        }
-        return summary
-    except Exception as e:
-        return {
-            'total_games': 0,
-            'game_names': [],
-            'genres': [],
-            'platforms': [],
-            'games_detail': [],
-            'error': f"Could not retrieve games: {str(e)}"
-        }
+    games_summary = getattr(current_app, 'games_summary', None)
+    if games_summary is None:
+        return empty_games_summary('Games summary cache is not configured')
+    return games_summary.summary()
+
+def get_app_catalogue_state():
+    """Game count and catalogue version for per-request logs; never the O(n) summary"""
+    games_summary = getattr(current_app, 'games_summary', None)
+    if games_summary is None:
+        return {'total_games': 0, 'catalogue_version': 0}
+    return {'total_games': games_summary.total_games, 'catalogue_version': games_summary.version}
+
+def _get_or_create_metric(metric_class, name, documentation, labelnames=(), **kwargs):
+    """Reuse a collector that is already registered, e.g. when create_app() runs twice"""
+    existing = REGISTRY._names_to_collectors.get(name)
+    if existing is not None:
+        return existing
+    return metric_class(name, documentation, labelnames, **kwargs)
+
+def _response_size(response):
+    """Body size for logging without buffering file or streamed bodies"""
+    if response.content_length is not None:
+        return response.content_length
+    if response.direct_passthrough or response.is_streamed:
+        return None
+    data = response.get_data()
+    return len(data) if data else 0
 
-def create_app():
+def create_app(config_overrides=None):
     app = Flask(__name__, 
                 template_folder='../templates', 
                 static_folder='../static')
     app.config.from_object(Config)
+    if config_overrides:
+        app.config.update(config_overrides)
 
     # Setup logging
     logger = setup_logging()
 
+    # Pool sizing, recycling and pre-ping come from the DB_POOL_* settings unless overridden
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    if app.config.get('DATABASE_REPLICA_URL'):
+        app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}),
+                                          REPLICA_BIND: app.config['DATABASE_REPLICA_URL']}
     db.init_app(app)
+
+    # In-process catalogue snapshot read by the request hooks and gauges
+    app.games_summary = GamesSummaryCache(ttl=app.config['GAMES_SUMMARY_TTL'])
+
+    # Image bytes are kept outside the game table
+    app.blob_store = create_blob_store(app.config)
+
+    # Rendered catalogue pages, invalidated by every committed catalogue change
+    app.page_cache = create_page_cache(app.config)
+
+    # Catalogue changes made by other workers and replicas reach the two caches above
+    app.catalogue_events = CatalogueEvents(
+        app,
+        listen=app.config['CATALOGUE_LISTEN'],
+        check_interval=app.config['CATALOGUE_VERSION_CHECK_INTERVAL']
+    )
+
+    # Remote image URLs go through one pooled session backed by a disk cache
+    app.image_http_client = create_image_http_client(app.config)
+
+    # Remote image downloads and rendition generation run on a persistent job queue
+    app.image_jobs = ImageJobQueue(
+        app,
+        workers=app.config['IMAGE_JOB_WORKERS'],
+        poll_interval=app.config['IMAGE_JOB_POLL_INTERVAL'],
+        max_attempts=app.config['IMAGE_JOB_MAX_ATTEMPTS'],
+        lease_seconds=app.config['IMAGE_JOB_LEASE_SECONDS']
+    )
     
     # Create tables automatically instead of using migrations
     with app.app_context():
-        db.create_all()
+        instrument_pool(db.engine)
+        db.create_all(bind_key=None)  # tables live on the primary; the replica follows it
+        schema_changes = upgrade_schema()
+        search_indexes_created = install_search_indexes(db.engine)
+        app.catalogue_events.known_version = ensure_catalogue_state()
+        pool_connections_prewarmed = prewarm_pool(db.engine, app.config['DB_POOL_PREWARM'])
         
         # Get initial games summary for startup logging
         games_summary = get_app_games_summary()
@@ -144,14 +176,35 @@ def create_app():
             'extra_fields': {
                 'database_url': app.config['SQLALCHEMY_DATABASE_URI'].split('@')[1] if '@' in app.config['SQLALCHEMY_DATABASE_URI'] else 'local',
                 'operation': 'database_init',
+                'schema_columns_added': schema_changes,
+                'search_indexes_created': search_indexes_created,
+                'pool_connections_prewarmed': pool_connections_prewarmed,
                 'games_at_startup': games_summary
             }
         })
     
+    # Probes and /health re-check the database at most once per TTL, whatever the probe rate
+    app.readiness_check = CachedCheck(check_readiness, ttl=app.config['READINESS_CACHE_SECONDS'])
+    app.health_report = CachedCheck(health_report, ttl=app.config['HEALTH_CACHE_SECONDS'])
+    
+    # Per-phase request timings (installed first, so every other hook runs inside the timeline)
+    install_request_phases(app, skip_endpoints=PROBE_ENDPOINTS)
+    
+    # Read-only requests go to the read replica (registered before the request hooks below query anything)
+    app.replica_monitor = install_read_routing(app, db, skip_endpoints=PROBE_ENDPOINTS)
+    # Statements and database time per request (also registered first, so the hooks' own queries count)
+    install_sql_instrumentation(app, db, skip_endpoints=PROBE_ENDPOINTS)
+    
     # Initialize Prometheus metrics only if not testing
     if not app.config.get('TESTING', False):
-        # Initialize prometheus_flask_exporter
-        metrics = PrometheusMetrics(app)
+        # Initialize prometheus_flask_exporter; with several worker processes every
+        # process writes its samples to PROMETHEUS_MULTIPROC_DIR and /metrics merges them
+        metrics_dir = multiprocess_dir()
+        if metrics_dir:
+            metrics = PrometheusMetrics(app, registry=create_metrics_registry(metrics_dir),
+                                        excluded_paths=PROBE_PATHS)
+        else:
+            metrics = PrometheusMetrics(app, excluded_paths=PROBE_PATHS)
         
         # Add custom application info
         try:
@@ -160,29 +213,41 @@ def create_app():
             pass  # Metric already exists
         
         # Custom metrics for GameCon operations
-        app.game_operations_counter = Counter(
+        app.game_operations_counter = _get_or_create_metric(
+            Counter,
             'gamecon_game_operations_total',
             'Total game operations',
             ['operation', 'status']
         )
         
-        app.active_games_gauge = Gauge(
+        app.active_games_gauge = _get_or_create_metric(
+            Gauge,
             'gamecon_active_games_total',
-            'Total number of active games in database'
+            'Total number of active games in database',
+            # Every worker sees the same catalogue: report the freshest value, not the sum
+            multiprocess_mode='livemostrecent'
         )
         
-        app.request_duration_histogram = Histogram(
+        app.request_duration_histogram = _get_or_create_metric(
+            Histogram,
             'gamecon_request_duration_seconds',
             'Time spent processing requests',
             ['method', 'endpoint', 'status']
         )
 
-    import base64
-    @app.template_filter('b64encode')
-    def b64encode_filter(data):
-        return base64.b64encode(data).decode('utf-8')
-
     app.register_blueprint(bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(probes_bp)
+
+    # Opt-in sampling profiler; when disabled neither it nor its admin endpoints exist
+    app.profiler = create_profiler(app.config)
+    if app.profiler is not None:
+        app.register_blueprint(profiling_bp)
+
+        @app.teardown_request
+        def stop_profiling(error=None):
+            # Requests that raised never reach after_request
+            app.profiler.finish_request()
 
     # Template filter for static URL with CloudFront support
     @app.template_filter('static_url')
@@ -198,58 +263,93 @@ def create_app():
     def inject_static_url():
         return dict(static_url=lambda filename: static_url_filter(filename))
 
+    # Content-addressed image URLs, served through the CDN when configured
+    @app.template_global('image_url')
+    def image_url(game, width=None, fmt=None):
+        """Generate the cacheable image URL for a game, optionally for a display width.
+
+        With a width, the URL names the rendition's width and format, so one URL is
+        one representation (JPEG/PNG unless ``fmt='webp'``). Returns None when
+        ``fmt`` is asked for but no such rendition exists yet.
+        """
+        path = f"/games/{game.id}/image?v={game.image_hash[:16]}"
+        if width:
+            rendition = choose_rendition(getattr(game, 'image_renditions', None), width, accept_webp=fmt == 'webp')
+            if rendition is not None:
+                rendition_width, rendition_fmt = rendition[0].split('.', 1)
+                if fmt and rendition_fmt != fmt:
+                    return None
+                path += f"&w={rendition_width}&f={rendition_fmt}"
+            elif fmt:
+                return None
+            else:
+                # Renditions not built yet: the image route negotiates and the response is not cached for good
+                path += f"&w={width}"
+        cdn_domain = app.config.get('IMAGE_CDN_DOMAIN')
+        if cdn_domain:
+            return f"https://{cdn_domain}{path}"
+        return path
+
     # BEFORE REQUEST
     @app.before_request
     def before_request():
         # Generate unique request ID for tracing
         g.request_id = str(uuid.uuid4())
         g.start_time = time.time()
+        if app.profiler is not None:
+            app.profiler.start_request()
+        if request.endpoint in PROBE_ENDPOINTS:
+            # Probes must not wait on worker start-up or the catalogue poll's database round trip
+            return
+        app.image_jobs.ensure_started()
+        app.catalogue_events.ensure_started()
+        app.catalogue_events.poll_if_due()
         
         if not app.config.get('TESTING', False):
-            # Get current games context for request logging
-            with app.app_context():
+            with request_phase('logging'):
+                # Get current games context for request logging (served from the in-process snapshot)
                 games_context = get_app_games_summary()
             
-            logger.info("Request started", extra={
-                'extra_fields': {
-                    'request_id': g.request_id,
-                    'operation': 'request_start',
-                    'endpoint': request.endpoint,
-                    'content_length': request.content_length or 0,
-                    'content_type': request.content_type or '',
-                    'current_app_state': {
-                        'total_games': games_context['total_games'],
-                        'game_names': games_context['game_names'][:5],  # First 5 names to avoid too much data
-                        'has_more_games': games_context['total_games'] > 5
+                logger.info("Request started", extra={
+                    'extra_fields': {
+                        'request_id': g.request_id,
+                        'operation': 'request_start',
+                        'endpoint': request.endpoint,
+                        'content_length': request.content_length or 0,
+                        'content_type': request.content_type or '',
+                        'current_app_state': {
+                            'total_games': games_context['total_games'],
+                            'game_names': games_context['game_names'][:5],  # First 5 names to avoid too much data
+                            'has_more_games': games_context['total_games'] > 5
+                        }
                     }
-                }
-            })
+                })
 
     # AFTER REQUEST
     @app.after_request
     def after_request(response):
-        if not app.config.get('TESTING', False):
+        if not app.config.get('TESTING', False) and request.endpoint not in PROBE_ENDPOINTS:
             duration = time.time() - g.start_time if hasattr(g, 'start_time') else 0
             
-            # Get current games context for response logging
-            games_context = get_app_games_summary()
+            with request_phase('logging'):
+                # Count and version only: logging the catalogue would cost O(n) on every request
+                games_context = get_app_catalogue_state()
+                sql_stats = g.get('sql_stats')
             
-            logger.info("Request completed", extra={
-                'extra_fields': {
-                    'request_id': g.request_id if hasattr(g, 'request_id') else 'unknown',
-                    'operation': 'request_end',
-                    'status_code': response.status_code,
-                    'response_size': len(response.get_data()) if response.get_data() else 0,
-                    'duration_ms': round(duration * 1000, 2),
-                    'endpoint': request.endpoint or 'unknown',
-                    'app_state_after_request': {
-                        'total_games': games_context['total_games'],
-                        'game_names': games_context['game_names'],
-                        'unique_genres': games_context['genres'],
-                        'unique_platforms': games_context['platforms']
+                logger.info("Request completed", extra={
+                    'extra_fields': {
+                        'request_id': g.request_id if hasattr(g, 'request_id') else 'unknown',
+                        'operation': 'request_end',
+                        'status_code': response.status_code,
+                        'response_size': _response_size(response),
+                        'response_streamed': response.is_streamed,
+                        'duration_ms': round(duration * 1000, 2),
+                        'db_query_count': sql_stats.count if sql_stats else 0,
+                        'db_time_ms': sql_stats.time_ms if sql_stats else 0,
+                        'endpoint': request.endpoint or 'unknown',
+                        'app_state_after_request': games_context
                     }
-                }
-            })
+                })
             
             # Log slow requests
             if duration > 1.0:  # More than 1 second
@@ -260,10 +360,8 @@ def create_app():
                         'duration_ms': round(duration * 1000, 2),
                         'endpoint': request.endpoint or 'unknown',
                         'slow_request_threshold': 1000,
-                        'app_context_during_slow_request': {
-                            'total_games': games_context['total_games'],
-                            'game_names': games_context['game_names']
-                        }
+                        'phases_ms': g.request_timeline.phases_ms() if g.get('request_timeline') else {},
+                        'app_context_during_slow_request': games_context
                     }
                 })
             
@@ -301,10 +399,7 @@ def create_app():
                         'status_code': response.status_code,
                         'success': response.status_code < 400,
                         'app_state_during_operation': {
-                            'total_games': games_context['total_games'],
-                            'all_game_names': games_context['game_names'],
-                            'genres_in_app': games_context['genres'],
-                            'platforms_in_app': games_context['platforms'],
+                            **games_context,
                             'operation_impact': f"{operation} operation on app with {games_context['total_games']} games"
                         }
                     }
@@ -321,7 +416,7 @@ def create_app():
                             'request_id': g.request_id if hasattr(g, 'request_id') else 'unknown',
                             'operation': 'metrics_update',
                             'games_count_metric': games_context['total_games'],
-                            'current_games': games_context['game_names']
+                            'catalogue_version': games_context['catalogue_version']
                         }
                     })
                     
@@ -345,12 +440,14 @@ def create_app():
                     status=response.status_code
                 ).observe(duration)
         
+        if app.profiler is not None:
+            app.profiler.finish_request(response)
         return response
     
     # Error handlers with structured logging including game context
     @app.errorhandler(404)
     def not_found_error(error):
-        games_context = get_app_games_summary()
+        games_context = get_app_catalogue_state()
         
         logger.warning("Page not found", extra={
             'extra_fields': {
@@ -358,10 +455,7 @@ def create_app():
                 'operation': 'http_404',
                 'requested_path': request.path,
                 'error_type': '404_not_found',
-                'app_state_during_404': {
-                    'total_games': games_context['total_games'],
-                    'available_games': games_context['game_names']
-                }
+                'app_state_during_404': games_context
             }
         })
         return "Page not found", 404
@@ -399,10 +493,14 @@ def create_app():
                 }
             })
 
+    register_commands(app)
+
     return app
 
 if __name__ == "__main__":
     app = create_app()
+    # The debugger allows arbitrary code execution, so it is only enabled on request
+    debug = os.environ.get('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
     
     # Log startup state
     with app.app_context():
@@ -413,9 +511,9 @@ if __name__ == "__main__":
                 'operation': 'app_startup',
                 'startup_games_state': startup_games,
                 'environment': os.environ.get('ENVIRONMENT', 'development'),
-                'debug_mode': True,
+                'debug_mode': debug,
                 'startup_summary': f"Starting with {startup_games['total_games']} games in database"
             }
         })
     
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=debug, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,200 @@
+import time
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+def load_games_rows():
+    """Load the (id, title, genre, platform) projection of every game"""
+    from models import Game
+    games = Game.query.with_entities(Game.id, Game.title, Game.genre, Game.platform).order_by(Game.id).all()
+    return [(game.id, game.title, game.genre, game.platform) for game in games]
+
+
+def empty_games_summary(error=None):
+    """Summary used when the games table could not be read"""
+    summary = {
+        'total_games': 0,
+        'game_names': [],
+        'genres': [],
+        'platforms': [],
+        'games_detail': [],
+        'version': 0
+    }
+    if error:
+        summary['error'] = error
+    return summary
+
+
+class GamesSummaryCache:
+    """Versioned in-process snapshot of the games catalogue.
+
+    Write routes update the snapshot incrementally after they commit, so the
+    request hooks, error handlers and gauges can read it without touching the
+    database. The table is re-read only on first use and once the snapshot is
+    older than ``ttl`` seconds, which bounds drift from writes made by other
+    processes.
+    """
+
+    def __init__(self, loader=load_games_rows, ttl=60, clock=time.monotonic):
+        self._loader = loader
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.RLock()
+        # Held by the one thread reloading the table
+        self._refresh_lock = threading.Lock()
+        self._games = {}
+        self._genres = Counter()
+        self._platforms = Counter()
+        self._loaded_at = None
+        self._summary = None
+        self._error = None
+        self._version = 0
+
+    @property
+    def version(self):
+        """Counter bumped on every change to the snapshot; cheaper than summary()['version']"""
+        self._refresh_if_stale()
+        return self._version
+
+    @property
+    def total_games(self):
+        self._refresh_if_stale()
+        return len(self._games)
+
+    def summary(self):
+        """Return the summary dict for the current version, rebuilding it only after a change"""
+        self._refresh_if_stale()
+        summary = self._summary
+        if summary is None:
+            with self._lock:
+                if self._summary is None:
+                    self._summary = self._build_summary()
+                summary = self._summary
+        return summary
+
+    def refresh(self):
+        """Reload the snapshot from the database"""
+        try:
+            rows = self._loader()
+        except Exception as e:
+            with self._lock:
+                # Keep serving the previous snapshot and retry after another TTL
+                self._loaded_at = self._clock()
+                self._error = f"Could not retrieve games: {str(e)}"
+                self._summary = None
+            logger.warning("Could not refresh games summary", extra={
+                'extra_fields': {
+                    'operation': 'games_summary_refresh_error',
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+            return
+
+        games = {row[0]: (row[1], row[2], row[3]) for row in rows}
+        with self._lock:
+            self._loaded_at = self._clock()
+            self._error = None
+            if games != self._games:
+                self._games = games
+                self._genres = Counter(genre for _, genre, _ in games.values())
+                self._platforms = Counter(platform for _, _, platform in games.values())
+                self._version += 1
+            self._summary = None
+
+    def invalidate(self):
+        """Force the next read to reload the snapshot from the database"""
+        with self._lock:
+            self._loaded_at = None
+
+    def game_added(self, game):
+        """Record a committed insert"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._put(game.id, game.title, game.genre, game.platform)
+            self._changed()
+
+    def game_updated(self, game):
+        """Record a committed update"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._discard(game.id)
+            self._put(game.id, game.title, game.genre, game.platform)
+            self._changed()
+
+    def game_removed(self, game_id):
+        """Record a committed delete"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._discard(game_id)
+            self._changed()
+
+    def _stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or self._clock() - loaded_at >= self._ttl
+
+    def _refresh_if_stale(self):
+        if not self._stale():
+            return
+        # One thread reloads; once a snapshot exists the others keep serving it meanwhile.
+        # Before the first load, or after invalidate(), they wait for the reload instead.
+        if not self._refresh_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._stale():
+                self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _put(self, game_id, title, genre, platform):
+        self._games[game_id] = (title, genre, platform)
+        self._genres[genre] += 1
+        self._platforms[platform] += 1
+
+    def _discard(self, game_id):
+        previous = self._games.pop(game_id, None)
+        if previous is None:
+            return
+        _, genre, platform = previous
+        self._genres[genre] -= 1
+        if self._genres[genre] <= 0:
+            del self._genres[genre]
+        self._platforms[platform] -= 1
+        if self._platforms[platform] <= 0:
+            del self._platforms[platform]
+
+    def _changed(self):
+        self._version += 1
+        self._summary = None
+
+    def _build_summary(self):
+        if self._error and not self._games:
+            summary = empty_games_summary(self._error)
+            summary['version'] = self._version
+            return summary
+
+        ids = sorted(self._games)
+        summary = {
+            'total_games': len(ids),
+            'game_names': [self._games[game_id][0] for game_id in ids],
+            'genres': list(self._genres),
+            'platforms': list(self._platforms),
+            'games_detail': [
+                {
+                    'id': game_id,
+                    'title': self._games[game_id][0],
+                    'genre': self._games[game_id][1],
+                    'platform': self._games[game_id][2]
+                } for game_id in ids
+            ],
+            'version': self._version
+        }
+        if self._error:
+            summary['error'] = self._error
+        return summary
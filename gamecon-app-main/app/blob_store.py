@@ -0,0 +1,154 @@
+import os
+import re
+import hashlib
+import tempfile
+
+_KEY_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+def content_hash(data):
+    """Content address used as the blob key for image bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Key/value storage for image bytes kept outside the game table"""
+
+    def put(self, key, data, content_type=None):
+        raise NotImplementedError
+
+    def get(self, key):
+        """Return the stored bytes, or None if the key does not exist"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Return a readable binary file object, or None if the key does not exist"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    @staticmethod
+    def _check_key(key):
+        if not key or not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return key
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store backed by a directory on the local filesystem"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        key = self._check_key(key)
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, key, data, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def open(self, key):
+        try:
+            return open(self._path(key), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    """Blob store backed by an S3-compatible bucket (AWS S3, MinIO, ...)"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region_name=None):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("BLOB_STORE_BACKEND=s3 requires the boto3 package") from e
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self._client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region_name or None)
+        self._client_error = ClientError
+
+    def _key(self, key):
+        return self.prefix + self._check_key(key)
+
+    def _is_missing(self, error):
+        return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def put(self, key, data, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self._client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **extra)
+
+    def get(self, key):
+        body = self.open(key)
+        if body is None:
+            return None
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def open(self, key):
+        try:
+            return self._client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        except self._client_error as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def exists(self, key):
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self._client_error as e:
+            if self._is_missing(e):
+                return False
+            raise
+
+    def delete(self, key):
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def create_blob_store(config):
+    """Build the blob store selected by BLOB_STORE_BACKEND"""
+    backend = config.get('BLOB_STORE_BACKEND', 'local').lower()
+    if backend == 'local':
+        return LocalBlobStore(config['BLOB_STORE_PATH'])
+    if backend == 's3':
+        return S3BlobStore(
+            bucket=config['S3_BUCKET'],
+            prefix=config.get('S3_PREFIX', ''),
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region_name=config.get('S3_REGION')
+        )
+    raise ValueError(f"Unknown BLOB_STORE_BACKEND: {backend}")
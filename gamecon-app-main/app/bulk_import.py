@@ -0,0 +1,177 @@
+import io
+import csv
+import sys
+import contextlib
+import json
+import time
+import logging
+from sqlalchemy import insert, text
+from models import db, Game, ImageJob, validate_game
+from image_jobs import IMAGE_PENDING, JOB_FETCH_IMAGE, JOB_QUEUED
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+class ImportStats:
+    """Running totals of an import, reported as progress"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.image_jobs = 0
+        self.errors = []
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.time() - self.started
+        return round(self.imported / elapsed, 1) if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'rows_read': self.read,
+            'rows_imported': self.imported,
+            'rows_skipped': self.skipped,
+            'image_jobs_enqueued': self.image_jobs,
+            'rows_per_second': self.rows_per_second,
+            'duration_ms': round((time.time() - self.started) * 1000, 2)
+        }
+
+
+def detect_format(path):
+    """Infer the import format from a file name (stdin defaults to JSONL)"""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(stream, fmt):
+    """Yield ``(line_number, record)`` one at a time, so memory does not grow with the file"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {e}")
+
+
+def _batches(records, batch_size, stats, fetch_images):
+    """Validate records and group them into lists of (values, image_url)"""
+    batch = []
+    for line_number, record in records:
+        stats.read += 1
+        if isinstance(record, Exception):
+            error = str(record)
+        else:
+            values, image_url, error = validate_game(record, lenient=True)
+        if error:
+            stats.skipped += 1
+            if len(stats.errors) < 20:
+                stats.errors.append(f"line {line_number}: {error}")
+            continue
+        values['image_status'] = IMAGE_PENDING if fetch_images and image_url else None
+        batch.append((values, image_url if fetch_images else None))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_batch(batch, now, request_id):
+    """Load one batch with PostgreSQL COPY through a staging table that pre-assigns game ids"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for values, image_url in batch:
+        writer.writerow([values['title'], values['genre'], values['platform'], values['image_status'] or '',
+                         image_url or ''])
+    buffer.seek(0)
+
+    # Temp tables belong to one connection and the pool may hand out another one per batch
+    db.session.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS game_import ("
+        "id integer NOT NULL DEFAULT nextval(pg_get_serial_sequence('game', 'id')), "
+        "title varchar(100), genre varchar(50), platform varchar(50), image_status varchar(20), image_url text"
+        ") ON COMMIT DELETE ROWS"
+    ))
+    cursor = db.session.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY game_import (title, genre, platform, image_status, image_url) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+    db.session.execute(text(
+        "INSERT INTO game (id, title, genre, platform, image_status) "
+        "SELECT id, title, genre, platform, NULLIF(image_status, '') FROM game_import"
+    ))
+    jobs = db.session.execute(text(
+        "INSERT INTO image_job (game_id, kind, url, status, attempts, request_id, created_at, run_after) "
+        "SELECT id, :kind, image_url, :status, 0, :request_id, :now, :now FROM game_import "
+        "WHERE image_url IS NOT NULL AND image_url <> ''"
+    ), {'kind': JOB_FETCH_IMAGE, 'status': JOB_QUEUED, 'request_id': request_id, 'now': now}).rowcount
+    return jobs
+
+
+def _insert_batch(batch, now, request_id):
+    """Load one batch with executemany INSERTs (SQLite and other databases)"""
+    game_table = Game.__table__
+    plain = [values for values, image_url in batch if not image_url]
+    with_images = [(values, image_url) for values, image_url in batch if image_url]
+    if plain:
+        db.session.execute(insert(game_table), plain)
+    if not with_images:
+        return 0
+    # Job rows need the generated ids, so these rows go through INSERT ... RETURNING
+    ids = db.session.scalars(
+        insert(game_table).returning(game_table.c.id, sort_by_parameter_order=True),
+        [values for values, _ in with_images]
+    ).all()
+    db.session.execute(insert(ImageJob.__table__), [
+        {'game_id': game_id, 'kind': JOB_FETCH_IMAGE, 'url': image_url, 'status': JOB_QUEUED, 'attempts': 0,
+         'request_id': request_id, 'created_at': now, 'run_after': now}
+        for game_id, (_, image_url) in zip(ids, with_images)
+    ])
+    return len(ids)
+
+
+def import_games(records, batch_size=5000, fetch_images=False, progress=None, request_id=None):
+    """Load validated records into the game table, one transaction per batch.
+
+    PostgreSQL loads through COPY; other databases use executemany INSERTs.
+    With ``fetch_images``, rows that carry an ``image_url`` are marked pending
+    and get an image fetch job. ``progress`` is called with the running
+    ImportStats after every batch.
+    """
+    stats = ImportStats()
+    use_copy = db.engine.dialect.name == 'postgresql'
+    for batch in _batches(records, batch_size, stats, fetch_images):
+        now = time.time()
+        try:
+            if use_copy:
+                stats.image_jobs += _copy_batch(batch, now, request_id)
+            else:
+                stats.image_jobs += _insert_batch(batch, now, request_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        stats.imported += len(batch)
+        if progress is not None:
+            progress(stats)
+    return stats
+
+
+def open_import_source(path):
+    """Text stream for a file path, or stdin for '-' (left open when the ``with`` block ends)"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, newline='', encoding='utf-8')
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import select as select_module
+import socket
+import logging
+import threading
+from collections import namedtuple
+from flask import current_app, has_app_context
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event, exc, insert, select, text, update
+from models import db, CatalogueState
+from db_routing import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'gamecon_catalogue'
+STATE_ID = 1
+
+CATALOGUE_EVENTS = Counter(
+    'gamecon_catalogue_events_total',
+    'Catalogue changes of other processes applied to the local caches',
+    ['source', 'op']
+)
+CATALOGUE_EVENT_DELAY = Histogram(
+    'gamecon_catalogue_event_delay_seconds',
+    'Time from publishing a catalogue change until another process applied it',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+CATALOGUE_LISTENER_CONNECTED = Gauge(
+    'gamecon_catalogue_listener_connected',
+    'Worker processes with a live LISTEN connection',
+    multiprocess_mode='livesum'
+)
+
+GameRow = namedtuple('GameRow', ['id', 'title', 'genre', 'platform'])
+
+
+def _origin():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _version_query():
+    table = CatalogueState.__table__
+    return select(table.c.version).where(table.c.id == STATE_ID)
+
+
+def ensure_catalogue_state():
+    """Create the catalogue version row if missing and return the current version (needs an app context)"""
+    with db.engine.connect() as connection:
+        version = connection.execute(_version_query()).scalar()
+        if version is not None:
+            return version
+        try:
+            connection.execute(insert(CatalogueState.__table__).values(id=STATE_ID, version=0))
+            connection.commit()
+        except exc.IntegrityError:
+            # Another replica created it first
+            connection.rollback()
+        return connection.execute(_version_query()).scalar()
+
+
+def publish(op, game=None, game_id=None):
+    """Bump the catalogue version in the current transaction and queue a change event.
+
+    Call it just before the commit: the UPDATE holds the version row lock
+    until then. On PostgreSQL the event is sent with pg_notify(), which
+    the server delivers to listeners only when the transaction commits.
+    ``op`` is 'added', 'updated' or 'removed' for one game (pass the game),
+    'bulk' for many games, or 'image' when only a game's image changed.
+    """
+    table = CatalogueState.__table__
+    version = db.session.execute(
+        update(table).where(table.c.id == STATE_ID).values(version=table.c.version + 1).returning(table.c.version)
+    ).scalar()
+    if version is None:
+        return None
+    payload = {'v': version, 'op': op, 'origin': _origin(), 'ts': time.time()}
+    if game is not None:
+        payload['id'] = game.id
+        if op in ('added', 'updated'):
+            payload['game'] = [game.title, game.genre, game.platform]
+    elif game_id is not None:
+        payload['id'] = game_id
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                           {'channel': CHANNEL, 'payload': json.dumps(payload)})
+    db.session.info['catalogue_version'] = version
+    return version
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _published_version_committed(session):
+    version = session.info.pop('catalogue_version', None)
+    events = getattr(current_app, 'catalogue_events', None) if has_app_context() else None
+    if version is not None and events is not None:
+        events.note_local_version(version)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _published_version_rolled_back(session):
+    session.info.pop('catalogue_version', None)
+
+
+class CatalogueEvents:
+    """Keeps this process's games summary and page cache in step with writes made by other processes.
+
+    On PostgreSQL a listener thread per worker receives the NOTIFY events of
+    every replica and applies them within milliseconds. Whenever there is no
+    live listener (SQLite, connection lost), requests compare the one-row
+    catalogue version at most every ``check_interval`` seconds and drop the
+    local caches when it moved.
+    """
+
+    def __init__(self, app, listen=True, check_interval=5.0, reconnect_delay=2.0):
+        self.app = app
+        self.listen = listen
+        self.check_interval = check_interval
+        self.reconnect_delay = reconnect_delay
+        self.known_version = None
+        self.connected = False
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def note_local_version(self, version):
+        """Record a version this process committed itself, unless another process's change was skipped"""
+        with self._lock:
+            if self.known_version is None or version == self.known_version + 1:
+                self.known_version = version
+
+    def ensure_started(self):
+        """Start the listener thread once per process (PostgreSQL only)"""
+        if not self.listen or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.connected = False
+            with self.app.app_context():
+                if db.engine.dialect.name != 'postgresql':
+                    return
+            self._thread = threading.Thread(target=self._listen_loop, name='gamecon-catalogue-listener', daemon=True)
+            self._thread.start()
+
+    def poll_if_due(self):
+        """Version check fallback, run from requests while no listener is connected (needs an app context)"""
+        if self.connected:
+            return
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        self.check_version()
+
+    def check_version(self):
+        """Drop the local caches if the catalogue version moved without us seeing the event"""
+        try:
+            with db.engine.connect() as connection:
+                version = connection.execute(_version_query()).scalar()
+        except Exception as e:
+            logger.warning("Catalogue version check failed", extra={
+                'extra_fields': {
+                    'operation': 'catalogue_version_check_error',
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+            return
+        with self._lock:
+            changed = self.known_version is not None and version != self.known_version
+            self.known_version = version
+        if changed:
+            self._reload_caches()
+            CATALOGUE_EVENTS.labels(source='poll', op='version_changed').inc()
+
+    def apply(self, payload, source='notify'):
+        """Apply one change event published by any process"""
+        version = payload.get('v')
+        if payload.get('origin') == _origin():
+            self.note_local_version(version)
+            return
+        with self._lock:
+            missed = self.known_version is not None and version is not None and version > self.known_version + 1
+            if version is not None and (self.known_version is None or version > self.known_version):
+                self.known_version = version
+
+        op = payload.get('op')
+        summary = self.app.games_summary
+        if missed or op == 'bulk':
+            summary.invalidate()
+        elif op in ('added', 'updated') and payload.get('game'):
+            summary.game_updated(GameRow(payload['id'], *payload['game']))
+        elif op == 'removed':
+            summary.game_removed(payload['id'])
+        if self.app.page_cache is not None:
+            self.app.page_cache.invalidate()
+
+        CATALOGUE_EVENTS.labels(source=source, op=op or 'unknown').inc()
+        if payload.get('ts'):
+            CATALOGUE_EVENT_DELAY.observe(max(0.0, time.time() - payload['ts']))
+
+    def _reload_caches(self):
+        self.app.games_summary.invalidate()
+        if self.app.page_cache is not None:
+            self.app.page_cache.invalidate()
+
+    def _connect(self):
+        """Dedicated autocommit connection outside the pool, subscribed to the channel"""
+        with self.app.app_context():
+            engine = db.engine
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.loaded_dbapi.connect(*cargs, **cparams)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return connection
+
+    def _listen_loop(self):
+        connection = None
+        while True:
+            try:
+                if connection is None:
+                    connection = self._connect()
+                    self.connected = True
+                    CATALOGUE_LISTENER_CONNECTED.set(1)
+                    logger.info("Catalogue listener connected", extra={
+                        'extra_fields': {'operation': 'catalogue_listener_connected', 'channel': CHANNEL}
+                    })
+                    # Catch up on anything published while we were not listening
+                    with self.app.app_context():
+                        self.check_version()
+                if select_module.select([connection], [], [], self.check_interval) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    try:
+                        self.apply(json.loads(notify.payload))
+                    except (ValueError, TypeError, KeyError) as e:
+                        logger.warning("Ignoring malformed catalogue event", extra={
+                            'extra_fields': {
+                                'operation': 'catalogue_event_invalid',
+                                'error_message': str(e)
+                            }
+                        })
+            except Exception as e:
+                self.connected = False
+                CATALOGUE_LISTENER_CONNECTED.set(0)
+                logger.warning("Catalogue listener disconnected, falling back to version checks", extra={
+                    'extra_fields': {
+                        'operation': 'catalogue_listener_error',
+                        'error_type': type(e).__name__,
+                        'error_message': str(e)
+                    }
+                })
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    connection = None
+                time.sleep(self.reconnect_delay)
@@ -0,0 +1,299 @@
+import json
+import time
+import logging
+import threading
+import click
+from sqlalchemy import inspect, text
+from models import db, Game, upgrade_schema
+from blob_store import content_hash
+from image_pipeline import generate_renditions
+from image_jobs import IMAGE_READY, JOB_RENDITIONS
+from bulk_import import IMPORT_FORMATS, detect_format, import_games, open_import_source, read_records
+from export import EXPORT_FORMATS, EXPORT_IMAGE_MODES, export_lines
+from search import explain_search, search_games_query, sequential_scans
+from catalogue_events import publish as publish_catalogue_change
+from synthetic import generate_games, parse_sizes
+from scale_report import exponents_over, format_report, run_scale_report
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_image_rows(blob_store, batch_size=50, drop_column=False, image_jobs=None):
+    """Move legacy game.image_data bytes into the blob store, one batch per transaction.
+
+    Migrated games are marked ready and, given ``image_jobs``, get a renditions job.
+    """
+    upgrade_schema()
+    columns = {column['name'] for column in inspect(db.engine).get_columns('game')}
+    if 'image_data' not in columns:
+        return {'migrated': 0, 'bytes': 0, 'column_dropped': False}
+
+    migrated = 0
+    total_bytes = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(text(
+            'SELECT id, image_data, image_mime FROM game '
+            'WHERE id > :last_id AND image_data IS NOT NULL '
+            'ORDER BY id LIMIT :batch_size'
+        ), {'last_id': last_id, 'batch_size': batch_size}).all()
+        if not rows:
+            break
+
+        for row in rows:
+            image_data = bytes(row.image_data)
+            image_hash = content_hash(image_data)
+            # Always written, like store_image_blob: an existence check races blob deletion
+            blob_store.put(image_hash, image_data, content_type=row.image_mime)
+            db.session.execute(text(
+                'UPDATE game SET image_hash = :image_hash, image_size = :image_size, image_status = :image_status, '
+                'image_data = NULL WHERE id = :id'
+            ), {'image_hash': image_hash, 'image_size': len(image_data), 'image_status': IMAGE_READY, 'id': row.id})
+            migrated += 1
+            total_bytes += len(image_data)
+            last_id = row.id
+        if image_jobs is not None:
+            image_jobs.enqueue_many([(row.id, JOB_RENDITIONS, None) for row in rows])
+        db.session.commit()
+
+    if drop_column:
+        db.session.execute(text('ALTER TABLE game DROP COLUMN image_data'))
+        db.session.commit()
+
+    return {'migrated': migrated, 'bytes': total_bytes, 'column_dropped': drop_column}
+
+
+def check_search_plans(sample_title='a', sample_genre='Action', sample_platform='PC'):
+    """EXPLAIN representative searches and return {name: sequential scan lines}"""
+    searches = {
+        'title_substring': {'q': sample_title},
+        'title_prefix': {'q': sample_title, 'match': 'prefix'},
+        'genre': {'genre': sample_genre},
+        'platform': {'platform': sample_platform},
+        'title_genre_platform': {'q': sample_title, 'genre': sample_genre, 'platform': sample_platform}
+    }
+    results = {}
+    if db.engine.dialect.name == 'postgresql':
+        # Small tables are always cheaper to seq-scan; ask whether an index path exists at all
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    try:
+        for name, params in searches.items():
+            results[name] = sequential_scans(explain_search(search_games_query(**params).limit(50)))
+    finally:
+        db.session.rollback()
+    return results
+
+
+def invalidate_catalogue_caches(app):
+    """Tell the running servers to reload their catalogue caches after a bulk write"""
+    publish_catalogue_change('bulk')
+    db.session.commit()
+    app.games_summary.invalidate()
+    # Only reaches the server processes with a shared (redis) page cache
+    if app.page_cache is not None:
+        app.page_cache.invalidate()
+
+
+def register_commands(app):
+    """Register the maintenance CLI commands"""
+
+    @app.cli.command('migrate-images')
+    @click.option('--batch-size', default=50, show_default=True, help='Rows moved per transaction.')
+    @click.option('--drop-column', is_flag=True, help='Drop game.image_data once every row is migrated.')
+    def migrate_images(batch_size, drop_column):
+        """Move image bytes stored in the game table into the blob store"""
+        started = time.time()
+        result = migrate_image_rows(app.blob_store, batch_size=batch_size, drop_column=drop_column,
+                                    image_jobs=app.image_jobs)
+        if result['migrated']:
+            invalidate_catalogue_caches(app)
+            app.image_jobs.notify()
+        logger.info("Image blobs migrated", extra={
+            'extra_fields': {
+                'operation': 'image_blob_migration',
+                'games_migrated': result['migrated'],
+                'bytes_migrated': result['bytes'],
+                'column_dropped': result['column_dropped'],
+                'duration_ms': round((time.time() - started) * 1000, 2)
+            }
+        })
+        click.echo(f"Migrated {result['migrated']} images ({result['bytes']} bytes) to the blob store")
+
+    @app.cli.command('backfill-renditions')
+    @click.option('--batch-size', default=100, show_default=True, help='Games loaded per query.')
+    @click.option('--force', is_flag=True, help='Regenerate renditions that already exist.')
+    def backfill_renditions(batch_size, force):
+        """Generate resized image renditions for existing games"""
+        started = time.time()
+        processed = 0
+        last_id = 0
+        while True:
+            query = db.session.query(Game.id).filter(Game.id > last_id, Game.image_hash.isnot(None))
+            if not force:
+                query = query.filter(Game.image_renditions.is_(None))
+            game_ids = [row.id for row in query.order_by(Game.id).limit(batch_size)]
+            if not game_ids:
+                break
+            for game_id in game_ids:
+                generate_renditions(game_id)
+                processed += 1
+            last_id = game_ids[-1]
+            db.session.expunge_all()
+
+        logger.info("Image renditions backfilled", extra={
+            'extra_fields': {
+                'operation': 'image_renditions_backfill',
+                'games_processed': processed,
+                'duration_ms': round((time.time() - started) * 1000, 2)
+            }
+        })
+        click.echo(f"Generated renditions for {processed} games")
+
+    @app.cli.command('check-search-plans')
+    @click.option('--title', default='mar', show_default=True, help='Sample title search term.')
+    @click.option('--genre', default='Action', show_default=True, help='Sample genre filter.')
+    @click.option('--platform', default='PC', show_default=True, help='Sample platform filter.')
+    def check_search_plans_command(title, genre, platform):
+        """Fail when a game search would sequentially scan the game table"""
+        results = check_search_plans(title, genre, platform)
+        for name, scans in results.items():
+            click.echo(f"{name}: {'SEQUENTIAL SCAN ' + '; '.join(scans) if scans else 'index'}")
+        if any(results.values()):
+            raise SystemExit(1)
+
+    @app.cli.command('import-games')
+    @click.argument('path')
+    @click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Input format (default: from the file extension).')
+    @click.option('--batch-size', default=5000, show_default=True, help='Rows loaded per transaction.')
+    @click.option('--fetch-images', is_flag=True, help='Queue an image fetch job for rows with an image_url.')
+    @click.option('--image-workers', default=0, show_default=True,
+                  help='Threads that fetch the queued images before the command exits (0 leaves them to the app).')
+    def import_games_command(path, fmt, batch_size, fetch_images, image_workers):
+        """Stream games from a CSV or JSONL file (title, genre, platform[, image_url]) into the database"""
+        fmt = fmt or detect_format(path)
+        last_report = [0.0]
+
+        def report(stats):
+            if time.time() - last_report[0] >= 1:
+                last_report[0] = time.time()
+                click.echo(f"Imported {stats.imported} rows ({stats.rows_per_second} rows/s, {stats.skipped} skipped)")
+
+        with open_import_source(path) as stream:
+            stats = import_games(read_records(stream, fmt), batch_size=batch_size, fetch_images=fetch_images,
+                                 progress=report, request_id=f'import-games-{int(time.time())}')
+        invalidate_catalogue_caches(app)
+
+        for error in stats.errors:
+            click.echo(f"Skipped {error}", err=True)
+        click.echo(f"Imported {stats.imported} rows in {stats.as_dict()['duration_ms'] / 1000:.1f}s "
+                   f"({stats.rows_per_second} rows/s), skipped {stats.skipped}, queued {stats.image_jobs} image jobs")
+
+        fetched = 0
+        if fetch_images and image_workers > 0 and stats.image_jobs:
+            # Jobs are claimed atomically, so several threads can drain the queue concurrently
+            counts = []
+
+            def drain():
+                with app.app_context():
+                    try:
+                        counts.append(app.image_jobs.run_pending())
+                    finally:
+                        db.session.remove()
+
+            threads = [threading.Thread(target=drain, name=f'gamecon-import-images-{i}') for i in range(image_workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            fetched = sum(counts)
+            click.echo(f"Processed {fetched} image jobs with {image_workers} workers")
+
+        logger.info("Games imported", extra={
+            'extra_fields': {
+                'operation': 'games_import',
+                'source': path,
+                'format': fmt,
+                'image_jobs_processed': fetched,
+                'skipped_examples': stats.errors,
+                **stats.as_dict()
+            }
+        })
+
+    @app.cli.command('export-games')
+    @click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson', show_default=True)
+    @click.option('--images', type=click.Choice(EXPORT_IMAGE_MODES), default='none', show_default=True,
+                  help='Include image hashes or URLs (image bytes are never exported).')
+    @click.option('--output', '-o', default='-', show_default=True, help='Output file, or - for stdout.')
+    def export_games_command(fmt, images, output):
+        """Stream every game to a file as NDJSON or CSV"""
+        with click.open_file(output, 'w', encoding='utf-8', lazy=False) as out:
+            for chunk in export_lines(fmt, images, batch_size=app.config['EXPORT_BATCH_SIZE']):
+                out.write(chunk)
+
+    @app.cli.command('generate-games')
+    @click.option('--count', default=10000, show_default=True, help='Synthetic games to add.')
+    @click.option('--image-fraction', default=0.3, show_default=True, help='Fraction of the games with an image.')
+    @click.option('--image-sizes', default='50k', show_default=True,
+                  help='Comma-separated image sizes in bytes (k/m suffixes allowed), e.g. 20k,200k,2m.')
+    @click.option('--seed', type=int, help='Random seed for a reproducible catalogue.')
+    @click.option('--batch-size', default=5000, show_default=True, help='Rows inserted per transaction.')
+    def generate_games_command(count, image_fraction, image_sizes, seed, batch_size):
+        """Add realistic synthetic games (skewed genres and platforms, shared image blobs) to the database"""
+        last_report = [0.0]
+
+        def report(inserted):
+            if time.time() - last_report[0] >= 1:
+                last_report[0] = time.time()
+                click.echo(f"Generated {inserted}/{count} games")
+
+        result = generate_games(count, app.blob_store, image_fraction=image_fraction,
+                                image_sizes=parse_sizes(image_sizes), seed=seed, batch_size=batch_size,
+                                progress=report)
+        invalidate_catalogue_caches(app)
+        logger.info("Synthetic games generated", extra={
+            'extra_fields': {
+                'operation': 'synthetic_games_generated',
+                'image_fraction': image_fraction,
+                'image_sizes': image_sizes,
+                **result
+            }
+        })
+        click.echo(f"Generated {result['games_generated']} games ({result['games_with_images']} with images, "
+                   f"{result['image_blobs']} distinct blobs) in {result['duration_ms'] / 1000:.1f}s")
+
+    @app.cli.command('scale-report')
+    @click.option('--sizes', default='1000,10000,100000', show_default=True,
+                  help='Comma-separated catalogue sizes to grow the game table through.')
+    @click.option('--image-fraction', default=0.3, show_default=True, help='Fraction of generated games with an image.')
+    @click.option('--image-sizes', default='50k', show_default=True, help='Generated image sizes, e.g. 20k,200k.')
+    @click.option('--repeat', default=3, show_default=True, help='Timed requests per route and size (median is reported).')
+    @click.option('--seed', type=int, default=0, show_default=True, help='Random seed for the generated games.')
+    @click.option('--output', '-o', help='Also write the full report as JSON to this file.')
+    @click.option('--max-exponent', type=float,
+                  help='Exit 1 when a metric grows at least as fast as rows^N (1.0 = linear).')
+    def scale_report_command(sizes, image_fraction, image_sizes, repeat, seed, output, max_exponent):
+        """Grow the catalogue with synthetic games and report how each route scales with the row count.
+
+        Adds games to the configured database; point DATABASE_URL at a scratch database.
+        """
+        sizes = [int(size) for size in sizes.split(',') if size]
+        seeds = iter(range(seed, seed + len(sizes)))
+
+        def grow(count):
+            click.echo(f"Generating {count} games...")
+            generate_games(count, app.blob_store, image_fraction=image_fraction,
+                           image_sizes=parse_sizes(image_sizes), seed=next(seeds))
+            invalidate_catalogue_caches(app)
+
+        report = run_scale_report(app, sizes, grow, repeat=repeat,
+                                  progress=lambda rows, _: click.echo(f"Measured {rows} rows"))
+        click.echo(format_report(report, max_exponent=max_exponent))
+        if output:
+            with open(output, 'w', encoding='utf-8') as out:
+                json.dump(report, out, indent=2)
+        if max_exponent is not None:
+            over = exponents_over(report, max_exponent)
+            for route, metric, exponent in over:
+                click.echo(f"{route} {metric} grows as rows^{exponent}", err=True)
+            if over:
+                raise SystemExit(1)
@@ -0,0 +1,150 @@
+import time
+import logging
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_CHECKOUTS = Counter(
+    'gamecon_db_pool_checkouts_total',
+    'Connections handed out by the SQLAlchemy pool'
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'gamecon_db_pool_checked_out',
+    'Pooled connections currently in use',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'gamecon_db_pool_connections',
+    'Database connections currently open by the pool',
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'gamecon_db_pool_overflow',
+    'Connections open beyond pool_size (negative while the pool is not yet full)',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CONNECTS = Counter(
+    'gamecon_db_pool_connects_total',
+    'New database connections opened by the pool'
+)
+DB_POOL_INVALIDATIONS = Counter(
+    'gamecon_db_pool_invalidations_total',
+    'Pooled connections invalidated (failed pre-ping, disconnect errors)',
+    ['kind']
+)
+DB_POOL_WAIT = Histogram(
+    'gamecon_db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled connection, including opening a new one',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_TIMEOUTS = Counter(
+    'gamecon_db_pool_timeouts_total',
+    'Checkouts that gave up after pool_timeout seconds'
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database (SQLite keeps Flask-SQLAlchemy's defaults)"""
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+
+
+def _track_overflow(pool):
+    if isinstance(pool, QueuePool):
+        DB_POOL_OVERFLOW.set(pool.overflow())
+
+
+def instrument_pool(engine):
+    """Export pool checkouts, open connections, overflow and invalidations as Prometheus metrics"""
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTS.inc()
+        DB_POOL_CONNECTIONS.inc()
+
+    @event.listens_for(engine, 'close')
+    def on_close(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.dec()
+
+    @event.listens_for(engine, 'close_detached')
+    def on_close_detached(dbapi_connection):
+        DB_POOL_CONNECTIONS.dec()
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        DB_POOL_CHECKED_OUT.inc()
+        _track_overflow(engine.pool)
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+        _track_overflow(engine.pool)
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_INVALIDATIONS.labels(kind='hard').inc()
+
+    @event.listens_for(engine, 'soft_invalidate')
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_INVALIDATIONS.labels(kind='soft').inc()
+
+
+def prewarm_pool(engine, connections):
+    """Open up to ``connections`` pooled connections now so the first requests do not pay for the handshake.
+
+    The connections are held at the same time (otherwise the pool would hand
+    the same one back each time) and then returned to the pool.
+    """
+    if connections <= 0 or not isinstance(engine.pool, QueuePool):
+        return 0
+    started = time.time()
+    held = []
+    try:
+        for _ in range(min(connections, engine.pool.size())):
+            held.append(engine.raw_connection())
+    except Exception as e:
+        logger.warning("Connection pool pre-warm incomplete", extra={
+            'extra_fields': {
+                'operation': 'db_pool_prewarm_error',
+                'connections_opened': len(held),
+                'error_type': type(e).__name__,
+                'error_message': str(e)
+            }
+        })
+    finally:
+        for connection in held:
+            connection.close()
+    logger.info("Connection pool pre-warmed", extra={
+        'extra_fields': {
+            'operation': 'db_pool_prewarm',
+            'connections_opened': len(held),
+            'pool_size': engine.pool.size(),
+            'duration_ms': round((time.time() - started) * 1000, 2)
+        }
+    })
+    return len(held)
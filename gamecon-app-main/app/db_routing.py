@@ -0,0 +1,212 @@
+import math
+import time
+import logging
+import threading
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+# Requests carrying this cookie (a Unix timestamp in the future) read from the primary
+PIN_COOKIE = 'gamecon_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+DB_QUERIES = Counter(
+    'gamecon_db_queries_total',
+    'SQL statements executed, by database target',
+    ['target']
+)
+DB_QUERY_DURATION = Histogram(
+    'gamecon_db_query_duration_seconds',
+    'Time spent executing one SQL statement, by database target',
+    ['target'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+DB_READ_ROUTING = Counter(
+    'gamecon_db_read_routing_total',
+    'Read-only requests by the database they were routed to and why',
+    ['target', 'reason']
+)
+DB_REPLICA_LAG = Gauge(
+    'gamecon_db_replica_lag_seconds',
+    'Replication lag last measured on the read replica',
+    multiprocess_mode='livemostrecent'
+)
+
+# Zero when the replica has replayed everything it received, so an idle primary does not look like lag
+POSTGRES_REPLICA_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def measure_replica_lag(connection):
+    """Seconds the replica is behind the primary (always 0 for databases without streaming replication)"""
+    if connection.dialect.name != 'postgresql':
+        connection.execute(text('SELECT 1'))
+        return 0.0
+    return float(connection.execute(POSTGRES_REPLICA_LAG_SQL).scalar() or 0)
+
+
+class ReplicaMonitor:
+    """Cached view of whether the read replica is reachable and caught up.
+
+    The replica is checked at most every ``check_interval`` seconds by one
+    thread; other threads keep using the last result. ``mark_down`` lets a
+    connection error take the replica out of rotation until the next check.
+    """
+
+    def __init__(self, engine, max_lag=10.0, check_interval=5.0):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._healthy = False
+        self._reason = 'replica_unchecked'
+
+    def status(self):
+        """``(healthy, reason)`` for routing the current request"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._healthy, self._reason
+        if not self._lock.acquire(blocking=False):
+            return self._healthy, self._reason
+        try:
+            self._healthy, self._reason = self._check()
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self._healthy, self._reason
+
+    def mark_down(self, reason='replica_down'):
+        self._healthy, self._reason = False, reason
+        self._checked_at = time.monotonic()
+
+    def _check(self):
+        try:
+            with self.engine.connect() as connection:
+                lag = measure_replica_lag(connection)
+        except Exception as e:
+            logger.warning("Read replica unavailable, reading from the primary", extra={
+                'extra_fields': {
+                    'operation': 'db_replica_check_failed',
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+            return False, 'replica_down'
+        DB_REPLICA_LAG.set(lag)
+        if lag > self.max_lag:
+            logger.warning("Read replica lagging, reading from the primary", extra={
+                'extra_fields': {
+                    'operation': 'db_replica_lagging',
+                    'replica_lag_seconds': lag,
+                    'max_lag_seconds': self.max_lag
+                }
+            })
+            return False, 'replica_lagging'
+        return True, 'read_only'
+
+
+def _is_plain_select(clause):
+    """ORM/Core SELECTs without FOR UPDATE; text() statements are not inspected and stay on the primary"""
+    return clause is not None and getattr(clause, 'is_select', False) and \
+        getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """Session that sends the SELECTs of read-only requests to the replica bind.
+
+    Writes, flushes, locking reads and everything outside a request (CLI
+    commands, image jobs) use the primary. A write during a read-only request
+    moves the rest of that request to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or (clause is not None and clause.is_dml):
+                g.db_target = 'primary'
+                g.db_wrote = True
+            elif g.get('db_target') == 'replica' and _is_plain_select(clause):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def instrument_queries(engine, target):
+    """Count and time every statement executed on ``engine`` under the given target label"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        DB_QUERIES.labels(target=target).inc()
+        DB_QUERY_DURATION.labels(target=target).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        # The statement never reached after_cursor_execute
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+
+def install_read_routing(app, db, skip_endpoints=()):
+    """Route read-only requests to the ``replica`` bind when one is configured.
+
+    Returns the ReplicaMonitor, or None when the app only has a primary. After
+    a request writes, the client gets a cookie that keeps its reads on the
+    primary for DB_READ_YOUR_WRITES_SECONDS so it sees its own changes.
+    Requests to ``skip_endpoints`` (probes) always use the primary.
+    """
+    with app.app_context():
+        instrument_queries(db.engine, 'primary')
+        replica = db.engines.get(REPLICA_BIND)
+        if replica is None:
+            return None
+        instrument_queries(replica, 'replica')
+
+    monitor = ReplicaMonitor(
+        replica,
+        max_lag=app.config['DB_REPLICA_MAX_LAG_SECONDS'],
+        check_interval=app.config['DB_REPLICA_CHECK_INTERVAL']
+    )
+    pin_seconds = app.config['DB_READ_YOUR_WRITES_SECONDS']
+
+    @event.listens_for(replica, 'handle_error')
+    def replica_error(context):
+        # Lost or refused connections take the replica out of rotation until the next check
+        if context.is_disconnect or context.connection is None:
+            monitor.mark_down()
+
+    @app.before_request
+    def choose_database():
+        g.db_target = 'primary'
+        if request.method not in READ_METHODS or request.endpoint in skip_endpoints:
+            return
+        pinned_until = request.cookies.get(PIN_COOKIE, type=float)
+        if pinned_until and pinned_until > time.time():
+            reason = 'read_your_writes'
+        else:
+            healthy, reason = monitor.status()
+            if healthy:
+                g.db_target = 'replica'
+        DB_READ_ROUTING.labels(target=g.db_target, reason=reason).inc()
+
+    @app.after_request
+    def pin_writer_to_primary(response):
+        if g.get('db_wrote') and pin_seconds > 0:
+            response.set_cookie(PIN_COOKIE, f"{time.time() + pin_seconds:.3f}",
+                                max_age=math.ceil(pin_seconds), httponly=True, samesite='Lax')
+        return response
+
+    return monitor
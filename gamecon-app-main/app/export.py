@@ -0,0 +1,67 @@
+import io
+import csv
+import json
+import time
+import logging
+from flask import current_app
+from models import db, Game
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_IMAGE_MODES = ('none', 'hash', 'url')
+EXPORT_COLUMNS = ['id', 'title', 'genre', 'platform']
+
+
+def iter_games(batch_size=1000):
+    """Yield every game as a lightweight row, fetched ``batch_size`` rows at a time.
+
+    ``yield_per`` turns on ``stream_results``, so PostgreSQL uses a server-side
+    cursor and neither the driver nor the ORM holds the whole table.
+    """
+    query = db.session.query(Game.id, Game.title, Game.genre, Game.platform, Game.image_hash) \
+        .order_by(Game.id).execution_options(yield_per=batch_size)
+    for row in query:
+        yield row
+
+
+def _record(row, images):
+    record = {'id': row.id, 'title': row.title, 'genre': row.genre, 'platform': row.platform}
+    if images == 'hash':
+        record['image_hash'] = row.image_hash
+    elif images == 'url':
+        record['image_url'] = current_app.jinja_env.globals['image_url'](row) if row.image_hash else None
+    return record
+
+
+def export_lines(fmt, images='none', batch_size=1000):
+    """Generate the export as text chunks (one NDJSON line or CSV row each), logging a summary at the end"""
+    started = time.time()
+    exported = 0
+    columns = EXPORT_COLUMNS + {'hash': ['image_hash'], 'url': ['image_url']}.get(images, [])
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    for row in iter_games(batch_size):
+        record = _record(row, images)
+        if fmt == 'csv':
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(record)
+            yield buffer.getvalue()
+        else:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        exported += 1
+
+    logger.info("Games exported", extra={
+        'extra_fields': {
+            'operation': 'games_export',
+            'format': fmt,
+            'images': images,
+            'games_exported': exported,
+            'duration_ms': round((time.time() - started) * 1000, 2)
+        }
+    })
@@ -0,0 +1,64 @@
+"""Gunicorn settings for SERVER_MODE=gunicorn (see entrypoint.sh)"""
+import os
+from server_sizing import detect_worker_layout
+
+# Every worker writes its Prometheus samples to mmap files in this directory and
+# /metrics merges them. It must be set before prometheus_client is first imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/gamecon-metrics')
+if not os.environ.get('GAMECON_METRICS_DIR_RESET'):
+    # Clear files of a previous run once per master (not again when SIGHUP re-reads this file),
+    # before the preloaded app writes its first samples
+    from metrics_multiprocess import reset_multiprocess_dir
+    reset_multiprocess_dir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+    os.environ['GAMECON_METRICS_DIR_RESET'] = '1'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Threaded workers sized from the container's cgroup CPU and memory limits
+workers, threads = detect_worker_layout()
+worker_class = 'gthread'
+
+# Build the app once in the master so workers fork with it already imported
+preload_app = True
+
+# Recycle workers periodically (jitter avoids restarting them all at once)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# SIGTERM stops accepting connections and lets in-flight requests finish for graceful_timeout seconds
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '25'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Requests are logged by the app as structured JSON; gunicorn only reports its own errors
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+
+def when_ready(server):
+    # The master never serves requests: close the connections create_app() pre-warmed there
+    from models import db
+    from wsgi import app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    server.log.info("gamecon serving with %s workers x %s threads", workers, threads)
+
+
+def post_fork(server, worker):
+    # Connections opened by create_app() in the master must not be shared with the children,
+    # so every worker starts a pool of its own and fills it before taking traffic
+    from models import db
+    from db_pool import prewarm_pool
+    from wsgi import app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+        prewarm_pool(db.engine, app.config['DB_POOL_PREWARM'])
+
+
+def child_exit(server, worker):
+    # Drop the worker's live gauges and fold its counters into the archive files
+    from metrics_multiprocess import worker_exited
+    worker_exited(worker.pid, os.environ['PROMETHEUS_MULTIPROC_DIR'])
@@ -0,0 +1,236 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from collections import namedtuple
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge
+
+IMAGE_HTTP_CACHE_REQUESTS = Counter(
+    'gamecon_image_http_cache_requests_total',
+    'Remote image fetches by cache outcome (hit, miss, revalidated)',
+    ['result']
+)
+IMAGE_HTTP_CACHE_EVICTIONS = Counter(
+    'gamecon_image_http_cache_evictions_total',
+    'Entries evicted from the remote image disk cache'
+)
+IMAGE_HTTP_CACHE_BYTES = Gauge(
+    'gamecon_image_http_cache_bytes',
+    'Bytes held by the remote image disk cache',
+    multiprocess_mode='livemostrecent'
+)
+
+FetchResult = namedtuple('FetchResult', ['status_code', 'content_type', 'content', 'cache_result'])
+CacheEntry = namedtuple('CacheEntry', ['url', 'body_hash', 'content_type', 'etag', 'last_modified', 'size', 'expires_at'])
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class ResponseTooLarge(ValueError):
+    """The response body exceeded the configured byte cap"""
+
+
+class DiskCache:
+    """Bounded LRU cache of HTTP responses keyed by URL.
+
+    Metadata (body hash, ETag, Last-Modified, freshness, last access) lives in
+    a small SQLite index; bodies are files named by their SHA-256, so URLs
+    serving identical bytes share one file. Least recently used entries are
+    evicted once the bodies exceed ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        if self._pid != os.getpid():
+            os.makedirs(os.path.join(self.directory, 'bodies'), exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'),
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'url TEXT PRIMARY KEY, body_hash TEXT NOT NULL, content_type TEXT, etag TEXT, '
+                'last_modified TEXT, size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)')
+            self._pid = os.getpid()
+        return self._conn
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.directory, 'bodies', body_hash)
+
+    def get(self, url):
+        with self._lock:
+            row = self._db().execute(
+                'SELECT url, body_hash, content_type, etag, last_modified, size, expires_at '
+                'FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def read_body(self, entry):
+        try:
+            with open(self._body_path(entry.body_hash), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def touch(self, url, expires_at=None):
+        with self._lock:
+            if expires_at is None:
+                self._db().execute('UPDATE entries SET last_access = ? WHERE url = ?', (time.time(), url))
+            else:
+                self._db().execute('UPDATE entries SET last_access = ?, expires_at = ? WHERE url = ?',
+                                   (time.time(), expires_at, url))
+
+    def put(self, url, content, content_type, etag, last_modified, expires_at):
+        if len(content) > self.max_bytes:
+            return
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._body_path(body_hash)
+        with self._lock:
+            conn = self._db()
+            if not os.path.exists(path):
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+                with os.fdopen(fd, 'wb') as tmp:
+                    tmp.write(content)
+                os.replace(tmp_path, path)
+            previous = conn.execute('SELECT body_hash FROM entries WHERE url = ?', (url,)).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (url, body_hash, content_type, etag, last_modified, size, '
+                'expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, body_hash, content_type, etag, last_modified, len(content), expires_at, time.time())
+            )
+            if previous and previous[0] != body_hash:
+                self._delete_body_if_unused(conn, previous[0])
+            self._evict(conn)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._db().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute('SELECT url, body_hash, size FROM entries ORDER BY last_access LIMIT 1').fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM entries WHERE url = ?', (row[0],))
+            self._delete_body_if_unused(conn, row[1])
+            total -= row[2]
+            IMAGE_HTTP_CACHE_EVICTIONS.inc()
+        IMAGE_HTTP_CACHE_BYTES.set(total)
+
+    def _delete_body_if_unused(self, conn, body_hash):
+        if conn.execute('SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1', (body_hash,)).fetchone() is None:
+            try:
+                os.unlink(self._body_path(body_hash))
+            except FileNotFoundError:
+                pass
+
+
+class ImageHttpClient:
+    """Shared HTTP client for remote image URLs.
+
+    One ``requests.Session`` keeps connections alive between fetches, with at
+    most ``max_per_host`` connections per host (callers wait for a free one).
+    With a ``cache`` configured, fresh entries are served without a request
+    and stale ones are revalidated with If-None-Match / If-Modified-Since.
+    """
+
+    def __init__(self, cache=None, timeout=10, pool_hosts=20, max_per_host=4, user_agent=None):
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=max_per_host, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    def fetch(self, url, max_bytes, headers=None, content_type_prefix=None):
+        """GET ``url`` through the cache; raises requests.RequestException or ResponseTooLarge.
+
+        When ``content_type_prefix`` is given, other responses come back with
+        ``content=None`` without reading or caching the body.
+        """
+        entry = self.cache.get(url) if self.cache else None
+        body = self.cache.read_body(entry) if entry else None
+        if body is not None and entry.expires_at > time.time():
+            self.cache.touch(url)
+            IMAGE_HTTP_CACHE_REQUESTS.labels(result='hit').inc()
+            return FetchResult(200, entry.content_type, body, 'hit')
+
+        request_headers = dict(headers or {})
+        if body is not None:
+            if entry.etag:
+                request_headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request_headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.session.get(url, timeout=self.timeout, headers=request_headers, stream=True)
+        try:
+            if response.status_code == 304 and body is not None:
+                self.cache.touch(url, expires_at=_expires_at(response))
+                IMAGE_HTTP_CACHE_REQUESTS.labels(result='revalidated').inc()
+                return FetchResult(200, entry.content_type, body, 'revalidated')
+
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', '')
+            if content_type_prefix and not content_type.startswith(content_type_prefix):
+                IMAGE_HTTP_CACHE_REQUESTS.labels(result='miss').inc()
+                return FetchResult(response.status_code, content_type, None, 'miss')
+            content = _read_capped(response, max_bytes)
+        finally:
+            response.close()
+
+        IMAGE_HTTP_CACHE_REQUESTS.labels(result='miss').inc()
+        if self.cache and 'no-store' not in response.headers.get('cache-control', ''):
+            self.cache.put(url, content, content_type, response.headers.get('etag'),
+                           response.headers.get('last-modified'), _expires_at(response))
+        return FetchResult(response.status_code, content_type, content, 'miss')
+
+
+def _expires_at(response):
+    cache_control = response.headers.get('cache-control', '')
+    match = _MAX_AGE.search(cache_control)
+    if match and 'no-cache' not in cache_control:
+        return time.time() + int(match.group(1))
+    return 0.0
+
+
+def _read_capped(response, max_bytes):
+    """Read a streamed response body, raising ResponseTooLarge past max_bytes"""
+    declared = response.headers.get('content-length')
+    if declared and str(declared).isdigit() and int(declared) > max_bytes:
+        raise ResponseTooLarge(f"Declared length {declared} exceeds {max_bytes} bytes")
+    chunks = []
+    received = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ResponseTooLarge(f"Body exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def create_image_http_client(config):
+    """Build the shared image client from IMAGE_HTTP_* settings"""
+    cache = None
+    if config.get('IMAGE_HTTP_CACHE_DIR'):
+        cache = DiskCache(config['IMAGE_HTTP_CACHE_DIR'], max_bytes=config['IMAGE_HTTP_CACHE_MAX_BYTES'])
+    return ImageHttpClient(
+        cache=cache,
+        timeout=config['IMAGE_HTTP_TIMEOUT'],
+        pool_hosts=config['IMAGE_HTTP_POOL_HOSTS'],
+        max_per_host=config['IMAGE_HTTP_MAX_PER_HOST'],
+        user_agent=config.get('IMAGE_HTTP_USER_AGENT')
+    )
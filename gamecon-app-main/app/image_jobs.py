@@ -0,0 +1,340 @@
+import os
+import time
+import logging
+import threading
+from flask import g
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+from models import db, Game, ImageJob
+from catalogue_events import publish as publish_catalogue_change
+
+logger = logging.getLogger(__name__)
+
+JOB_FETCH_IMAGE = 'fetch_image'
+JOB_RENDITIONS = 'renditions'
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_FAILED = 'failed'
+
+IMAGE_PENDING = 'pending'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+
+IMAGE_JOB_QUEUE_DEPTH = Gauge(
+    'gamecon_image_jobs_queue_depth',
+    'Image jobs waiting to be picked up',
+    multiprocess_mode='livemostrecent'
+)
+IMAGE_JOBS_TOTAL = Counter(
+    'gamecon_image_jobs_total',
+    'Image jobs finished, by outcome',
+    ['kind', 'status']
+)
+IMAGE_JOB_LATENCY = Histogram(
+    'gamecon_image_job_latency_seconds',
+    'Time from enqueueing an image job until it finished',
+    ['kind'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+)
+IMAGE_JOB_DURATION = Histogram(
+    'gamecon_image_job_duration_seconds',
+    'Time spent executing one image job attempt',
+    ['kind']
+)
+
+
+class ImageJobError(Exception):
+    """An image job attempt failed and may be retried"""
+
+
+class ImageJobQueue:
+    """Postgres/SQLite-backed queue of image jobs executed by an in-process worker pool.
+
+    Jobs are rows in ``image_job`` written in the same transaction as the game
+    change, so they survive restarts. Workers claim a job with a conditional
+    UPDATE (``status = 'queued'``), which is safe across threads, processes
+    and replicas. Jobs stuck in ``running`` longer than ``lease_seconds`` are
+    requeued, failed attempts are retried with exponential backoff, and
+    succeeded jobs are deleted.
+    """
+
+    def __init__(self, app, workers=2, poll_interval=2.0, max_attempts=3, lease_seconds=300,
+                 retry_backoff=5.0):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_backoff = retry_backoff
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        self._maintained_at = None
+
+    def enqueue(self, game_id, kind, url=None):
+        """Add a job to the current session; it becomes visible when the caller commits"""
+        now = time.time()
+        job = ImageJob(
+            game_id=game_id,
+            kind=kind,
+            url=url,
+            status=JOB_QUEUED,
+            attempts=0,
+            request_id=getattr(g, 'request_id', None),
+            created_at=now,
+            run_after=now
+        )
+        db.session.add(job)
+        return job
+
+    def enqueue_many(self, jobs):
+        """Insert several ``(game_id, kind, url)`` jobs with one executemany in the current transaction"""
+        now = time.time()
+        request_id = getattr(g, 'request_id', None)
+        rows = [
+            {'game_id': game_id, 'kind': kind, 'url': url, 'status': JOB_QUEUED, 'attempts': 0,
+             'request_id': request_id, 'created_at': now, 'run_after': now}
+            for game_id, kind, url in jobs
+        ]
+        if rows:
+            db.session.execute(insert(ImageJob), rows)
+        return len(rows)
+
+    def notify(self):
+        """Wake up the local workers after a commit that enqueued jobs"""
+        self._wakeup.set()
+
+    def ensure_started(self):
+        """Start the worker threads once per process (threads do not survive a fork)"""
+        if self.workers <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'gamecon-image-jobs-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def depth(self):
+        """Number of jobs waiting to run (needs an app context)"""
+        return db.session.query(ImageJob.id).filter(ImageJob.status == JOB_QUEUED).count()
+
+    def run_pending(self, limit=None):
+        """Execute claimable jobs on the calling thread until none are left (needs an app context)"""
+        processed = 0
+        while limit is None or processed < limit:
+            if not self._run_one():
+                break
+            processed += 1
+        return processed
+
+    def _worker_loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        ran = self._run_one()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                ran = False
+                logger.error("Image job worker error", extra={
+                    'extra_fields': {
+                        'operation': 'image_job_worker_error',
+                        'error_type': type(e).__name__,
+                        'error_message': str(e)
+                    }
+                })
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _run_one(self):
+        job = self._claim()
+        if job is None:
+            return False
+
+        started = time.time()
+        kind = job.kind
+        # Log lines of the job carry the ID of the request that enqueued it
+        previous_request_id = g.pop('request_id', None)
+        g.request_id = job.request_id or f'image-job-{job.id}'
+        try:
+            if job.kind == JOB_FETCH_IMAGE:
+                self._fetch_image(job)
+            elif job.kind == JOB_RENDITIONS:
+                from image_pipeline import generate_renditions
+                generate_renditions(job.game_id)
+            else:
+                raise ImageJobError(f"Unknown image job kind: {job.kind}")
+        except Exception as e:
+            db.session.rollback()
+            self._failed(job, e)
+        else:
+            self._succeeded(job)
+        finally:
+            IMAGE_JOB_DURATION.labels(kind=kind).observe(time.time() - started)
+            g.pop('request_id', None)
+            if previous_request_id is not None:
+                g.request_id = previous_request_id
+        return True
+
+    def _maintain_if_due(self, now):
+        """Requeue expired leases and refresh the depth gauge, at most once per poll interval per process"""
+        if self._maintained_at is not None and now - self._maintained_at < self.poll_interval:
+            return
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            self._maintained_at = now
+            # Requeue jobs whose worker died mid-run
+            db.session.query(ImageJob).filter(
+                ImageJob.status == JOB_RUNNING,
+                ImageJob.started_at < now - self.lease_seconds
+            ).update({'status': JOB_QUEUED}, synchronize_session=False)
+            db.session.commit()
+            IMAGE_JOB_QUEUE_DEPTH.set(self.depth())
+        finally:
+            self._maintenance_lock.release()
+
+    def _claim(self):
+        now = time.time()
+        self._maintain_if_due(now)
+
+        while True:
+            candidates = db.session.query(ImageJob.id).filter(
+                ImageJob.status == JOB_QUEUED,
+                ImageJob.run_after <= now
+            ).order_by(ImageJob.id).limit(5).all()
+            if not candidates:
+                return None
+            for candidate in candidates:
+                claimed = db.session.query(ImageJob).filter(
+                    ImageJob.id == candidate.id,
+                    ImageJob.status == JOB_QUEUED
+                ).update({
+                    'status': JOB_RUNNING,
+                    'started_at': now,
+                    'attempts': ImageJob.attempts + 1
+                }, synchronize_session=False)
+                db.session.commit()
+                if claimed == 1:
+                    return db.session.get(ImageJob, candidate.id)
+
+    def _fetch_image(self, job):
+        from routes import download_image_from_url, store_image_blob, release_image_blob
+
+        game = db.session.get(Game, job.game_id)
+        if game is None:
+            return
+
+        image_data, image_mime = download_image_from_url(job.url)
+        if not image_data:
+            raise ImageJobError("Could not download image from URL")
+        image_hash, image_size = store_image_blob(image_data, image_mime)
+
+        # The row lock serialises concurrent fetch jobs of one game (PostgreSQL; SQLite writes are serial anyway)
+        game = db.session.get(Game, job.game_id, with_for_update=True, populate_existing=True)
+        if game is None or self._superseded(job, game):
+            db.session.rollback()
+            logger.info("Dropping superseded image fetch", extra={
+                'extra_fields': {
+                    'operation': 'image_fetch_superseded',
+                    'job_id': job.id,
+                    'game_id': job.game_id
+                }
+            })
+            release_image_blob(image_hash)
+            return
+        old_image_hash = game.image_hash
+        game.image_hash = image_hash
+        game.image_size = image_size
+        game.image_mime = image_mime
+        game.image_status = IMAGE_READY
+        if old_image_hash != image_hash:
+            game.image_renditions = None
+            self.enqueue(game.id, JOB_RENDITIONS)
+        publish_catalogue_change('image', game_id=game.id)
+        db.session.commit()
+        self._game_changed()
+        if old_image_hash != image_hash:
+            release_image_blob(old_image_hash)
+
+    def _superseded(self, job, game):
+        """Whether a newer edit or fetch job has replaced the image this fetch job was queued for"""
+        if game.image_status != IMAGE_PENDING:
+            # A later inline image or a newer fetch job already settled the image
+            return True
+        newer = db.session.query(ImageJob.id).filter(
+            ImageJob.game_id == job.game_id,
+            ImageJob.kind == JOB_FETCH_IMAGE,
+            ImageJob.status.in_((JOB_QUEUED, JOB_RUNNING)),
+            ImageJob.id > job.id
+        ).first()
+        return newer is not None
+
+    def _game_changed(self):
+        # The game page shows the image and its status
+        page_cache = getattr(self.app, 'page_cache', None)
+        if page_cache is not None:
+            page_cache.invalidate()
+
+    def _succeeded(self, job):
+        job_id, kind, game_id, attempts = job.id, job.kind, job.game_id, job.attempts
+        latency = time.time() - job.created_at
+        db.session.query(ImageJob).filter(ImageJob.id == job_id).delete(synchronize_session=False)
+        db.session.commit()
+        IMAGE_JOBS_TOTAL.labels(kind=kind, status='succeeded').inc()
+        IMAGE_JOB_LATENCY.labels(kind=kind).observe(latency)
+        logger.info("Image job completed", extra={
+            'extra_fields': {
+                'operation': 'image_job_completed',
+                'job_id': job_id,
+                'job_kind': kind,
+                'game_id': game_id,
+                'attempts': attempts,
+                'latency_ms': round(latency * 1000, 2)
+            }
+        })
+
+    def _failed(self, job, error):
+        job = db.session.get(ImageJob, job.id)
+        job.error = f"{type(error).__name__}: {error}"
+        retry = job.attempts < self.max_attempts
+        if retry:
+            job.status = JOB_QUEUED
+            job.run_after = time.time() + self.retry_backoff * (2 ** (job.attempts - 1))
+        else:
+            job.status = JOB_FAILED
+            job.finished_at = time.time()
+            if job.kind == JOB_FETCH_IMAGE:
+                game = db.session.get(Game, job.game_id, with_for_update=True)
+                if game is not None and not self._superseded(job, game):
+                    game.image_status = IMAGE_FAILED
+                    publish_catalogue_change('image', game_id=game.id)
+        db.session.commit()
+        if not retry and job.kind == JOB_FETCH_IMAGE:
+            self._game_changed()
+
+        IMAGE_JOBS_TOTAL.labels(kind=job.kind, status='retried' if retry else 'failed').inc()
+        if not retry:
+            IMAGE_JOB_LATENCY.labels(kind=job.kind).observe(job.finished_at - job.created_at)
+        logger.warning("Image job failed", extra={
+            'extra_fields': {
+                'operation': 'image_job_failed',
+                'job_id': job.id,
+                'job_kind': job.kind,
+                'game_id': job.game_id,
+                'attempts': job.attempts,
+                'will_retry': retry,
+                'error_type': type(error).__name__,
+                'error_message': str(error)
+            }
+        })
@@ -0,0 +1,140 @@
+import time
+import logging
+from io import BytesIO
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_MIMETYPES = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png'
+}
+
+
+def parse_widths(spec):
+    """Parse '200,800' into a sorted tuple of widths"""
+    return tuple(sorted({int(width) for width in str(spec).split(',') if width.strip()}))
+
+
+def rendition_key(image_hash, width, fmt):
+    """Blob store key of one rendition of an original image"""
+    return f"{image_hash}.w{width}.{fmt}"
+
+
+def build_renditions(image_data, widths, webp_quality=80, jpeg_quality=85):
+    """Decode an image once and encode it at each width as WebP plus a JPEG/PNG fallback.
+
+    Returns a dict mapping ``'<width>.<format>'`` to the encoded bytes. Images
+    are never upscaled; widths wider than the original reuse its size.
+    """
+    renditions = {}
+    with Image.open(BytesIO(image_data)) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        fallback = 'png' if has_alpha else 'jpeg'
+
+        for width in widths:
+            resized = image.copy()
+            if resized.width > width:
+                height = max(1, round(resized.height * width / resized.width))
+                resized = resized.resize((width, height), Image.LANCZOS)
+
+            out = BytesIO()
+            resized.save(out, format='WEBP', quality=webp_quality, method=4)
+            renditions[f'{width}.webp'] = out.getvalue()
+
+            out = BytesIO()
+            if fallback == 'png':
+                resized.save(out, format='PNG', optimize=True)
+            else:
+                resized.save(out, format='JPEG', quality=jpeg_quality, optimize=True, progressive=True)
+            renditions[f'{width}.{fallback}'] = out.getvalue()
+    return renditions
+
+
+def choose_rendition(renditions, width, accept_webp):
+    """Pick the smallest rendition at least ``width`` wide, preferring WebP when accepted.
+
+    Returns ``(name, size)`` or ``None`` when the original should be served.
+    """
+    if not renditions or not width:
+        return None
+    by_width = {}
+    for name, size in renditions.items():
+        rendition_width, fmt = name.split('.', 1)
+        by_width.setdefault(int(rendition_width), {})[fmt] = (name, size)
+    fitting = [w for w in sorted(by_width) if w >= width] or [max(by_width)]
+    formats = by_width[fitting[0]]
+    if accept_webp and 'webp' in formats:
+        return formats['webp']
+    for fmt in ('jpeg', 'png'):
+        if fmt in formats:
+            return formats[fmt]
+    return None
+
+
+def generate_renditions(game_id):
+    """Build and store the renditions of one game's image (needs an app context)"""
+    from flask import current_app
+    from models import db, Game
+
+    game = db.session.get(Game, game_id)
+    if game is None or not game.image_hash:
+        return None
+    image_hash = game.image_hash
+    original = current_app.blob_store.get(image_hash)
+    if original is None:
+        return None
+
+    started = time.time()
+    widths = parse_widths(current_app.config['IMAGE_RENDITION_WIDTHS'])
+    try:
+        renditions = build_renditions(
+            original, widths,
+            webp_quality=current_app.config['IMAGE_WEBP_QUALITY'],
+            jpeg_quality=current_app.config['IMAGE_JPEG_QUALITY']
+        )
+    except Exception as e:
+        logger.error("Could not build image renditions", extra={
+            'extra_fields': {
+                'operation': 'image_renditions_error',
+                'game_id': game_id,
+                'error_type': type(e).__name__,
+                'error_message': str(e)
+            }
+        })
+        # Mark as processed so backfills do not retry undecodable images forever
+        renditions = {}
+
+    for name, data in renditions.items():
+        width, fmt = name.split('.', 1)
+        current_app.blob_store.put(rendition_key(image_hash, width, fmt), data,
+                                   content_type=RENDITION_MIMETYPES[fmt])
+
+    # Only record the renditions if the image was not replaced in the meantime
+    db.session.refresh(game)
+    if game.image_hash != image_hash:
+        return None
+    game.image_renditions = {name: len(data) for name, data in renditions.items()}
+    db.session.commit()
+
+    logger.info("Image renditions generated", extra={
+        'extra_fields': {
+            'operation': 'image_renditions_generated',
+            'game_id': game_id,
+            'original_size_bytes': len(original),
+            'renditions': game.image_renditions,
+            'duration_ms': round((time.time() - started) * 1000, 2)
+        }
+    })
+    return game.image_renditions
+
+
+def delete_renditions(blob_store, image_hash, widths):
+    """Remove every rendition an image may have"""
+    for width in widths:
+        for fmt in RENDITION_MIMETYPES:
+            blob_store.delete(rendition_key(image_hash, width, fmt))
+
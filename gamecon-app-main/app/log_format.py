@@ -0,0 +1,58 @@
+import json
+import logging
+from flask import request, g, has_app_context, has_request_context
+from log_policy import apply_field_budget
+
+
+class JSONFormatter(logging.Formatter):
+    """Custom JSON formatter for structured logging"""
+
+    def __init__(self, *args, field_max_bytes=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.field_max_bytes = field_max_bytes
+    
+    def format(self, record):
+        log_entry = {
+            'timestamp': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+        }
+        
+        # Add request context, captured at emit time when logging through the batching pipeline
+        context = getattr(record, 'request_context', None)
+        if context is None:
+            context = self.request_context()
+        log_entry.update(context)
+        
+        # Add exception info if present
+        if record.exc_info:
+            log_entry['exception'] = self.formatException(record.exc_info)
+            
+        # Add extra fields, keeping catalogue-sized lists within the per-field byte budget
+        if hasattr(record, 'extra_fields'):
+            log_entry.update(apply_field_budget(record.extra_fields, self.field_max_bytes))
+            
+        return json.dumps(log_entry, ensure_ascii=False)
+
+    @staticmethod
+    def request_context():
+        """Snapshot the request ID and HTTP fields of the current request, if any"""
+        context = {}
+        if has_app_context() and hasattr(g, 'request_id'):
+            context['request_id'] = g.request_id
+            
+        if has_request_context():
+            context.update({
+                'http_method': request.method,
+                'http_url': request.url,
+                'http_path': request.path,
+                'http_query_string': request.query_string.decode('utf-8'),
+                'http_user_agent': request.headers.get('User-Agent', ''),
+                'http_remote_addr': request.remote_addr,
+                'http_referrer': request.headers.get('Referer', ''),
+            })
+        return context
@@ -0,0 +1,188 @@
+import os
+import sys
+import threading
+import logging
+from collections import deque
+from prometheus_client import Counter, Gauge
+
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK)
+
+LOG_RECORDS_QUEUED = Counter(
+    'gamecon_log_records_queued_total',
+    'Log records accepted by the batching log pipeline'
+)
+LOG_RECORDS_DROPPED = Counter(
+    'gamecon_log_records_dropped_total',
+    'Log records dropped because the log queue was full'
+)
+LOG_QUEUE_DEPTH = Gauge(
+    'gamecon_log_queue_depth',
+    'Log records waiting to be written by the background writer',
+    multiprocess_mode='livesum'
+)
+
+
+class BatchingQueueHandler(logging.Handler):
+    """Logging handler that enqueues records and writes them in batches from a background thread.
+
+    ``emit()`` only snapshots the request context and appends the record to a
+    bounded queue; formatting and the write to ``stream`` happen on the writer
+    thread. When the queue is full the ``drop_oldest`` policy discards the
+    oldest pending record, while ``block`` makes the caller wait for room.
+    """
+
+    def __init__(self, stream=None, capacity=10000, batch_size=500, flush_interval=0.5,
+                 overflow_policy=OVERFLOW_DROP_OLDEST):
+        super().__init__()
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log overflow policy: {overflow_policy}")
+        self.stream = stream if stream is not None else sys.stdout
+        self.capacity = max(1, capacity)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self._queue = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._writer = None
+        self._writer_pid = None
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def emit(self, record):
+        try:
+            self._prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                dropped = self._make_room()
+                self._queue.append(record)
+                self.queued += 1
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+        if closed:
+            # Records logged after close() (e.g. during shutdown) are written directly
+            self._write_batch([record])
+            return
+        LOG_RECORDS_QUEUED.inc()
+        if dropped:
+            LOG_RECORDS_DROPPED.inc()
+
+    def flush(self):
+        """Block until every record queued so far has been written"""
+        with self._cond:
+            if self._writer is None or not self._writer.is_alive():
+                batch = list(self._queue)
+                self._queue.clear()
+            else:
+                self._cond.notify_all()
+                while (self._queue or self._in_flight) and self._writer.is_alive():
+                    self._cond.wait(self.flush_interval)
+                batch = list(self._queue)
+                self._queue.clear()
+        # Writer is gone (e.g. interpreter shutdown): write what is left here
+        if batch:
+            self._write_batch(batch)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        writer = self._writer
+        if writer is not None and writer.is_alive() and writer is not threading.current_thread():
+            writer.join(timeout=max(5.0, self.flush_interval * 4))
+        self.flush()
+        super().close()
+
+    def _prepare(self, record):
+        # Merge args and capture the request context while still on the request thread
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        capture = getattr(self.formatter, 'request_context', None)
+        if capture is not None and not hasattr(record, 'request_context'):
+            record.request_context = capture()
+
+    def _make_room(self):
+        if len(self._queue) < self.capacity:
+            return False
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            while len(self._queue) >= self.capacity and not self._closed:
+                self._cond.notify_all()
+                self._cond.wait(self.flush_interval)
+            if len(self._queue) < self.capacity:
+                return False
+        self._queue.popleft()
+        self.dropped += 1
+        return True
+
+    def _start_writer(self):
+        with self._cond:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._run, name='gamecon-log-writer', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._queue) < self.batch_size and not self._closed:
+                    # Give the batch a chance to fill before paying for a write
+                    self._cond.wait_for(lambda: len(self._queue) >= self.batch_size or self._closed,
+                                        self.flush_interval)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                closed = self._closed
+                self._cond.notify_all()
+
+            if batch:
+                self._write_batch(batch)
+            LOG_QUEUE_DEPTH.set(len(self._queue))
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+                if closed and not self._queue:
+                    return
+
+    def _write_batch(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        try:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+            self.written += len(lines)
+        except Exception:
+            self.handleError(batch[-1])
+
+
+def create_batching_handler():
+    """Build a BatchingQueueHandler from the LOG_* environment variables"""
+    return BatchingQueueHandler(
+        capacity=int(os.environ.get('LOG_QUEUE_SIZE', '10000')),
+        batch_size=int(os.environ.get('LOG_BATCH_SIZE', '500')),
+        flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL', '0.5')),
+        overflow_policy=os.environ.get('LOG_OVERFLOW_POLICY', OVERFLOW_DROP_OLDEST).lower()
+    )
@@ -0,0 +1,114 @@
+import json
+import logging
+import threading
+from prometheus_client import Counter
+
+LOG_RECORDS_SAMPLED_OUT = Counter(
+    'gamecon_log_records_sampled_out_total',
+    'Log records discarded by the per-operation sampling policy',
+    ['operation']
+)
+LOG_FIELDS_TRUNCATED = Counter(
+    'gamecon_log_fields_truncated_total',
+    'Log fields shortened to fit the per-field byte budget',
+    ['field']
+)
+
+DEFAULT_SAMPLE_RATES = 'request_start=10,health_check_success=10'
+
+
+def parse_sample_rates(spec):
+    """Parse 'operation=N,endpoint=N' into a dict of keep-1-in-N rates"""
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        key, value = item.split('=', 1)
+        try:
+            rate = int(value)
+        except ValueError:
+            continue
+        if key.strip() and rate > 1:
+            rates[key.strip()] = rate
+    return rates
+
+
+class LogSamplingFilter(logging.Filter):
+    """Keep only 1-in-N routine records per operation or endpoint.
+
+    Warnings and errors, records with an error status code and records slower
+    than ``slow_request_ms`` are always kept. Kept records of a sampled
+    operation carry ``sample_rate`` so dashboards can scale counts back up.
+    """
+
+    def __init__(self, rates, slow_request_ms=1000):
+        super().__init__()
+        self.rates = dict(rates)
+        self.slow_request_ms = slow_request_ms
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        fields = getattr(record, 'extra_fields', None)
+        if not self.rates or not isinstance(fields, dict) or record.levelno >= logging.WARNING:
+            return True
+        if fields.get('status_code', 0) >= 400 or fields.get('duration_ms', 0) >= self.slow_request_ms:
+            return True
+
+        key = fields.get('operation')
+        rate = self.rates.get(key)
+        if rate is None:
+            key = fields.get('endpoint')
+            rate = self.rates.get(key)
+        if rate is None:
+            return True
+
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % rate:
+            LOG_RECORDS_SAMPLED_OUT.labels(operation=fields.get('operation') or key).inc()
+            return False
+        # A copy: the caller may reuse its extra_fields dict for records that are not sampled
+        record.extra_fields = {**fields, 'sample_rate': rate}
+        return True
+
+
+def _encoded_size(value):
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def apply_field_budget(fields, max_bytes):
+    """Return a copy of ``fields`` where oversized lists and strings fit in ``max_bytes``.
+
+    Lists keep the leading items that fit and gain ``<name>_count`` and
+    ``<name>_truncated`` siblings, so the field keeps its type in the index.
+    Only the kept items are encoded, so the cost is bounded by the budget
+    rather than by the length of the list.
+    """
+    if not max_bytes or max_bytes <= 0:
+        return fields
+    budgeted = {}
+    for name, value in fields.items():
+        if isinstance(value, dict):
+            budgeted[name] = apply_field_budget(value, max_bytes)
+        elif isinstance(value, (list, tuple)):
+            kept = []
+            used = 2
+            for item in value:
+                used += _encoded_size(item) + 2
+                if used > max_bytes:
+                    break
+                kept.append(item)
+            budgeted[name] = kept
+            if len(kept) < len(value):
+                budgeted[f'{name}_count'] = len(value)
+                budgeted[f'{name}_truncated'] = True
+                LOG_FIELDS_TRUNCATED.labels(field=name).inc()
+        elif isinstance(value, str) and len(value) > max_bytes:
+            budgeted[name] = value[:max_bytes] + '...[truncated]'
+            budgeted[f'{name}_length'] = len(value)
+            LOG_FIELDS_TRUNCATED.labels(field=name).inc()
+        else:
+            budgeted[name] = value
+    return budgeted
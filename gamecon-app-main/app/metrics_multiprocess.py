@@ -0,0 +1,91 @@
+import os
+import glob
+import fcntl
+import contextlib
+from prometheus_client import CollectorRegistry
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+# Per-process files of these types are folded into one archive file when their worker exits
+ARCHIVED_TYPES = ('counter', 'histogram', 'summary')
+LOCK_FILE = '.compaction.lock'
+
+
+def multiprocess_dir():
+    """Directory shared by the worker processes' metric files, or None in single-process mode"""
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or None
+
+
+@contextlib.contextmanager
+def _directory_lock(path, exclusive):
+    with open(os.path.join(path, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class LockedMultiProcessCollector(MultiProcessCollector):
+    """MultiProcessCollector that never reads a dead worker's file while it is being archived"""
+
+    def collect(self):
+        with _directory_lock(self._path, exclusive=False):
+            return list(super().collect())
+
+
+def create_registry(path):
+    """Registry that merges every worker's metric files at scrape time"""
+    registry = CollectorRegistry()
+    LockedMultiProcessCollector(registry, path=path)
+    return registry
+
+
+def reset_multiprocess_dir(path):
+    """Start the server with an empty metrics directory (files of a previous run are stale)"""
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, '*.db')):
+        os.remove(stale)
+
+
+def archive_dead_worker(pid, path):
+    """Fold a dead worker's counter/histogram/summary files into ``<type>_archive.db``.
+
+    Counters must keep their totals after a worker exits, but with max-requests
+    recycling every new pid adds files that each scrape would have to open and
+    merge. Folding them into one archive per type keeps the scrape cost bound
+    to the number of live workers.
+    """
+    archived = 0
+    with _directory_lock(path, exclusive=True):
+        for typ in ARCHIVED_TYPES:
+            dead = os.path.join(path, f'{typ}_{pid}.db')
+            if not os.path.exists(dead):
+                continue
+            archive = os.path.join(path, f'{typ}_archive.db')
+            sources = [archive, dead] if os.path.exists(archive) else [dead]
+            merged = MultiProcessCollector.merge(sources, accumulate=False)
+
+            tmp = os.path.join(path, f'{typ}_archive.db.tmp')
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            values = MmapedDict(tmp)
+            try:
+                for metric in merged:
+                    for sample in metric.samples:
+                        labels = sample.labels
+                        key = mmap_key(metric.name, sample.name, list(labels), list(labels.values()),
+                                       metric.documentation)
+                        values.write_value(key, sample.value, 0.0)
+            finally:
+                values.close()
+            os.replace(tmp, archive)
+            os.remove(dead)
+            archived += 1
+    return archived
+
+
+def worker_exited(pid, path):
+    """Bookkeeping for a worker that exited: drop its live gauges and archive its totals"""
+    mark_process_dead(pid, path)
+    return archive_dead_worker(pid, path)
@@ -1,11 +1,107 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+# Read-only requests may read from a replica bind, see db_routing.install_read_routing()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Game(db.Model):
+    # Serve the keyset-paginated listing ordered by (title, id), also within a genre or platform
+    __table_args__ = (
+        db.Index('ix_game_title_id', 'title', 'id'),
+        db.Index('ix_game_genre_title_id', 'genre', 'title', 'id'),
+        db.Index('ix_game_platform_title_id', 'platform', 'title', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     genre = db.Column(db.String(50), nullable=False)
     platform = db.Column(db.String(50), nullable=False)
-    image_data = db.Column(db.LargeBinary, nullable=True)
+    # Image bytes live in the blob store, keyed by their SHA-256 content hash
+    image_hash = db.Column(db.String(64), nullable=True, index=True)
+    image_size = db.Column(db.Integer, nullable=True)
     image_mime = db.Column(db.String(50), nullable=True)
+    # Precomputed resized copies: {'<width>.<format>': size_in_bytes}
+    image_renditions = db.Column(db.JSON(none_as_null=True), nullable=True)
+    # None when the game has no image, otherwise pending/ready/failed while the image job runs
+    image_status = db.Column(db.String(20), nullable=True)
+
+    @property
+    def has_image(self):
+        return self.image_hash is not None
+
+class ImageJob(db.Model):
+    __tablename__ = 'image_job'
+    __table_args__ = (db.Index('ix_image_job_status_run_after', 'status', 'run_after'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)
+    url = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    request_id = db.Column(db.String(36), nullable=True)
+    # Unix timestamps
+    created_at = db.Column(db.Float, nullable=False)
+    run_after = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.Float, nullable=True)
+    finished_at = db.Column(db.Float, nullable=True)
+
+class CatalogueState(db.Model):
+    """Single row whose version is bumped by every committed catalogue change"""
+    __tablename__ = 'catalogue_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Writable game fields and their column lengths
+GAME_FIELDS = {'title': 100, 'genre': 50, 'platform': 50}
+
+def validate_game(item, partial=False, lenient=False):
+    """Return (values, image_url, error) for one game given as a dict (API item or import row).
+
+    ``lenient`` treats a blank ``image_url`` as no image, for import files
+    where an empty column is the only way to leave it out.
+    """
+    if not isinstance(item, dict):
+        return None, None, 'item must be an object'
+    values = {}
+    for field, max_length in GAME_FIELDS.items():
+        if field not in item:
+            if not partial:
+                return None, None, f"'{field}' is required"
+            continue
+        value = item[field]
+        if not isinstance(value, str) or not value.strip():
+            return None, None, f"'{field}' must be a non-empty string"
+        if len(value) > max_length:
+            return None, None, f"'{field}' is longer than {max_length} characters"
+        values[field] = value.strip()
+    image_url = item.get('image_url')
+    if image_url is not None and not isinstance(image_url, str):
+        return None, None, "'image_url' must be a non-empty string"
+    if image_url is not None and not image_url.strip():
+        if not lenient:
+            return None, None, "'image_url' must be a non-empty string"
+        image_url = None
+    return values, image_url.strip() if image_url else None, None
+
+def upgrade_schema():
+    """Add nullable columns and indexes that db.create_all() does not add to existing tables"""
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
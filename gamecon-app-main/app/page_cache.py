@@ -0,0 +1,250 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from flask import current_app, request
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Hit ratio: rate(gamecon_page_cache_requests_total{result="hit"}) / rate(gamecon_page_cache_requests_total)
+PAGE_CACHE_REQUESTS = Counter(
+    'gamecon_page_cache_requests_total',
+    'Rendered page cache lookups, by page and result',
+    ['page', 'result']
+)
+PAGE_CACHE_NOT_MODIFIED = Counter(
+    'gamecon_page_cache_not_modified_total',
+    'Page requests answered with 304 Not Modified',
+    ['page']
+)
+PAGE_CACHE_EVICTIONS = Counter(
+    'gamecon_page_cache_evictions_total',
+    'Rendered pages evicted to stay within PAGE_CACHE_MAX_BYTES'
+)
+PAGE_CACHE_BYTES = Gauge(
+    'gamecon_page_cache_bytes',
+    'Bytes of rendered pages held by the in-process page cache',
+    multiprocess_mode='livesum'
+)
+
+CachedPage = namedtuple('CachedPage', ['body', 'etag', 'last_modified', 'mimetype', 'stored_at'])
+
+
+class MemoryPageStore:
+    """In-process LRU of rendered pages, bounded by the total size of their bodies"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+            # Entries of older versions can never be hit again
+            self._entries.clear()
+            self._bytes = 0
+        PAGE_CACHE_BYTES.set(0)
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        size = len(page.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = page
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                PAGE_CACHE_EVICTIONS.inc()
+            total = self._bytes
+        PAGE_CACHE_BYTES.set(total)
+
+    def discard(self, key):
+        with self._lock:
+            page = self._entries.pop(key, None)
+            if page is not None:
+                self._bytes -= len(page.body)
+            total = self._bytes
+        PAGE_CACHE_BYTES.set(total)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+
+class RedisPageStore:
+    """Page store shared by every worker and replica.
+
+    The catalogue version is a Redis counter, so one INCR invalidates the
+    pages of all processes; entries of older versions expire after ``ttl``.
+    Size-bounded eviction is left to the server's ``maxmemory-policy allkeys-lru``.
+    """
+
+    def __init__(self, url, prefix='gamecon:pages:', ttl=60):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("PAGE_CACHE_BACKEND=redis requires the redis package") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def version(self):
+        return int(self._client.get(self.prefix + 'version') or 0)
+
+    def bump_version(self):
+        self._client.incr(self.prefix + 'version')
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CachedPage(data['body'].encode('utf-8'), data['etag'], data['last_modified'], data['mimetype'],
+                          data['stored_at'])
+
+    def put(self, key, page):
+        data = page._asdict()
+        data['body'] = page.body.decode('utf-8')
+        self._client.set(self.prefix + key, json.dumps(data), ex=max(1, int(self.ttl)))
+
+    def discard(self, key):
+        self._client.delete(self.prefix + key)
+
+
+class PageCache:
+    """Rendered HTML pages keyed by catalogue version.
+
+    Writes call ``invalidate()``, which moves the catalogue to a new version
+    so every page rendered before the write is skipped. Entries also expire
+    after ``ttl`` seconds, which bounds how long a process can serve pages
+    that predate writes made by other processes.
+    """
+
+    def __init__(self, store, ttl=60, clock=time.time):
+        self.store = store
+        self.ttl = ttl
+        self._clock = clock
+
+    def key(self, page, version, *parts):
+        return ':'.join([page, str(version), *[str(part) for part in parts]])
+
+    def version(self):
+        try:
+            return self.store.version()
+        except Exception as e:
+            self._backend_error('page_cache_version_error', e)
+            return None
+
+    def get(self, key):
+        try:
+            page = self.store.get(key)
+            if page is not None and self._clock() - page.stored_at >= self.ttl:
+                self.store.discard(key)
+                page = None
+        except Exception as e:
+            self._backend_error('page_cache_get_error', e)
+            return None
+        return page
+
+    def put(self, key, body, mimetype='text/html'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        now = self._clock()
+        page = CachedPage(body, hashlib.sha256(body).hexdigest()[:32], now, mimetype, now)
+        try:
+            self.store.put(key, page)
+        except Exception as e:
+            self._backend_error('page_cache_put_error', e)
+        return page
+
+    def invalidate(self):
+        """Start a new catalogue version after a committed write"""
+        try:
+            self.store.bump_version()
+        except Exception as e:
+            self._backend_error('page_cache_invalidate_error', e)
+
+    def _backend_error(self, operation, error):
+        # A broken shared backend degrades to rendering every page, never to an error page
+        logger.warning("Page cache backend error", extra={
+            'extra_fields': {
+                'operation': operation,
+                'error_type': type(error).__name__,
+                'error_message': str(error)
+            }
+        })
+
+
+def create_page_cache(config):
+    """Build the page cache selected by PAGE_CACHE_BACKEND ('memory', 'redis' or 'none')"""
+    backend = config.get('PAGE_CACHE_BACKEND', 'memory').lower()
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        store = MemoryPageStore(config['PAGE_CACHE_MAX_BYTES'])
+    elif backend == 'redis':
+        store = RedisPageStore(config['PAGE_CACHE_REDIS_URL'], ttl=config['PAGE_CACHE_TTL'])
+    else:
+        raise ValueError(f"Unknown PAGE_CACHE_BACKEND: {backend}")
+    return PageCache(store, ttl=config['PAGE_CACHE_TTL'])
+
+
+def invalidate_pages():
+    """Drop the rendered pages of the current app after a committed catalogue change"""
+    page_cache = getattr(current_app, 'page_cache', None)
+    if page_cache is not None:
+        page_cache.invalidate()
+
+
+def cached_page(page, parts, render):
+    """Serve a rendered page with ETag/Last-Modified, calling ``render()`` for its HTML only on a miss.
+
+    The key combines the page cache's catalogue version with the games summary
+    version, so a summary refresh that finds changes also retires old pages.
+    """
+    page_cache = getattr(current_app, 'page_cache', None)
+    entry, result = None, 'bypass'
+    if page_cache is not None:
+        store_version = page_cache.version()
+        if store_version is not None:
+            summary_version = current_app.games_summary.version
+            key = page_cache.key(page, f"{store_version}.{summary_version}", *parts)
+            entry = page_cache.get(key)
+            result = 'hit' if entry is not None else 'miss'
+            if entry is None:
+                entry = page_cache.put(key, render())
+    if entry is None:
+        body = render().encode('utf-8')
+        entry = CachedPage(body, hashlib.sha256(body).hexdigest()[:32], time.time(), 'text/html', time.time())
+    PAGE_CACHE_REQUESTS.labels(page=page, result=result).inc()
+
+    response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.last_modified = entry.last_modified
+    # Browsers may keep the page but must revalidate it, which costs a 304 at most
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Page-Cache'] = result
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        PAGE_CACHE_NOT_MODIFIED.labels(page=page).inc()
+    return response
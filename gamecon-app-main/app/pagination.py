@@ -0,0 +1,71 @@
+import json
+import base64
+from collections import namedtuple
+from sqlalchemy import tuple_
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor could not be decoded"""
+
+
+def encode_cursor(values):
+    """Opaque URL-safe cursor for a row's sort key"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Sort key stored in a cursor, one value per type in ``types``; raises InvalidCursor when it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor(f"Expected {len(types)} cursor values")
+    for value, expected in zip(values, types):
+        # bool is an int subclass, but never a valid sort key value
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise InvalidCursor(f"Expected {expected.__name__} cursor value")
+    return values
+
+
+def cursor_types(columns):
+    """Python types of the sort key columns, as decode_cursor expects them"""
+    return tuple(column.type.python_type for column in columns)
+
+
+def keyset_page(query, columns, limit, after=None, before=None):
+    """Return one page of ``query`` ordered by ``columns`` using keyset (seek) pagination.
+
+    ``columns`` must be a unique sort key such as ``(Game.title, Game.id)``
+    backed by a composite index, so each page costs one index range scan of
+    ``limit + 1`` rows no matter how deep it is. ``after`` and ``before`` are
+    cursors from a previous page's ``next_cursor`` / ``prev_cursor``.
+    """
+    key = tuple_(*columns)
+    if before is not None:
+        values = decode_cursor(before, cursor_types(columns))
+        rows = query.filter(key < tuple_(*values)) \
+            .order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_prev, has_next = has_more, True
+    else:
+        if after is not None:
+            values = decode_cursor(after, cursor_types(columns))
+            query = query.filter(key > tuple_(*values))
+        rows = query.order_by(*columns).limit(limit + 1).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = after is not None
+
+    names = [column.key for column in columns]
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(getattr(rows[-1], name) for name in names)
+    if rows and has_prev:
+        prev_cursor = encode_cursor(getattr(rows[0], name) for name in names)
+    return Page(rows, next_cursor, prev_cursor)
@@ -0,0 +1,93 @@
+import time
+import logging
+import threading
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import func, select, text
+from models import db, ImageJob
+from image_jobs import JOB_QUEUED
+
+probes_bp = Blueprint('probes', __name__)
+logger = logging.getLogger(__name__)
+
+# Kubernetes probes skip the request logging, metrics and games-summary hooks
+PROBE_ENDPOINTS = ('probes.livez', 'probes.readyz')
+PROBE_PATHS = ('/livez', '/readyz')
+
+
+class CachedCheck:
+    """Run ``check`` at most once per ``ttl`` seconds and serve its last result in between"""
+
+    def __init__(self, check, ttl, clock=time.monotonic):
+        self._check = check
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = None
+
+    def get(self):
+        with self._lock:
+            now = self._clock()
+            if self._checked_at is None or now - self._checked_at >= self._ttl:
+                self._result = self._check()
+                self._checked_at = self._clock()
+            return self._result
+
+
+def pool_state(engine):
+    """Connection pool occupancy (QueuePool only reports sizes)"""
+    pool = engine.pool
+    state = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if method is not None:
+            state[name] = method()
+    return state
+
+
+def _log_queue_depth():
+    depths = [handler.depth for handler in logging.getLogger().handlers if hasattr(handler, 'depth')]
+    return sum(depths) if depths else None
+
+
+def check_readiness():
+    """Whether the primary database answers, plus pool and backlog state (needs an app context)"""
+    started = time.time()
+    state = {
+        'pool': pool_state(db.engine),
+        'log_queue_depth': _log_queue_depth()
+    }
+    try:
+        # Straight to the primary engine, bypassing the session and read routing
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+            state['image_jobs_queued'] = connection.execute(
+                select(func.count()).select_from(ImageJob).where(ImageJob.status == JOB_QUEUED)
+            ).scalar()
+        state['database'] = 'ok'
+    except Exception as e:
+        state['database'] = 'error'
+        state['error'] = f"{type(e).__name__}: {e}"
+        logger.error("Readiness check failed", extra={
+            'extra_fields': {
+                'operation': 'readiness_check_failed',
+                'error_type': type(e).__name__,
+                'error_message': str(e)
+            }
+        })
+    state['check_ms'] = round((time.time() - started) * 1000, 2)
+    return state
+
+
+@probes_bp.route('/livez', methods=['GET'])
+def livez():
+    """Liveness: the process serves requests; never touches the database"""
+    return jsonify({'status': 'ok'})
+
+
+@probes_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: the database was reachable within the last READINESS_CACHE_SECONDS"""
+    state = current_app.readiness_check.get()
+    ready = state['database'] == 'ok'
+    return jsonify({'status': 'ok' if ready else 'error', **state}), 200 if ready else 503
@@ -0,0 +1,220 @@
+import os
+import re
+import sys
+import hmac
+import time
+import random
+import logging
+import threading
+from collections import Counter as StackCounter
+from flask import Blueprint, Response, abort, current_app, g, jsonify, request
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+profiling_bp = Blueprint('profiling', __name__, url_prefix='/admin/profiles')
+
+# Requests carrying PROFILE_SECRET in this header are profiled, and may fetch the profiles
+PROFILE_HEADER = 'X-Gamecon-Profile'
+MAX_STACK_DEPTH = 128
+# Distinct stacks kept per endpoint; further new stacks are counted under one placeholder
+MAX_STACKS_PER_ENDPOINT = 5000
+TRUNCATED_STACK = '[other stacks]'
+
+PROFILED_REQUESTS = Counter(
+    'gamecon_profiled_requests_total',
+    'Requests run under the sampling profiler, by endpoint and what triggered it',
+    ['endpoint', 'trigger']
+)
+
+
+def collapse_stack(frame):
+    """``file:function;...`` from the outermost frame to ``frame``, as flamegraph.pl expects"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def profile_filename(endpoint):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint) + f'.{os.getpid()}.collapsed'
+
+
+class SamplingProfiler:
+    """Statistical profiler for selected requests, aggregated per endpoint.
+
+    One daemon thread per process wakes every ``interval`` seconds while a
+    profiled request is running and records the stack of each profiled
+    request thread from ``sys._current_frames()``. Unprofiled requests pay a
+    header lookup and a random draw; with PROFILING_ENABLED unset there is no
+    profiler at all.
+    """
+
+    def __init__(self, secret='', sample_rate=0.0, interval=0.005, output_dir=''):
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self.stacks = {}
+        self.samples = StackCounter()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def authorized(self):
+        """Whether the current request carries the profiling secret"""
+        supplied = request.headers.get(PROFILE_HEADER, '')
+        return bool(self.secret) and hmac.compare_digest(supplied.encode('utf-8'), self.secret.encode('utf-8'))
+
+    def trigger(self):
+        """Why the current request should be profiled, or None"""
+        if self.authorized():
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def start_request(self):
+        """Profile the current request if it asked for it or was sampled"""
+        trigger = self.trigger()
+        if trigger is None:
+            return
+        self._ensure_thread()
+        g.profile = {'thread': threading.get_ident(), 'endpoint': request.endpoint or 'unknown',
+                     'trigger': trigger, 'samples': 0}
+        with self._lock:
+            self._active[g.profile['thread']] = g.profile
+        self._wake.set()
+
+    def finish_request(self, response=None):
+        """Stop sampling the current request; safe to call more than once"""
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        with self._lock:
+            self._active.pop(profile['thread'], None)
+        PROFILED_REQUESTS.labels(endpoint=profile['endpoint'], trigger=profile['trigger']).inc()
+        if response is not None:
+            response.headers['X-Profile-Samples'] = str(profile['samples'])
+        if self.output_dir:
+            self.write(profile['endpoint'])
+        return response
+
+    def collapsed(self, endpoint):
+        """This process's aggregated stacks of ``endpoint`` in collapsed-stack format"""
+        with self._lock:
+            stacks = dict(self.stacks.get(endpoint, {}))
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def write(self, endpoint):
+        path = os.path.join(self.output_dir, profile_filename(endpoint))
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as profile_file:
+                profile_file.write(self.collapsed(endpoint))
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning("Could not write profile", extra={
+                'extra_fields': {
+                    'operation': 'profile_write_error',
+                    'profile_path': path,
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+
+    def sample_counts(self):
+        with self._lock:
+            return dict(self.samples)
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples.clear()
+
+    def sample(self):
+        """Record one stack of every profiled request thread"""
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, profile in self._active.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stacks = self.stacks.setdefault(profile['endpoint'], StackCounter())
+                stack = collapse_stack(frame)
+                if stack not in stacks and len(stacks) >= MAX_STACKS_PER_ENDPOINT:
+                    stack = TRUNCATED_STACK
+                stacks[stack] += 1
+                self.samples[profile['endpoint']] += 1
+                profile['samples'] += 1
+            return bool(self._active)
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Stacks inherited from the gunicorn master belong to no worker
+            self.stacks.clear()
+            self.samples.clear()
+            self._active.clear()
+            threading.Thread(target=self._run, name='gamecon-profiler', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            while self.sample():
+                time.sleep(self.interval)
+            self._wake.clear()
+            # A request may have started between the last sample and clear()
+            if self._active:
+                self._wake.set()
+
+
+def create_profiler(config):
+    """SamplingProfiler configured from PROFILING_*, or None when profiling is disabled"""
+    if not config.get('PROFILING_ENABLED'):
+        return None
+    return SamplingProfiler(
+        secret=config['PROFILE_SECRET'],
+        sample_rate=config['PROFILE_SAMPLE_RATE'],
+        interval=config['PROFILE_INTERVAL_MS'] / 1000.0,
+        output_dir=config['PROFILE_DIR']
+    )
+
+
+@profiling_bp.before_request
+def require_secret():
+    profiler = getattr(current_app, 'profiler', None)
+    if profiler is None or not profiler.authorized():
+        abort(404)
+
+
+@profiling_bp.route('', methods=['GET'])
+def list_profiles():
+    """Endpoints with samples in this worker process"""
+    profiler = current_app.profiler
+    return jsonify({'pid': os.getpid(), 'interval_ms': profiler.interval * 1000,
+                    'samples': profiler.sample_counts()})
+
+
+@profiling_bp.route('/<endpoint>', methods=['GET'])
+def get_profile(endpoint):
+    """Collapsed stacks of one endpoint: pipe into flamegraph.pl or load in speedscope"""
+    body = current_app.profiler.collapsed(endpoint)
+    if not body:
+        abort(404)
+    return Response(body, mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={profile_filename(endpoint)}'})
+
+
+@profiling_bp.route('', methods=['DELETE'])
+def reset_profiles():
+    current_app.profiler.reset()
+    return '', 204
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from prometheus_client import Histogram
+from sql_instrumentation import request_sql_stats
+
+logger = logging.getLogger(__name__)
+
+REQUEST_PHASE_DURATION = Histogram(
+    'gamecon_request_phase_seconds',
+    'Time one request spent in each phase (db, render, image_fetch, image_store, commit, logging)',
+    ['endpoint', 'phase'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+
+class RequestTimeline:
+    """Phase spans of one request, as offsets in seconds from its start.
+
+    Phases may nest (a commit's statements also count as db time), so the
+    per-phase totals are not meant to add up to the request duration.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans = []
+        self.totals = defaultdict(float)
+
+    def offset(self):
+        return time.perf_counter() - self._started
+
+    def add(self, name, start, end):
+        self.spans.append((name, start, end))
+        self.totals[name] += end - start
+
+    def phases(self):
+        """Seconds per phase, including the request's SQL time as ``db``"""
+        phases = dict(self.totals)
+        stats = request_sql_stats()
+        if stats is not None and stats.count:
+            phases['db'] = stats.seconds
+        return phases
+
+    def phases_ms(self):
+        return {name: round(seconds * 1000, 2) for name, seconds in self.phases().items()}
+
+
+def current_timeline():
+    """Timeline of the current request, or None outside a request"""
+    if not has_request_context():
+        return None
+    return g.get('request_timeline')
+
+
+@contextmanager
+def request_phase(name):
+    """Time a block (or, as a decorator, a function) as phase ``name`` of the current request.
+
+    Outside a request (CLI commands, image jobs) it only runs the block.
+    """
+    timeline = current_timeline()
+    if timeline is None:
+        yield
+        return
+    start = timeline.offset()
+    try:
+        yield
+    finally:
+        timeline.add(name, start, timeline.offset())
+
+
+class TraceFileExporter:
+    """Appends request waterfalls to a Chrome trace event file (open it in Perfetto or chrome://tracing).
+
+    ``{pid}`` in the path is replaced by the worker's process id so gunicorn
+    workers never interleave writes. The trace format tolerates the missing
+    closing bracket, so the file stays loadable while it grows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def _open(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            path = self.path.replace('{pid}', str(pid))
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+            if self._file.tell() == 0:
+                self._file.write('[\n')
+            self._pid = pid
+        return self._file
+
+    def export(self, timeline, duration, endpoint, request_id):
+        pid, tid = os.getpid(), threading.get_ident()
+        base = timeline.started_at * 1e6
+        args = {'request_id': request_id, 'endpoint': endpoint}
+        events = [{'name': f"{request.method} {endpoint}", 'cat': 'request', 'ph': 'X', 'ts': round(base),
+                   'dur': round(duration * 1e6), 'pid': pid, 'tid': tid, 'args': args}]
+        for name, start, end in timeline.spans:
+            events.append({'name': name, 'cat': 'phase', 'ph': 'X', 'ts': round(base + start * 1e6),
+                           'dur': round((end - start) * 1e6), 'pid': pid, 'tid': tid, 'args': args})
+        lines = ''.join(json.dumps(event) + ',\n' for event in events)
+        try:
+            with self._lock:
+                trace_file = self._open()
+                trace_file.write(lines)
+                trace_file.flush()
+        except OSError as e:
+            logger.warning("Could not write request trace", extra={
+                'extra_fields': {
+                    'operation': 'trace_export_error',
+                    'trace_file': self.path,
+                    'error_type': type(e).__name__,
+                    'error_message': str(e)
+                }
+            })
+
+
+def install_request_phases(app, skip_endpoints=()):
+    """Give every request a timeline, time template rendering and export the phases per endpoint.
+
+    Install it before the other request hooks so their work falls inside the
+    timeline. With TRACE_FILE set each request's spans are also written to a
+    local trace file.
+    """
+    exporter = TraceFileExporter(app.config['TRACE_FILE']) if app.config.get('TRACE_FILE') else None
+    app.trace_exporter = exporter
+
+    def start_render(sender, template, context, **extra):
+        timeline = current_timeline()
+        if timeline is not None:
+            g.render_started = timeline.offset()
+
+    def end_render(sender, template, context, **extra):
+        timeline = current_timeline()
+        if timeline is not None and g.get('render_started') is not None:
+            timeline.add('render', g.pop('render_started'), timeline.offset())
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(end_render, app, weak=False)
+
+    @app.before_request
+    def start_timeline():
+        if request.endpoint not in skip_endpoints:
+            g.request_timeline = RequestTimeline()
+
+    @app.after_request
+    def record_phases(response):
+        timeline = g.get('request_timeline')
+        if timeline is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        for name, seconds in timeline.phases().items():
+            REQUEST_PHASE_DURATION.labels(endpoint=endpoint, phase=name).observe(seconds)
+        if exporter is not None:
+            exporter.export(timeline, timeline.offset(), endpoint, g.get('request_id', 'unknown'))
+        return response
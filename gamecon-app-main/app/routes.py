@@ -1,13 +1,26 @@
 import os
+import time
 import requests
 import logging
-from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, g
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, g, abort
+from werkzeug.wsgi import wrap_file
 from werkzeug.utils import secure_filename
 from models import db, Game
+from blob_store import content_hash
+from image_jobs import IMAGE_PENDING, IMAGE_READY, JOB_FETCH_IMAGE, JOB_RENDITIONS
+from config import Config
+from http_client import ImageHttpClient, ResponseTooLarge
+from pagination import InvalidCursor, cursor_types, decode_cursor, keyset_page
+from search import SEARCH_MODES, search_games_query
+from page_cache import cached_page, invalidate_pages
+from catalogue_events import publish as publish_catalogue_change
+from request_phases import request_phase
+from image_pipeline import RENDITION_MIMETYPES, choose_rendition, delete_renditions, parse_widths, rendition_key
 from prometheus_flask_exporter import PrometheusMetrics
 from sqlalchemy import text
 
 bp = Blueprint('routes', __name__)
+DEFAULT_IMAGE_MAX_BYTES = 16 * 1024 * 1024
 logger = logging.getLogger(__name__)
 
 def allowed_file(filename):
@@ -16,6 +29,9 @@ def allowed_file(filename):
 def get_current_game_names():
     """Get list of current game names for logging context"""
     try:
+        games_summary = getattr(current_app, 'games_summary', None)
+        if games_summary is not None:
+            return [{'id': game['id'], 'title': game['title']} for game in games_summary.summary()['games_detail']]
         games = Game.query.with_entities(Game.id, Game.title).all()
         return [{'id': game.id, 'title': game.title} for game in games]
     except Exception as e:
@@ -28,9 +44,42 @@ def get_current_game_names():
         })
         return []
 
-def download_image_from_url(image_url):
+_default_http_client = None
+
+def get_image_http_client():
+    """Shared client for remote images; apps built without create_app get an uncached one"""
+    global _default_http_client
+    client = getattr(current_app, 'image_http_client', None)
+    if client is not None:
+        return client
+    if _default_http_client is None:
+        _default_http_client = ImageHttpClient(user_agent=Config.IMAGE_HTTP_USER_AGENT)
+    return _default_http_client
+
+@request_phase('image_store')
+def store_image_blob(image_data, image_mime):
+    """Save image bytes in the blob store and return their content hash and size"""
+    image_hash = content_hash(image_data)
+    # Always written (content-addressed, so idempotent): skipping a key that exists lets a concurrent
+    # release_image_blob delete it between the check and this request committing its reference
+    current_app.blob_store.put(image_hash, image_data, content_type=image_mime)
+    return image_hash, len(image_data)
+
+def release_image_blob(image_hash):
+    """Delete an image blob once no game references it any more"""
+    if not image_hash:
+        return
+    if db.session.query(Game.id).filter_by(image_hash=image_hash).first() is None:
+        current_app.blob_store.delete(image_hash)
+        delete_renditions(current_app.blob_store, image_hash,
+                          parse_widths(current_app.config['IMAGE_RENDITION_WIDTHS']))
+
+@request_phase('image_fetch')
+def download_image_from_url(image_url, max_bytes=None):
     """Download image from URL or process data URL and return image data and mime type"""
     request_id = getattr(g, 'request_id', 'unknown')
+    if max_bytes is None:
+        max_bytes = current_app.config.get('IMAGE_MAX_BYTES', DEFAULT_IMAGE_MAX_BYTES)
     
     try:
         logger.info("Starting image download", extra={
@@ -52,6 +101,8 @@ def download_image_from_url(image_url):
                 # Extract mime type from header (data:image/jpeg;base64)
                 mime_type = header.split(':')[1].split(';')[0]
                 # Decode the base64 data
+                if len(data) * 3 // 4 > max_bytes:
+                    raise ValueError(f"Image larger than {max_bytes} bytes")
                 image_data = base64.b64decode(data)
                 
                 logger.info("Data URL processed successfully", extra={
@@ -76,10 +127,6 @@ def download_image_from_url(image_url):
                 return None, None
         else:
             # Regular HTTP URL - download the image
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
             logger.info("Downloading image from HTTP URL", extra={
                 'extra_fields': {
                     'request_id': request_id,
@@ -88,33 +135,45 @@ def download_image_from_url(image_url):
                 }
             })
             
-            response = requests.get(image_url, timeout=10, headers=headers)
-            response.raise_for_status()
+            # Pooled keep-alive connection, disk cache and conditional revalidation;
+            # the body is streamed so a huge or endless response is cut off at max_bytes
+            try:
+                result = get_image_http_client().fetch(image_url, max_bytes, content_type_prefix='image/')
+            except ResponseTooLarge:
+                logger.warning("Downloaded image exceeds size limit", extra={
+                    'extra_fields': {
+                        'request_id': request_id,
+                        'operation': 'image_too_large',
+                        'max_bytes': max_bytes
+                    }
+                })
+                return None, None
             
             # Check if the response is an image
-            content_type = response.headers.get('content-type', '')
-            if not content_type.startswith('image/'):
+            content_type = result.content_type
+            if result.content is None:
                 logger.warning("Downloaded content is not an image", extra={
                     'extra_fields': {
                         'request_id': request_id,
                         'operation': 'invalid_image_content',
-                        'content_type': content_type,
-                        'response_size': len(response.content)
+                        'content_type': content_type
                     }
                 })
                 return None, None
+            image_data = result.content
             
             logger.info("Image downloaded successfully", extra={
                 'extra_fields': {
                     'request_id': request_id,
                     'operation': 'http_image_downloaded',
                     'content_type': content_type,
-                    'image_size_bytes': len(response.content),
-                    'response_status': response.status_code
+                    'image_size_bytes': len(image_data),
+                    'response_status': result.status_code,
+                    'cache_result': result.cache_result
                 }
             })
                 
-            return response.content, content_type
+            return image_data, content_type
             
     except requests.RequestException as e:
         logger.error("HTTP request error during image download", extra={
@@ -142,8 +201,20 @@ def download_image_from_url(image_url):
 def home():
     request_id = getattr(g, 'request_id', 'unknown')
     
+    after, before = request.args.get('after'), request.args.get('before')
     try:
-        games = Game.query.order_by(Game.title.asc()).all()
+        for cursor in (after, before):
+            if cursor is not None:
+                decode_cursor(cursor, cursor_types((Game.title, Game.id)))
+    except InvalidCursor:
+        abort(400)
+    
+    def render():
+        # One page of list columns only; images are never loaded for the listing
+        query = db.session.query(Game.id, Game.title, Game.genre, Game.platform)
+        page = keyset_page(query, (Game.title, Game.id), current_app.config['GAMES_PAGE_SIZE'],
+                           after=after, before=before)
+        games = page.items
         game_names = [game.title for game in games]
         
         logger.info("Home page loaded", extra={
@@ -151,12 +222,18 @@ def home():
                 'request_id': request_id,
                 'operation': 'home_page_load',
                 'games_count': len(games),
+                'has_next_page': page.next_cursor is not None,
+                'has_prev_page': page.prev_cursor is not None,
                 'current_game_names': game_names,
-                'games_summary': f"Games in app: {', '.join(game_names[:5])}" + (f" and {len(game_names) - 5} more" if len(game_names) > 5 else "")
+                'games_summary': f"Games on page: {', '.join(game_names[:5])}" + (f" and {len(game_names) - 5} more" if len(game_names) > 5 else "")
             }
         })
         
-        return render_template("index.html", games=games)
+        return render_template("index.html", games=games, page=page)
+    
+    try:
+        # Rendered pages are cached per catalogue version and cursor
+        return cached_page('home', (after or '', before or ''), render)
     except Exception as e:
         logger.error("Error loading home page", extra={
             'extra_fields': {
@@ -168,6 +245,64 @@ def home():
         })
         raise
 
+def _search_page():
+    """Run the search described by the query string and return (filters, page)"""
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'genre': request.args.get('genre', '').strip(),
+        'platform': request.args.get('platform', '').strip(),
+        'match': request.args.get('match', 'substring')
+    }
+    after, before = request.args.get('after'), request.args.get('before')
+    if filters['match'] not in SEARCH_MODES:
+        abort(400)
+    try:
+        for cursor in (after, before):
+            if cursor is not None:
+                decode_cursor(cursor, cursor_types((Game.title, Game.id)))
+    except InvalidCursor:
+        abort(400)
+    
+    started = time.time()
+    query = search_games_query(q=filters['q'], genre=filters['genre'], platform=filters['platform'],
+                               match=filters['match'])
+    page = keyset_page(query, (Game.title, Game.id), current_app.config['GAMES_PAGE_SIZE'],
+                       after=after, before=before)
+    
+    logger.info("Games searched", extra={
+        'extra_fields': {
+            'request_id': getattr(g, 'request_id', 'unknown'),
+            'operation': 'game_search',
+            'query_length': len(filters['q']),
+            'genre': filters['genre'] or None,
+            'platform': filters['platform'] or None,
+            'match': filters['match'],
+            'results_count': len(page.items),
+            'has_next_page': page.next_cursor is not None,
+            'duration_ms': round((time.time() - started) * 1000, 2)
+        }
+    })
+    return {name: value for name, value in filters.items() if value}, page
+
+@bp.route("/games/search", methods=["GET"])
+def search_games():
+    """Search games by title (substring or prefix) and filter by genre and platform"""
+    filters, page = _search_page()
+    return render_template("index.html", games=page.items, page=page, filters=filters)
+
+@bp.route("/games/search.json", methods=["GET"])
+def search_games_json():
+    """JSON variant of the game search"""
+    filters, page = _search_page()
+    return jsonify({
+        'games': [
+            {'id': game.id, 'title': game.title, 'genre': game.genre, 'platform': game.platform}
+            for game in page.items
+        ],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
 @bp.route("/games/new", methods=["GET", "POST"])
 def new_game():
     request_id = getattr(g, 'request_id', 'unknown')
@@ -197,10 +332,14 @@ def new_game():
         
         image_data = None
         image_mime = None
+        image_hash = None
+        image_size = None
         
-        # If URL is provided, download the image
-        if image_url and image_url.strip():
-            image_data, image_mime = download_image_from_url(image_url.strip())
+        # Data URLs are decoded inline; remote URLs are fetched by the background image job queue
+        image_url = image_url.strip() if image_url else ''
+        remote_image_url = image_url if image_url and not image_url.startswith('data:') else None
+        if image_url and not remote_image_url:
+            image_data, image_mime = download_image_from_url(image_url)
             if not image_data:
                 logger.warning("Game creation failed due to image download error", extra={
                     'extra_fields': {
@@ -214,15 +353,29 @@ def new_game():
                 return render_template("create_game.html", error="Could not download image from URL. Please check the URL and try again.")
 
         try:
+            if image_data:
+                image_hash, image_size = store_image_blob(image_data, image_mime)
             new_game = Game(
                 title=title,
                 genre=genre,
                 platform=platform,
-                image_data=image_data,
-                image_mime=image_mime
+                image_hash=image_hash,
+                image_size=image_size,
+                image_mime=image_mime,
+                image_status=IMAGE_READY if image_hash else (IMAGE_PENDING if remote_image_url else None)
             )
             db.session.add(new_game)
-            db.session.commit()
+            db.session.flush()
+            if remote_image_url:
+                current_app.image_jobs.enqueue(new_game.id, JOB_FETCH_IMAGE, url=remote_image_url)
+            elif image_hash:
+                current_app.image_jobs.enqueue(new_game.id, JOB_RENDITIONS)
+            publish_catalogue_change('added', game=new_game)
+            with request_phase('commit'):
+                db.session.commit()
+            current_app.games_summary.game_added(new_game)
+            invalidate_pages()
+            current_app.image_jobs.notify()
             
             # Get updated game list for logging
             updated_games = get_current_game_names()
@@ -234,6 +387,7 @@ def new_game():
                     'game_id': new_game.id,
                     'game_title': title,
                     'has_image': bool(image_data),
+                    'image_status': new_game.image_status,
                     'total_games_after_creation': len(updated_games),
                     'all_game_names_after_creation': [game['title'] for game in updated_games],
                     'newly_added_game': {'id': new_game.id, 'title': title, 'genre': genre, 'platform': platform}
@@ -273,7 +427,7 @@ def new_game():
 def show_game(id):
     request_id = getattr(g, 'request_id', 'unknown')
     
-    try:
+    def render():
         game = Game.query.get_or_404(id)
         current_games = get_current_game_names()
         
@@ -292,6 +446,9 @@ def show_game(id):
         })
         
         return render_template("game_detail.html", game=game)
+    
+    try:
+        return cached_page('game', (id,), render)
     except Exception as e:
         logger.error("Error viewing game details", extra={
             'extra_fields': {
@@ -304,6 +461,79 @@ def show_game(id):
         })
         raise
 
+@bp.route("/games/<int:id>/image", methods=["GET"])
+def game_image(id):
+    """Stream the raw image bytes with a content-derived ETag and Range support"""
+    request_id = getattr(g, 'request_id', 'unknown')
+    
+    image = db.session.query(
+        Game.image_hash, Game.image_size, Game.image_mime, Game.image_renditions
+    ).filter(Game.id == id).first()
+    if image is None or not image.image_hash:
+        abort(404)
+    
+    # ?w=<css px>&f=<format> names one rendition; ?w= alone picks the smallest that fits, in WebP when accepted
+    blob_key, mimetype, size = image.image_hash, image.image_mime, image.image_size
+    width = request.args.get('w', type=int)
+    fmt = request.args.get('f')
+    rendition = None
+    if width and fmt and image.image_renditions and f'{width}.{fmt}' in image.image_renditions:
+        rendition = (f'{width}.{fmt}', image.image_renditions[f'{width}.{fmt}'])
+    # Only the original and a named rendition are fixed by the URL; negotiated responses, including
+    # the original standing in for renditions not built yet, must not stick in shared caches
+    fixed = not width or rendition is not None
+    negotiated = not fixed
+    if negotiated:
+        accept_webp = 'image/webp' in request.accept_mimetypes.values()
+        rendition = choose_rendition(image.image_renditions, width, accept_webp)
+    if rendition is not None:
+        name, size = rendition
+        rendition_width, rendition_fmt = name.split('.', 1)
+        blob_key = rendition_key(image.image_hash, rendition_width, rendition_fmt)
+        mimetype = RENDITION_MIMETYPES[rendition_fmt]
+    
+    # The ETag is derived from the content hash, so a matching If-None-Match never needs the blob
+    if blob_key in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(blob_key)
+    else:
+        blob = current_app.blob_store.open(blob_key)
+        if blob is None:
+            abort(404)
+        response = current_app.response_class(
+            wrap_file(request.environ, blob),
+            mimetype=mimetype or 'application/octet-stream',
+            direct_passthrough=True
+        )
+        response.content_length = size
+        response.set_etag(blob_key)
+        response = response.make_conditional(request, accept_ranges=True, complete_length=size)
+    if negotiated:
+        response.vary.add('Accept')
+    
+    # URLs carrying the content hash and naming the representation never change meaning,
+    # anything else must revalidate
+    if fixed and request.args.get('v') == image.image_hash[:16]:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['IMAGE_CACHE_MAX_AGE']
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    
+    logger.info("Game image served", extra={
+        'extra_fields': {
+            'request_id': request_id,
+            'operation': 'game_image_view',
+            'game_id': id,
+            'image_size_bytes': size,
+            'rendition': blob_key[len(image.image_hash) + 1:] or 'original',
+            'status_code': response.status_code,
+            'range_request': request.range is not None
+        }
+    })
+    
+    return response
+
 @bp.route("/games/<int:id>/edit", methods=["GET", "POST"])
 def edit_game(id):
     request_id = getattr(g, 'request_id', 'unknown')
@@ -341,14 +571,31 @@ def edit_game(id):
             })
 
             # Handle URL-based image update
+            # Replacement images are fetched by the background image job queue
             image_url = request.form.get("image_url")
-            if image_url and image_url.strip():
-                image_data, image_mime = download_image_from_url(image_url.strip())
+            image_url = image_url.strip() if image_url else ''
+            old_image_hash = game.image_hash
+            if image_url.startswith('data:'):
+                image_data, image_mime = download_image_from_url(image_url)
                 if image_data:
-                    game.image_data = image_data
+                    game.image_hash, game.image_size = store_image_blob(image_data, image_mime)
                     game.image_mime = image_mime
+                    game.image_status = IMAGE_READY
+                    if game.image_hash != old_image_hash:
+                        game.image_renditions = None
+                        current_app.image_jobs.enqueue(game.id, JOB_RENDITIONS)
+            elif image_url:
+                game.image_status = IMAGE_PENDING
+                current_app.image_jobs.enqueue(game.id, JOB_FETCH_IMAGE, url=image_url)
 
-            db.session.commit()
+            publish_catalogue_change('updated', game=game)
+            with request_phase('commit'):
+                db.session.commit()
+            current_app.games_summary.game_updated(game)
+            invalidate_pages()
+            current_app.image_jobs.notify()
+            if old_image_hash != game.image_hash:
+                release_image_blob(old_image_hash)
             
             # Get updated game list
             updated_games = get_current_game_names()
@@ -405,6 +652,7 @@ def delete_game_web(id):
         game_title = game.title
         game_genre = game.genre
         game_platform = game.platform
+        game_image_hash = game.image_hash
         
         # Get current games before deletion
         current_games = get_current_game_names()
@@ -425,7 +673,12 @@ def delete_game_web(id):
         })
         
         db.session.delete(game)
-        db.session.commit()
+        publish_catalogue_change('removed', game_id=id)
+        with request_phase('commit'):
+            db.session.commit()
+        current_app.games_summary.game_removed(id)
+        invalidate_pages()
+        release_image_blob(game_image_hash)
         
         # Get updated game list after deletion
         remaining_games = get_current_game_names()
@@ -459,12 +712,13 @@ def delete_game_web(id):
         })
         raise
 
-@bp.route("/health", methods=["GET"])
-def health_check():
+def health_report():
+    """Detailed health payload and status code; served through the HEALTH_CACHE_SECONDS cache"""
     request_id = getattr(g, 'request_id', 'unknown')
     
     try:
-        db.session.execute(text('SELECT 1'))
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
         
         # Include game count and names in health check
         current_games = get_current_game_names()
@@ -479,11 +733,12 @@ def health_check():
             }
         })
         
-        return jsonify({
+        return {
             "status": "ok", 
             "games_count": len(current_games),
-            "games": [g['title'] for g in current_games]
-        }), 200
+            "games": [g['title'] for g in current_games],
+            "checked_at": time.time()
+        }, 200
     except Exception as e:
         logger.error("Health check failed", extra={
             'extra_fields': {
@@ -494,7 +749,13 @@ def health_check():
                 'error_message': str(e)
             }
         })
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return {"status": "error", "message": str(e), "checked_at": time.time()}, 500
+
+@bp.route("/health", methods=["GET"])
+def health_check():
+    """Detailed health for humans and dashboards; Kubernetes probes use /livez and /readyz"""
+    payload, status = current_app.health_report.get()
+    return jsonify(payload), status
 
 @bp.route("/metrics")
 def metrics():
@@ -0,0 +1,167 @@
+import os
+import math
+import time
+import logging
+import statistics
+import tracemalloc
+from flask import g, request_finished
+from sqlalchemy import func
+from models import db, Game
+from log_format import JSONFormatter
+
+# (name, method, path); {id} is replaced by an existing game id
+REPORT_ROUTES = (
+    ('home', 'GET', '/'),
+    ('game', 'GET', '/games/{id}'),
+    ('search', 'GET', '/games/search?q=Dragon'),
+    ('new_form', 'GET', '/games/new'),
+    ('edit_form', 'GET', '/games/{id}/edit'),
+    ('create', 'POST', '/games/new'),
+    ('api_list', 'GET', '/api/v1/games'),
+    ('health', 'GET', '/health'),
+    ('metrics', 'GET', '/metrics'),
+)
+# Metrics whose growth with the row count is reported as an exponent (1.0 = linear)
+SCALING_METRICS = ('latency_ms', 'db_time_ms', 'db_query_count', 'peak_memory_kb', 'response_bytes', 'log_bytes')
+
+
+class LogBytesHandler(logging.Handler):
+    """Counts the bytes the app's records take as production JSON log lines"""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JSONFormatter(field_max_bytes=int(os.environ.get('LOG_FIELD_MAX_BYTES', '2048'))))
+        self.bytes = 0
+
+    def emit(self, record):
+        self.bytes += len(self.format(record).encode('utf-8')) + 1
+
+
+def catalogue_size():
+    return db.session.query(func.count(Game.id)).scalar()
+
+
+def growth_exponent(small, large, small_rows, large_rows):
+    """k in metric ~ rows^k between two catalogue sizes, or None when it can't be estimated"""
+    if not small or not large or small <= 0 or large <= 0 or large_rows <= small_rows:
+        return None
+    return round(math.log(large / small) / math.log(large_rows / small_rows), 2)
+
+
+def measure_route(client, method, path, data, repeat, log_handler):
+    """Median latency, SQL and log bytes over ``repeat`` requests, plus one traced request for memory"""
+    stats = []
+
+    def capture(sender, response, **extra):
+        sql = g.get('sql_stats')
+        stats.append((sql.count, sql.time_ms) if sql is not None else (0, 0.0))
+
+    samples = []
+    with request_finished.connected_to(capture, client.application):
+        for _ in range(repeat):
+            logged_before = log_handler.bytes
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            samples.append({
+                'latency_ms': elapsed * 1000,
+                'response_bytes': len(response.get_data()),
+                'log_bytes': log_handler.bytes - logged_before,
+                'status': response.status_code
+            })
+
+        # Allocation peak of one more request; tracing slows it down, so it is not timed
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            client.open(path, method=method, data=data)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'status': samples[-1]['status'],
+        'latency_ms': round(statistics.median(sample['latency_ms'] for sample in samples), 2),
+        'db_query_count': statistics.median(count for count, _ in stats[:repeat]) if stats else 0,
+        'db_time_ms': round(statistics.median(time_ms for _, time_ms in stats[:repeat]), 2) if stats else 0.0,
+        'peak_memory_kb': round(peak / 1024, 1),
+        'response_bytes': max(sample['response_bytes'] for sample in samples),
+        'log_bytes': round(statistics.median(sample['log_bytes'] for sample in samples))
+    }
+
+
+def run_scale_report(app, sizes, grow, repeat=3, routes=REPORT_ROUTES, progress=None):
+    """Grow the catalogue through ``sizes`` and measure every route at each size (needs an app context).
+
+    ``grow(count)`` adds ``count`` games. The page cache is bypassed and the
+    log handlers are swapped for a byte counter while measuring, so every
+    request renders and nothing is written to stdout.
+    """
+    client = app.test_client()
+    log_handler = LogBytesHandler()
+    root = logging.getLogger()
+    saved_handlers, saved_page_cache = root.handlers[:], app.page_cache
+    root.handlers = [log_handler]
+    app.page_cache = None
+    report = {'sizes': {}, 'repeat': repeat}
+    try:
+        for size in sorted(sizes):
+            current = catalogue_size()
+            if current < size:
+                grow(size - current)
+                current = catalogue_size()
+            app.games_summary.invalidate()
+            game_id = db.session.query(func.max(Game.id)).scalar()
+            db.session.remove()
+            results = {}
+            for name, method, path in routes:
+                data = {'title': f'Scale Report {current}', 'genre': 'RPG', 'platform': 'PC', 'image_url': ''} \
+                    if method == 'POST' else None
+                results[name] = measure_route(client, method, path.format(id=game_id), data, repeat, log_handler)
+            report['sizes'][str(current)] = results
+            if progress is not None:
+                progress(current, results)
+    finally:
+        root.handlers = saved_handlers
+        app.page_cache = saved_page_cache
+
+    rows = sorted(int(size) for size in report['sizes'])
+    report['growth_exponents'] = {}
+    if len(rows) > 1:
+        small, large = report['sizes'][str(rows[0])], report['sizes'][str(rows[-1])]
+        for name in small:
+            report['growth_exponents'][name] = {
+                metric: growth_exponent(small[name][metric], large[name][metric], rows[0], rows[-1])
+                for metric in SCALING_METRICS
+            }
+    return report
+
+
+def format_report(report, max_exponent=None):
+    """Plain-text tables per route; exponents at or above ``max_exponent`` are marked with '!'"""
+    lines = []
+    rows = sorted(report['sizes'], key=int)
+    routes = list(report['sizes'][rows[0]]) if rows else []
+    for route in routes:
+        lines.append(f"{route}")
+        lines.append(f"  {'rows':>9} {'ms':>9} {'sql':>5} {'sql ms':>8} {'mem KB':>9} {'resp B':>10} {'log B':>9}")
+        for size in rows:
+            stats = report['sizes'][size][route]
+            lines.append(f"  {size:>9} {stats['latency_ms']:>9} {stats['db_query_count']:>5} {stats['db_time_ms']:>8} "
+                         f"{stats['peak_memory_kb']:>9} {stats['response_bytes']:>10} {stats['log_bytes']:>9}")
+        exponents = report['growth_exponents'].get(route)
+        if exponents:
+            marked = []
+            for metric, exponent in exponents.items():
+                flag = '!' if max_exponent is not None and exponent is not None and exponent >= max_exponent else ''
+                marked.append(f"{metric}={exponent}{flag}")
+            lines.append(f"  growth exponents: {', '.join(marked)}")
+    return '\n'.join(lines)
+
+
+def exponents_over(report, max_exponent):
+    """``[(route, metric, exponent)]`` growing at least as fast as rows^max_exponent"""
+    return [(route, metric, exponent)
+            for route, exponents in report['growth_exponents'].items()
+            for metric, exponent in exponents.items()
+            if exponent is not None and exponent >= max_exponent]
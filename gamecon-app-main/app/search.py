@@ -0,0 +1,108 @@
+import logging
+from sqlalchemy import Integer, inspect, text
+from sqlalchemy.exc import ProgrammingError
+from models import db, Game
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ('substring', 'prefix')
+
+
+def install_search_indexes(engine):
+    """Create the dialect-specific title search index that db.create_all() cannot express.
+
+    PostgreSQL gets a pg_trgm GIN index on ``game.title`` (serves ILIKE with
+    leading wildcards); when the role may not create the extension, search
+    keeps working as an unindexed ILIKE and a warning is logged. SQLite gets an external-content FTS5 table with the
+    trigram tokenizer, kept in sync with ``game`` by triggers. The btree
+    indexes on genre and platform are ordinary model indexes.
+    """
+    created = []
+    if engine.dialect.name == 'postgresql':
+        try:
+            with engine.begin() as conn:
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        except ProgrammingError as e:
+            logger.warning("pg_trgm extension unavailable, title search falls back to unindexed ILIKE", extra={
+                'extra_fields': {
+                    'operation': 'search_index_skipped',
+                    'error_type': type(e.orig).__name__,
+                    'error_message': str(e.orig)
+                }
+            })
+            return created
+        with engine.begin() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_game_title_trgm ON game USING gin (title gin_trgm_ops)'))
+        created.append('ix_game_title_trgm')
+    elif engine.dialect.name == 'sqlite':
+        exists = inspect(engine).has_table('game_title_fts')
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS game_title_fts "
+                "USING fts5(title, content='game', content_rowid='id', tokenize='trigram')"
+            ))
+            conn.execute(text(
+                'CREATE TRIGGER IF NOT EXISTS game_title_fts_ai AFTER INSERT ON game BEGIN '
+                'INSERT INTO game_title_fts(rowid, title) VALUES (new.id, new.title); END'
+            ))
+            conn.execute(text(
+                'CREATE TRIGGER IF NOT EXISTS game_title_fts_ad AFTER DELETE ON game BEGIN '
+                "INSERT INTO game_title_fts(game_title_fts, rowid, title) VALUES ('delete', old.id, old.title); END"
+            ))
+            conn.execute(text(
+                'CREATE TRIGGER IF NOT EXISTS game_title_fts_au AFTER UPDATE OF title ON game BEGIN '
+                "INSERT INTO game_title_fts(game_title_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+                'INSERT INTO game_title_fts(rowid, title) VALUES (new.id, new.title); END'
+            ))
+            if not exists:
+                # Index the rows that were there before the FTS table
+                conn.execute(text("INSERT INTO game_title_fts(game_title_fts) VALUES ('rebuild')"))
+                created.append('game_title_fts')
+    return created
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_games_query(q=None, genre=None, platform=None, match='substring'):
+    """Projection query for games matching a case-insensitive title search and exact filters"""
+    query = db.session.query(Game.id, Game.title, Game.genre, Game.platform)
+    if genre:
+        query = query.filter(Game.genre == genre)
+    if platform:
+        query = query.filter(Game.platform == platform)
+    if q:
+        pattern = _like_escape(q) + '%'
+        if match != 'prefix':
+            pattern = '%' + pattern
+        if db.engine.dialect.name == 'sqlite':
+            # The trigram FTS table only answers LIKE without an ESCAPE clause, so it
+            # narrows the candidates and the exact, escaped pattern is applied to them
+            fts_pattern = q + '%' if match == 'prefix' else '%' + q + '%'
+            candidates = text('SELECT rowid FROM game_title_fts WHERE title LIKE :fts_pattern') \
+                .bindparams(fts_pattern=fts_pattern).columns(rowid=Integer)
+            query = query.filter(Game.id.in_(candidates))
+        query = query.filter(Game.title.ilike(pattern, escape='\\'))
+    return query
+
+
+def explain_search(query):
+    """Query plan lines for a search query on the current database"""
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+        return [row[-1] for row in rows]
+    rows = db.session.execute(text(f'EXPLAIN {statement}')).all()
+    return [row[0] for row in rows]
+
+
+def sequential_scans(plan):
+    """Plan lines that read the whole game table instead of an index"""
+    scans = []
+    for line in plan:
+        if line.strip().startswith('SCAN game') and 'INDEX' not in line:
+            scans.append(line)
+        elif 'Seq Scan on game' in line:
+            scans.append(line)
+    return scans
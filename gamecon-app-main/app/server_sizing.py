@@ -0,0 +1,72 @@
+import os
+import math
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root=CGROUP_ROOT):
+    """CPUs the container may use according to its cgroup quota, or None when unlimited"""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = _read(os.path.join(root, 'cpu.max'))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    # cgroup v1: quota is -1 when unlimited
+    quota = _read(os.path.join(root, 'cpu', 'cpu.cfs_quota_us')) or _read(os.path.join(root, 'cpu.cfs_quota_us'))
+    period = _read(os.path.join(root, 'cpu', 'cpu.cfs_period_us')) or _read(os.path.join(root, 'cpu.cfs_period_us'))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit(root=CGROUP_ROOT):
+    """Memory limit of the container in bytes, or None when unlimited"""
+    memory_max = _read(os.path.join(root, 'memory.max'))
+    if memory_max is not None:
+        return None if memory_max == 'max' else int(memory_max)
+    limit = _read(os.path.join(root, 'memory', 'memory.limit_in_bytes')) or \
+        _read(os.path.join(root, 'memory.limit_in_bytes'))
+    # cgroup v1 reports "unlimited" as a huge page-aligned number
+    if limit and int(limit) < 1 << 60:
+        return int(limit)
+    return None
+
+
+def worker_layout(cpus=None, memory_bytes=None, workers_per_cpu=2, threads=4, worker_memory_mb=150):
+    """Number of pre-forked workers and threads per worker for the given limits.
+
+    Workers scale with the CPU quota (threads cover I/O waits, so fractional
+    CPUs round down to at least one worker) and are capped so that
+    ``workers * worker_memory_mb`` fits in the memory limit.
+    """
+    if cpus is None:
+        cpus = os.cpu_count() or 1
+    workers = max(1, math.floor(cpus * workers_per_cpu))
+    if memory_bytes:
+        workers = max(1, min(workers, memory_bytes // (worker_memory_mb * 1024 * 1024)))
+    return workers, threads
+
+
+def detect_worker_layout(environ=None, root=CGROUP_ROOT):
+    """Worker layout from the cgroup limits, overridable with WEB_CONCURRENCY / GUNICORN_THREADS"""
+    environ = os.environ if environ is None else environ
+    workers, threads = worker_layout(
+        cpus=cgroup_cpu_limit(root),
+        memory_bytes=cgroup_memory_limit(root),
+        workers_per_cpu=float(environ.get('GUNICORN_WORKERS_PER_CPU', '2')),
+        threads=int(environ.get('GUNICORN_THREADS', '4')),
+        worker_memory_mb=int(environ.get('GUNICORN_WORKER_MEMORY_MB', '150'))
+    )
+    if environ.get('WEB_CONCURRENCY'):
+        workers = int(environ['WEB_CONCURRENCY'])
+    return workers, threads
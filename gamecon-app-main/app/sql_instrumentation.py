@@ -0,0 +1,146 @@
+import time
+import logging
+from collections import Counter as StatementCounter
+from flask import g, has_request_context, request
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DB_QUERIES = Histogram(
+    'gamecon_request_db_queries',
+    'SQL statements issued by one request',
+    ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+)
+REQUEST_DB_SECONDS = Histogram(
+    'gamecon_request_db_seconds',
+    'Time one request spent executing SQL statements',
+    ['endpoint'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+DB_REPEATED_STATEMENTS = Counter(
+    'gamecon_db_repeated_statements_total',
+    'Requests that ran the same SQL statement SQL_REPEAT_THRESHOLD times or more (N+1 pattern)',
+    ['endpoint']
+)
+DB_SLOW_STATEMENTS = Counter(
+    'gamecon_db_slow_statements_total',
+    'SQL statements slower than SQL_SLOW_QUERY_MS',
+    ['endpoint']
+)
+
+STATEMENT_LOG_CHARS = 500
+
+
+class RequestSqlStats:
+    """Statements and database time of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = StatementCounter()
+
+    @property
+    def time_ms(self):
+        return round(self.seconds * 1000, 2)
+
+    def repeated(self, threshold):
+        """(statement, times) for statements run at least ``threshold`` times, most frequent first"""
+        return [(statement, times) for statement, times in self.statements.most_common() if times >= threshold]
+
+
+def request_sql_stats():
+    """Stats of the current request, or None outside a request"""
+    if not has_request_context():
+        return None
+    return g.get('sql_stats')
+
+
+def _truncate(statement):
+    return statement if len(statement) <= STATEMENT_LOG_CHARS else statement[:STATEMENT_LOG_CHARS] + '...'
+
+
+def instrument_engine(engine, slow_query_ms=100, comment_request_id=True):
+    """Attribute every statement run on a request thread to that request.
+
+    With ``comment_request_id`` the statement carries a trailing
+    ``/* request_id='...' */`` comment, so the PostgreSQL statement log can be
+    joined with the application logs.
+    """
+
+    @event.listens_for(engine, 'before_cursor_execute', retval=True)
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = request_sql_stats()
+        if stats is None:
+            return statement, parameters
+        stats.count += 1
+        stats.statements[statement] += 1
+        conn.info.setdefault('request_query_started', []).append(time.perf_counter())
+        if comment_request_id and g.get('request_id'):
+            statement = f"{statement} /* request_id='{g.request_id}' */"
+        return statement, parameters
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = request_sql_stats()
+        if stats is None or not conn.info.get('request_query_started'):
+            return
+        elapsed = time.perf_counter() - conn.info['request_query_started'].pop()
+        stats.seconds += elapsed
+        if elapsed * 1000 >= slow_query_ms:
+            DB_SLOW_STATEMENTS.labels(endpoint=request.endpoint or 'unknown').inc()
+            logger.warning("Slow SQL statement", extra={
+                'extra_fields': {
+                    'request_id': g.get('request_id', 'unknown'),
+                    'operation': 'slow_sql_statement',
+                    'endpoint': request.endpoint or 'unknown',
+                    'duration_ms': round(elapsed * 1000, 2),
+                    'slow_query_threshold_ms': slow_query_ms,
+                    'statement': _truncate(statement)
+                }
+            })
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get('request_query_started'):
+            context.connection.info['request_query_started'].pop()
+
+
+def install_sql_instrumentation(app, db, skip_endpoints=()):
+    """Count statements and database time per request, export them by endpoint and flag N+1 patterns"""
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine, slow_query_ms=app.config['SQL_SLOW_QUERY_MS'],
+                              comment_request_id=app.config['SQL_COMMENT_REQUEST_ID'])
+    repeat_threshold = app.config['SQL_REPEAT_THRESHOLD']
+
+    @app.before_request
+    def start_sql_stats():
+        if request.endpoint not in skip_endpoints:
+            g.sql_stats = RequestSqlStats()
+
+    @app.after_request
+    def record_sql_stats(response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_DB_QUERIES.labels(endpoint=endpoint).observe(stats.count)
+        REQUEST_DB_SECONDS.labels(endpoint=endpoint).observe(stats.seconds)
+        repeated = stats.repeated(repeat_threshold)
+        if repeated:
+            DB_REPEATED_STATEMENTS.labels(endpoint=endpoint).inc()
+            logger.warning("Repeated SQL statements in one request", extra={
+                'extra_fields': {
+                    'request_id': g.get('request_id', 'unknown'),
+                    'operation': 'sql_repeated_statements',
+                    'endpoint': endpoint,
+                    'db_query_count': stats.count,
+                    'repeat_threshold': repeat_threshold,
+                    'repeated_statements': [
+                        {'statement': _truncate(statement), 'times': times} for statement, times in repeated[:5]
+                    ]
+                }
+            })
+        return response
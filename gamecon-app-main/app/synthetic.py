@@ -0,0 +1,115 @@
+import io
+import math
+import time
+import random
+import logging
+from PIL import Image
+from sqlalchemy import insert
+from models import db, Game
+from blob_store import content_hash
+from image_jobs import IMAGE_READY
+
+logger = logging.getLogger(__name__)
+
+GENRES = ('Action', 'Adventure', 'RPG', 'Shooter', 'Strategy', 'Simulation', 'Sports', 'Racing', 'Puzzle',
+          'Platformer', 'Fighting', 'Horror', 'Roguelike', 'Survival', 'Card Game')
+PLATFORMS = ('PC', 'PlayStation 5', 'PlayStation 4', 'Xbox Series X', 'Xbox One', 'Nintendo Switch', 'Mobile')
+# Real catalogues are skewed: a few genres and platforms hold most of the games
+GENRE_WEIGHTS = (20, 14, 12, 10, 8, 7, 6, 5, 5, 4, 3, 2, 2, 1, 1)
+PLATFORM_WEIGHTS = (35, 15, 10, 12, 8, 15, 5)
+TITLE_ADJECTIVES = ('Dark', 'Lost', 'Eternal', 'Crimson', 'Silent', 'Broken', 'Golden', 'Hidden', 'Iron',
+                    'Forgotten', 'Shattered', 'Wild', 'Frozen', 'Ancient', 'Neon', 'Savage', 'Hollow', 'Final')
+TITLE_NOUNS = ('Kingdom', 'Legends', 'Horizon', 'Dungeon', 'Empire', 'Odyssey', 'Frontier', 'Chronicles',
+               'Souls', 'Dragon', 'Galaxy', 'Warfare', 'Realms', 'Tactics', 'Requiem', 'Velocity', 'Harbor')
+TITLE_SUBTITLES = ('Rebirth', 'Origins', 'Definitive Edition', 'The Last Light', 'Remastered', 'Ascension',
+                   'Shadows of the Past', 'Game of the Year Edition', 'Into the Abyss', 'Reloaded')
+# Images are content-addressed, so each size gets a handful of distinct blobs shared by many games
+IMAGE_VARIANTS = 16
+
+
+def synthetic_title(rng):
+    title = f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)}"
+    roll = rng.random()
+    if roll < 0.25:
+        title += f" {rng.randint(2, 7)}"
+    elif roll < 0.45:
+        title += f": {rng.choice(TITLE_SUBTITLES)}"
+    return title[:100]
+
+
+def synthetic_image(size, rng):
+    """JPEG of random pixels whose encoded size is close to ``size`` bytes"""
+    side = max(8, int(math.sqrt(size / 1.5)))
+    data = b''
+    for _ in range(3):
+        image = Image.frombytes('RGB', (side, side), rng.randbytes(side * side * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        data = buffer.getvalue()
+        # Encoded size grows with the pixel count; correct the side once or twice
+        if abs(len(data) - size) <= size * 0.1:
+            break
+        side = max(8, int(side * math.sqrt(size / len(data))))
+    return data
+
+
+def parse_sizes(value):
+    """'20k,200k,1m' -> [20480, 204800, 1048576]"""
+    units = {'k': 1024, 'm': 1024 * 1024}
+    sizes = []
+    for part in value.split(','):
+        part = part.strip().lower()
+        if part:
+            multiplier = units.get(part[-1], 1)
+            sizes.append(int(float(part.rstrip('km')) * multiplier))
+    return sizes
+
+
+def generate_games(count, blob_store, image_fraction=0.3, image_sizes=(50 * 1024,), seed=None,
+                   batch_size=5000, progress=None):
+    """Insert ``count`` synthetic games, ``image_fraction`` of them with an image of one of ``image_sizes`` bytes.
+
+    Rows go in with executemany INSERTs, one transaction per batch; the image
+    blobs are written to the blob store up front. ``progress`` is called with
+    the number of games inserted so far after every batch.
+    """
+    started = time.time()
+    rng = random.Random(seed)
+    images = []
+    for size in image_sizes if image_fraction > 0 else ():
+        for _ in range(IMAGE_VARIANTS):
+            data = synthetic_image(size, rng)
+            image_hash = content_hash(data)
+            if not blob_store.exists(image_hash):
+                blob_store.put(image_hash, data, content_type='image/jpeg')
+            images.append((image_hash, len(data)))
+
+    inserted = with_images = 0
+    while inserted < count:
+        rows = []
+        for _ in range(min(batch_size, count - inserted)):
+            row = {'title': synthetic_title(rng), 'genre': rng.choices(GENRES, GENRE_WEIGHTS)[0],
+                   'platform': rng.choices(PLATFORMS, PLATFORM_WEIGHTS)[0], 'image_hash': None,
+                   'image_size': None, 'image_mime': None, 'image_status': None}
+            if images and rng.random() < image_fraction:
+                image_hash, image_size = rng.choice(images)
+                row.update(image_hash=image_hash, image_size=image_size, image_mime='image/jpeg',
+                           image_status=IMAGE_READY)
+                with_images += 1
+            rows.append(row)
+        try:
+            db.session.execute(insert(Game.__table__), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        inserted += len(rows)
+        if progress is not None:
+            progress(inserted)
+
+    return {
+        'games_generated': inserted,
+        'games_with_images': with_images,
+        'image_blobs': len(images),
+        'duration_ms': round((time.time() - started) * 1000, 2)
+    }
@@ -0,0 +1,4 @@
+"""WSGI entry point for the production server (gunicorn wsgi:app)"""
+from app import create_app
+
+app = create_app()
@@ -0,0 +1,100 @@
+"""Benchmark the cost of one /metrics scrape in Prometheus multiprocess mode.
+
+Forks short-lived "workers" that record request metrics the way the app does,
+then times merging their files into the exposition format, with and without
+archiving the files of workers that exited (max-requests recycling leaves one
+set of files per worker pid).
+
+    python benchmarks/metrics_scrape.py --workers 4 --recycled 50 --scrapes 200
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+
+def record_requests(requests, endpoints):
+    from prometheus_client import Counter, Gauge, Histogram
+    operations = Counter('gamecon_game_operations_total', 'Total game operations', ['operation', 'status'])
+    duration = Histogram('gamecon_request_duration_seconds', 'Time spent processing requests',
+                         ['method', 'endpoint', 'status'])
+    active = Gauge('gamecon_active_games_total', 'Total number of active games in database',
+                   multiprocess_mode='livemostrecent')
+    for i in range(requests):
+        endpoint = endpoints[i % len(endpoints)]
+        operations.labels(operation='view', status='200').inc()
+        duration.labels(method='GET', endpoint=endpoint, status='200').observe((i % 50) / 100)
+        active.set(i)
+
+
+def spawn_worker(requests, endpoints, stay_alive):
+    pid = os.fork()
+    if pid == 0:
+        record_requests(requests, endpoints)
+        if stay_alive:
+            time.sleep(3600)
+        os._exit(0)
+    return pid
+
+
+def time_scrapes(path, scrapes):
+    from prometheus_client import generate_latest
+    from metrics_multiprocess import create_registry
+    registry = create_registry(path)
+    size = len(generate_latest(registry))
+    started = time.perf_counter()
+    for _ in range(scrapes):
+        generate_latest(registry)
+    return (time.perf_counter() - started) / scrapes * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='live worker processes')
+    parser.add_argument('--recycled', type=int, default=50, help='workers that already exited')
+    parser.add_argument('--requests', type=int, default=500, help='requests recorded per worker')
+    parser.add_argument('--endpoints', type=int, default=12, help='distinct endpoint label values')
+    parser.add_argument('--scrapes', type=int, default=200, help='scrapes to time')
+    parser.add_argument('--scrape-interval', type=float, default=15.0, help='seconds between scrapes')
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix='gamecon-metrics-')
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = path
+    from metrics_multiprocess import worker_exited
+
+    endpoints = [f'routes.endpoint_{i}' for i in range(args.endpoints)]
+    live = [spawn_worker(args.requests, endpoints, stay_alive=True) for _ in range(args.workers)]
+    dead = [spawn_worker(args.requests, endpoints, stay_alive=False) for _ in range(args.recycled)]
+    for pid in dead:
+        os.waitpid(pid, 0)
+    time.sleep(0.5)
+
+    try:
+        files = len([f for f in os.listdir(path) if f.endswith('.db')])
+        before_ms, size = time_scrapes(path, args.scrapes)
+        started = time.perf_counter()
+        for pid in dead:
+            worker_exited(pid, path)
+        archive_ms = (time.perf_counter() - started) * 1000 / max(1, len(dead))
+        files_after = len([f for f in os.listdir(path) if f.endswith('.db')])
+        after_ms, _ = time_scrapes(path, args.scrapes)
+
+        print(f"workers: {args.workers} live, {args.recycled} recycled; exposition size {size} bytes")
+        print(f"without archiving: {files} files, {before_ms:.2f} ms per scrape")
+        print(f"with archiving:    {files_after} files, {after_ms:.2f} ms per scrape "
+              f"({archive_ms:.2f} ms to archive one exited worker)")
+        print(f"CPU spent scraping at a {args.scrape_interval:g}s interval: "
+              f"{after_ms / (args.scrape_interval * 1000) * 100:.3f}% of one core")
+    finally:
+        for pid in live:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""Benchmark every page route through the real WSGI stack at several catalogue sizes.
+
+Seeds a synthetic catalogue (see ``flask generate-games``) with a fraction
+of the games carrying blob-store images, serves the app on a threaded WSGI
+server and drives each route from concurrent HTTP clients. It reports
+req/s, p50/p95/p99 latency, SQL statements per request and the peak RSS of
+the process. Each catalogue size runs in a fresh process so the RSS and
+metrics of one size don't leak into the next.
+
+    python benchmarks/routes.py --sizes 100,10000 --requests 300 --concurrency 8
+    python benchmarks/routes.py --sizes 100,10000,1000000 --save benchmarks/baselines/sqlite.json
+    python benchmarks/routes.py --compare benchmarks/baselines/sqlite.json   # exits 1 on a regression
+
+CI (scripts/benchmark.sh) runs the sizes of the committed baseline with
+--ignore-timings: the agent's latencies are not comparable to the machine
+that recorded it, but SQL statements per request and errors are.
+
+Without --database-url it uses a throwaway SQLite file. A --database-url
+(e.g. a local PostgreSQL) has its tables dropped and recreated for every
+size, so it also needs --reset to confirm that.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from synthetic import GENRES, PLATFORMS  # noqa: E402
+
+ROUTES = ('home', 'game', 'new', 'edit', 'health', 'metrics')
+SEED_BATCH = 10000
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def seed(app, size, image_fraction, image_bytes):
+    from synthetic import generate_games
+    from models import db, Game
+
+    with app.app_context():
+        generate_games(size, app.blob_store, image_fraction=image_fraction, image_sizes=(image_bytes,), seed=size,
+                       batch_size=SEED_BATCH)
+        app.games_summary.invalidate()
+        return [game_id for (game_id,) in db.session.query(Game.id)]
+
+
+def route_request(route, ids, rng):
+    """(method, path, form data) of one request to ``route``"""
+    game_id = rng.choice(ids)
+    if route == 'home':
+        return 'GET', '/', None
+    if route == 'game':
+        return 'GET', f'/games/{game_id}', None
+    if route == 'new':
+        return 'POST', '/games/new', {'title': f'Bench {rng.random():.12f}', 'genre': rng.choice(GENRES),
+                                      'platform': rng.choice(PLATFORMS), 'image_url': ''}
+    if route == 'edit':
+        return 'POST', f'/games/{game_id}/edit', {'title': f'Edited {rng.random():.12f}',
+                                                  'genre': rng.choice(GENRES), 'platform': rng.choice(PLATFORMS),
+                                                  'image_url': ''}
+    if route == 'health':
+        return 'GET', '/health', None
+    if route == 'metrics':
+        return 'GET', '/metrics', None
+    raise ValueError(f"Unknown route: {route}")
+
+
+def statements_recorded(endpoint):
+    """(requests, statements) the per-request SQL histogram holds for ``endpoint``"""
+    from prometheus_client import REGISTRY
+    labels = {'endpoint': endpoint}
+    return (REGISTRY.get_sample_value('gamecon_request_db_queries_count', labels) or 0,
+            REGISTRY.get_sample_value('gamecon_request_db_queries_sum', labels) or 0)
+
+
+def drive(app, base_url, route, ids, requests_count, concurrency, seed_value):
+    import requests
+
+    method, path, _ = route_request(route, ids, random.Random(seed_value))
+    endpoint = app.url_map.bind('localhost').match(path, method=method)[0]
+    recorded_before = statements_recorded(endpoint)
+    local = threading.local()
+
+    def one(i):
+        rng = random.Random(seed_value * 1000003 + i)
+        method, path, data = route_request(route, ids, rng)
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.request(method, base_url + path, data=data, allow_redirects=False)
+        elapsed = time.perf_counter() - started
+        return elapsed, response.status_code < 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed * 1000 for elapsed, _ in results]
+    recorded_after = statements_recorded(endpoint)
+    observed = recorded_after[0] - recorded_before[0]
+    return {
+        'endpoint': endpoint,
+        'requests': requests_count,
+        'errors': sum(1 for _, ok in results if not ok),
+        'rps': round(requests_count / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries_per_request': round((recorded_after[1] - recorded_before[1]) / observed, 2) if observed else None
+    }
+
+
+def run_size(options, size):
+    """Seed ``size`` games, serve the app and benchmark every route (runs in its own process)"""
+    import logging
+    if not os.environ.get('LOG_LEVEL'):
+        os.environ['LOG_LEVEL'] = 'WARNING'
+    from werkzeug.serving import make_server
+    from app import create_app
+    from catalogue_events import ensure_catalogue_state
+    from models import db
+
+    workdir = tempfile.mkdtemp(prefix='gamecon-bench-')
+    database_url = options['database_url'] or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'BLOB_STORE_BACKEND': 'local',
+        'BLOB_STORE_PATH': os.path.join(workdir, 'blobs'),
+        'IMAGE_JOB_WORKERS': 0,
+        'CATALOGUE_LISTEN': False,
+        'TESTING': False
+    })
+    server = None
+    try:
+        if options['database_url']:
+            with app.app_context():
+                db.drop_all(bind_key=None)
+                db.create_all(bind_key=None)
+                app.catalogue_events.known_version = ensure_catalogue_state()
+
+        started = time.perf_counter()
+        ids = seed(app, size, options['image_fraction'], options['image_bytes'])
+        seed_seconds = time.perf_counter() - started
+
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        routes = {}
+        for index, route in enumerate(options['routes']):
+            # Warm the caches and connections the way a running worker has them
+            drive(app, base_url, route, ids, min(options['concurrency'], options['requests']),
+                  options['concurrency'], seed_value=size + 1000 + index)
+            routes[route] = drive(app, base_url, route, ids, options['requests'], options['concurrency'],
+                                  seed_value=size + index)
+        return {
+            'games': size,
+            'seed_seconds': round(seed_seconds, 2),
+            'peak_rss_mb': peak_rss_mb(),
+            'routes': routes
+        }
+    finally:
+        if server is not None:
+            server.shutdown()
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def regressions(results, baseline, tolerance, timings=True):
+    """Routes that got slower, lost throughput or issue more statements than the baseline.
+
+    ``timings=False`` compares only statements per request and errors, which
+    don't depend on the machine the baseline was recorded on.
+    """
+    found = []
+    for size, current in results['sizes'].items():
+        for route, now in current['routes'].items():
+            before = baseline.get('sizes', {}).get(size, {}).get('routes', {}).get(route)
+            if before is None:
+                continue
+            if timings and now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                found.append(f"{size} games {route}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+            if timings and now['rps'] < before['rps'] * (1 - tolerance):
+                found.append(f"{size} games {route}: {before['rps']} -> {now['rps']} req/s")
+            if (now['queries_per_request'] or 0) > (before['queries_per_request'] or 0) + 0.5:
+                found.append(f"{size} games {route}: {before['queries_per_request']} -> "
+                             f"{now['queries_per_request']} statements per request")
+            if now['errors'] > before['errors']:
+                found.append(f"{size} games {route}: {before['errors']} -> {now['errors']} errors")
+    return found
+
+
+def print_report(results):
+    print(f"{'games':>9} {'route':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'sql/req':>8} {'errors':>6}")
+    for size, current in results['sizes'].items():
+        for route, stats in current['routes'].items():
+            print(f"{size:>9} {route:<8} {stats['rps']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+                  f"{stats['p99_ms']:>8} {str(stats['queries_per_request']):>8} {stats['errors']:>6}")
+        print(f"{size:>9} seeded in {current['seed_seconds']}s, peak RSS {current['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100,10000', help='comma-separated catalogue sizes, e.g. 100,10000,1000000')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated subset of ' + ','.join(ROUTES))
+    parser.add_argument('--requests', type=int, default=300, help='timed requests per route and size')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent HTTP clients')
+    parser.add_argument('--image-fraction', type=float, default=0.3, help='fraction of seeded games with an image')
+    parser.add_argument('--image-bytes', type=int, default=50 * 1024, help='size of each seeded image')
+    parser.add_argument('--database-url', default='', help='database to seed (default: a throwaway SQLite file)')
+    parser.add_argument('--reset', action='store_true', help='confirm dropping the tables of --database-url')
+    parser.add_argument('--save', help='write the results to this JSON baseline file')
+    parser.add_argument('--compare', help='baseline JSON file; exit 1 when a route regressed')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95/req/s change')
+    parser.add_argument('--ignore-timings', action='store_true',
+                        help='compare only SQL statements per request and errors (baseline from another machine)')
+    args = parser.parse_args()
+
+    if args.database_url and not args.reset:
+        parser.error("--database-url is wiped for every size; pass --reset to confirm")
+    routes = [route for route in args.routes.split(',') if route]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+    options = {
+        'routes': routes,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'image_fraction': args.image_fraction,
+        'image_bytes': args.image_bytes,
+        'database_url': args.database_url
+    }
+
+    results = {
+        'database': args.database_url.split(':', 1)[0] if args.database_url else 'sqlite',
+        'python': platform.python_version(),
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'image_fraction': args.image_fraction,
+        'sizes': {}
+    }
+    context = multiprocessing.get_context('fork')
+    for size in [int(size) for size in args.sizes.split(',') if size]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results['sizes'][str(size)] = executor.submit(run_size, options, size).result()
+    print_report(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            found = regressions(results, json.load(baseline_file), args.tolerance, timings=not args.ignore_timings)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,5 +15,14 @@ echo "Database is up!"
 cd app || exit
 export FLASK_APP=app.py
 
-echo "Starting Flask app..."
-exec python app.py
\ No newline at end of file
+# SERVER_MODE=gunicorn (default) runs the pre-fork production server;
+# SERVER_MODE=development runs the Flask development server (set FLASK_DEBUG=1 for the debugger)
+SERVER_MODE=${SERVER_MODE:-gunicorn}
+
+if [ "$SERVER_MODE" = "development" ]; then
+    echo "Starting Flask development server..."
+    exec python app.py
+fi
+
+echo "Starting gunicorn..."
+exec gunicorn --config gunicorn.conf.py wsgi:app
\ No newline at end of file
@@ -0,0 +1,20 @@
+#!/bin/bash
+set -e
+
+echo "=== Starting Route Benchmark (Docker Test Image) ==="
+
+# Build the test image (cached from the Unit Test stage)
+echo "Building test Docker image..."
+docker build -f Dockerfile.test -t gamecon-test .
+
+# Same sizes and request counts as the committed baseline; timings are not comparable
+# across machines, so only SQL statements per request and errors can fail the build
+echo "Comparing against benchmarks/baselines/sqlite.json..."
+docker run --rm \
+    --name gamecon-benchmark-runner \
+    -v "$(pwd)/benchmarks:/app/benchmarks" \
+    gamecon-test \
+    python benchmarks/routes.py --sizes 100,2000 --requests 100 --concurrency 4 \
+        --compare benchmarks/baselines/sqlite.json --ignore-timings
+
+echo "=== Route Benchmark Complete ==="
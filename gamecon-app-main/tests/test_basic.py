@@ -67,7 +67,7 @@ def test_download_image_data_url():
         assert image_data is not None
         assert mime_type == 'image/png'
 
-@patch('routes.requests.get')
+@patch('http_client.requests.Session.get')
 def test_download_image_http_url(mock_get):
     """Test HTTP URL image download"""
     from routes import download_image_from_url
@@ -77,7 +77,7 @@ def test_download_image_http_url(mock_get):
     mock_response = Mock()
     mock_response.status_code = 200
     mock_response.headers = {'content-type': 'image/jpeg'}
-    mock_response.content = b'fake_jpeg_data'
+    mock_response.iter_content.return_value = [b'fake_jpeg_', b'data']
     mock_response.raise_for_status.return_value = None
     mock_get.return_value = mock_response
     
@@ -91,7 +91,7 @@ def test_download_image_http_url(mock_get):
         assert image_data == b'fake_jpeg_data'
         assert mime_type == 'image/jpeg'
 
-@patch('routes.requests.get')
+@patch('http_client.requests.Session.get')
 def test_download_image_failure(mock_get):
     """Test image download failure handling"""
     from routes import download_image_from_url
@@ -148,7 +148,8 @@ def test_game_model_properties():
     assert hasattr(Game, 'title')
     assert hasattr(Game, 'genre')
     assert hasattr(Game, 'platform')
-    assert hasattr(Game, 'image_data')
+    assert hasattr(Game, 'image_hash')
+    assert hasattr(Game, 'image_size')
     assert hasattr(Game, 'image_mime')
     
     # Test field types (basic validation)
@@ -169,4 +170,1463 @@ def test_invalid_data_url():
             image_data, mime_type = download_image_from_url('data:invalid_format')
             
         assert image_data is None
-        assert mime_type is None
\ No newline at end of file
+        assert mime_type is None
+
+def test_games_summary_cache_incremental_updates():
+    """Test that the games summary snapshot is updated without reloading"""
+    from app_state import GamesSummaryCache
+    from types import SimpleNamespace
+
+    loads = []
+    def loader():
+        loads.append(1)
+        return [(1, 'Halo', 'Shooter', 'Xbox'), (2, 'Zelda', 'Adventure', 'Switch')]
+
+    cache = GamesSummaryCache(loader=loader, ttl=60)
+    summary = cache.summary()
+    assert summary['total_games'] == 2
+    assert summary['game_names'] == ['Halo', 'Zelda']
+    version = summary['version']
+
+    cache.game_added(SimpleNamespace(id=3, title='Doom', genre='Shooter', platform='PC'))
+    cache.game_updated(SimpleNamespace(id=2, title='Zelda', genre='Adventure', platform='Wii U'))
+    cache.game_removed(1)
+
+    summary = cache.summary()
+    assert summary['game_names'] == ['Zelda', 'Doom']
+    assert sorted(summary['platforms']) == ['PC', 'Wii U']
+    assert summary['version'] == version + 3
+    assert cache.summary() is summary
+    assert len(loads) == 1
+
+    # Reading the version after a write does not rebuild the summary
+    cache.game_added(SimpleNamespace(id=4, title='Myst', genre='Puzzle', platform='Mac'))
+    with patch.object(cache, '_build_summary') as build_summary:
+        assert cache.version == version + 4
+    assert not build_summary.called
+
+def test_games_summary_cache_ttl_refresh():
+    """Test that a stale snapshot is reloaded and a failed reload keeps the old data"""
+    from app_state import GamesSummaryCache
+
+    now = [0.0]
+    rows = [[(1, 'Halo', 'Shooter', 'Xbox')]]
+    def loader():
+        if rows[0] is None:
+            raise RuntimeError('db down')
+        return rows[0]
+
+    cache = GamesSummaryCache(loader=loader, ttl=10, clock=lambda: now[0])
+    assert cache.summary()['total_games'] == 1
+
+    rows[0] = [(1, 'Halo', 'Shooter', 'Xbox'), (2, 'Doom', 'Shooter', 'PC')]
+    now[0] = 5.0
+    assert cache.summary()['total_games'] == 1
+    now[0] = 11.0
+    assert cache.summary()['total_games'] == 2
+
+    rows[0] = None
+    now[0] = 22.0
+    summary = cache.summary()
+    assert summary['total_games'] == 2
+    assert 'error' in summary
+
+def test_games_summary_cache_single_flight_refresh():
+    """Test that one thread reloads an expired snapshot while the others serve the previous one"""
+    import threading
+    from app_state import GamesSummaryCache
+
+    now = [0.0]
+    loads = []
+    loading = threading.Event()
+    release = threading.Event()
+    def loader():
+        loads.append(1)
+        if len(loads) > 1:
+            loading.set()
+            release.wait(5)
+        return [(game_id, 'Halo', 'Shooter', 'Xbox') for game_id in range(1, len(loads) + 1)]
+
+    cache = GamesSummaryCache(loader=loader, ttl=10, clock=lambda: now[0])
+    assert cache.summary()['total_games'] == 1
+
+    now[0] = 11.0
+    refresher = threading.Thread(target=cache.summary)
+    refresher.start()
+    assert loading.wait(5)
+    # The reload is in flight: this thread gets the previous snapshot without loading again
+    assert cache.summary()['total_games'] == 1
+    assert len(loads) == 2
+    release.set()
+    refresher.join(5)
+    assert cache.summary()['total_games'] == 2
+
+def test_request_hooks_do_not_query_games():
+    """Test that request hooks read the cached summary instead of scanning the table"""
+    from app import create_app
+    from models import db
+    from sqlalchemy import event
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0})
+    client = app.test_client()
+    client.post('/games/new', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'})
+    assert app.games_summary.summary()['game_names'] == ['Halo']
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        client.get('/games/does-not-exist')
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert not [s for s in statements if 'FROM game' in s]
+
+def test_batching_log_handler_writes_batches():
+    """Test that queued log records are formatted and written by the background writer"""
+    import io
+    import json
+    import logging
+    from app import JSONFormatter
+    from log_pipeline import BatchingQueueHandler
+
+    stream = io.StringIO()
+    handler = BatchingQueueHandler(stream=stream, capacity=100, batch_size=10, flush_interval=0.05)
+    handler.setFormatter(JSONFormatter())
+    test_logger = logging.getLogger('test_batching_log_handler')
+    test_logger.propagate = False
+    test_logger.addHandler(handler)
+    try:
+        for i in range(25):
+            test_logger.warning("record %s", i, extra={'extra_fields': {'operation': 'test_op'}})
+        handler.flush()
+    finally:
+        test_logger.removeHandler(handler)
+        handler.close()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 25
+    entry = json.loads(lines[-1])
+    assert entry['message'] == 'record 24'
+    assert entry['operation'] == 'test_op'
+    assert handler.queued == 25
+    assert handler.dropped == 0
+
+def test_batching_log_handler_drops_oldest_when_full():
+    """Test the drop-oldest overflow policy"""
+    import io
+    import logging
+    from log_pipeline import BatchingQueueHandler
+
+    stream = io.StringIO()
+    handler = BatchingQueueHandler(stream=stream, capacity=3, batch_size=100, flush_interval=60)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    # Keep the writer from running so the queue fills up
+    handler._writer_pid = os.getpid()
+    for i in range(5):
+        handler.handle(logging.makeLogRecord({'msg': f'message {i}', 'levelno': logging.INFO}))
+
+    assert handler.depth == 3
+    assert handler.dropped == 2
+    handler.close()
+    assert stream.getvalue().splitlines() == ['message 2', 'message 3', 'message 4']
+
+def test_log_sampling_keeps_errors_and_slow_requests():
+    """Test 1-in-N sampling of routine records"""
+    import logging
+    from log_policy import LogSamplingFilter, parse_sample_rates
+
+    rates = parse_sample_rates('request_start=3, routes.health_check=2,bad=x,one=1')
+    assert rates == {'request_start': 3, 'routes.health_check': 2}
+    sampler = LogSamplingFilter(rates, slow_request_ms=500)
+
+    def record(level=logging.INFO, **fields):
+        return logging.makeLogRecord({'levelno': level, 'extra_fields': fields})
+
+    kept = [sampler.filter(record(operation='request_start')) for _ in range(6)]
+    assert kept == [True, False, False, True, False, False]
+    assert sampler.filter(record(operation='request_end', endpoint='routes.health_check'))
+    assert not sampler.filter(record(operation='request_end', endpoint='routes.health_check'))
+    assert sampler.filter(record(operation='request_end', endpoint='routes.health_check', status_code=500))
+    assert sampler.filter(record(operation='request_end', endpoint='routes.health_check', duration_ms=900))
+    assert sampler.filter(record(level=logging.ERROR, operation='request_start'))
+    assert sampler.filter(record(operation='game_created'))
+
+    fields = {'operation': 'request_start'}
+    kept = logging.makeLogRecord({'levelno': logging.INFO, 'extra_fields': fields})
+    assert sampler.filter(kept)
+    assert kept.extra_fields['sample_rate'] == 3
+    assert 'sample_rate' not in fields
+
+def test_log_field_budget_truncates_lists():
+    """Test that catalogue-sized list fields are capped with counts"""
+    from log_policy import apply_field_budget
+
+    names = [f'Game {i}' for i in range(1000)]
+    fields = {
+        'operation': 'request_end',
+        'app_state_after_request': {'total_games': 1000, 'game_names': names},
+        'summary': 'x' * 500
+    }
+    budgeted = apply_field_budget(fields, 100)
+
+    state = budgeted['app_state_after_request']
+    assert 0 < len(state['game_names']) < 20
+    assert state['game_names'] == names[:len(state['game_names'])]
+    assert state['game_names_count'] == 1000
+    assert state['game_names_truncated'] is True
+    assert budgeted['summary_length'] == 500
+    assert budgeted['operation'] == 'request_end'
+    assert fields['app_state_after_request']['game_names'] is names
+
+def test_local_blob_store_roundtrip(tmp_path):
+    """Test the filesystem blob store"""
+    from blob_store import LocalBlobStore, content_hash
+
+    store = LocalBlobStore(str(tmp_path))
+    key = content_hash(b'image-bytes')
+    assert store.get(key) is None
+    store.put(key, b'image-bytes')
+    assert store.exists(key)
+    assert store.get(key) == b'image-bytes'
+    with store.open(key) as f:
+        assert f.read() == b'image-bytes'
+    store.delete(key)
+    assert not store.exists(key)
+    with pytest.raises(ValueError):
+        store.put('../escape', b'x')
+
+def test_game_image_stored_in_blob_store(tmp_path):
+    """Test that created games keep only image metadata in the row"""
+    import base64
+    from app import create_app
+    from models import Game
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0})
+    client = app.test_client()
+    png = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==")
+    client.post('/games/new', data={
+        'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+        'image_url': 'data:image/png;base64,' + base64.b64encode(png).decode()
+    })
+    with app.app_context():
+        app.image_jobs.run_pending()
+
+    with app.app_context():
+        game = Game.query.filter_by(title='Halo').one()
+        assert game.image_size == len(png)
+        assert game.image_mime == 'image/png'
+        assert app.blob_store.get(game.image_hash) == png
+        game_id, image_hash = game.id, game.image_hash
+
+    assert client.get(f'/games/{game_id}').status_code == 200
+    client.post(f'/games/{game_id}/delete')
+    assert not app.blob_store.exists(image_hash)
+
+def test_migrate_images_command(tmp_path):
+    """Test moving legacy image_data rows into the blob store"""
+    from app import create_app
+    from models import db, Game, ImageJob
+    from blob_store import content_hash
+    from sqlalchemy import text
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0})
+    with app.app_context():
+        db.session.execute(text('ALTER TABLE game ADD COLUMN image_data BLOB'))
+        for i in range(3):
+            db.session.execute(text(
+                "INSERT INTO game (title, genre, platform, image_data, image_mime) "
+                "VALUES (:title, 'RPG', 'PC', :data, 'image/png')"
+            ), {'title': f'Game {i}', 'data': f'bytes-{i}'.encode()})
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['migrate-images', '--batch-size', '2', '--drop-column'])
+    assert result.exit_code == 0, result.output
+    assert 'Migrated 3 images' in result.output
+
+    with app.app_context():
+        games = Game.query.order_by(Game.id).all()
+        assert [game.image_hash for game in games] == [content_hash(f'bytes-{i}'.encode()) for i in range(3)]
+        assert [game.image_status for game in games] == ['ready'] * 3
+        assert app.blob_store.get(games[0].image_hash) == b'bytes-0'
+        assert sorted(job.game_id for job in ImageJob.query.filter_by(kind='renditions')) == [game.id for game in games]
+        columns = [row[1] for row in db.session.execute(text('PRAGMA table_info(game)'))]
+        assert 'image_data' not in columns
+
+def test_game_image_endpoint_caching(tmp_path):
+    """Test ETag, 304, Range and immutable caching on the image endpoint"""
+    import base64
+    from app import create_app
+    from models import Game
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0, 'IMAGE_CDN_DOMAIN': ''})
+    client = app.test_client()
+    payload = b'\x89PNG' + bytes(range(256)) * 4
+    client.post('/games/new', data={
+        'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+        'image_url': 'data:image/png;base64,' + base64.b64encode(payload).decode()
+    })
+    with app.app_context():
+        app.image_jobs.run_pending()
+    with app.app_context():
+        game = Game.query.filter_by(title='Halo').one()
+        game_id, image_hash = game.id, game.image_hash
+
+    detail = client.get(f'/games/{game_id}')
+    image_path = f'/games/{game_id}/image?v={image_hash[:16]}'
+    assert image_path.encode() in detail.data
+    assert b'base64' not in detail.data
+
+    response = client.get(image_path)
+    assert response.status_code == 200
+    assert response.data == payload
+    assert response.mimetype == 'image/png'
+    assert response.headers['ETag'] == f'"{image_hash}"'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    response = client.get(f'/games/{game_id}/image', headers={'If-None-Match': f'"{image_hash}"'})
+    assert response.status_code == 304
+    assert 'no-cache' in response.headers['Cache-Control']
+
+    response = client.get(image_path, headers={'Range': 'bytes=0-3'})
+    assert response.status_code == 206
+    assert response.data == b'\x89PNG'
+
+    assert client.get('/games/999/image').status_code == 404
+
+def test_image_renditions_generated_and_negotiated(tmp_path):
+    """Test that renditions are built off the request thread and chosen by width and Accept"""
+    import base64
+    from io import BytesIO
+    from PIL import Image
+    from app import create_app
+    from models import Game
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0, 'IMAGE_CDN_DOMAIN': '', 'IMAGE_RENDITION_WIDTHS': '200,800'})
+    client = app.test_client()
+    out = BytesIO()
+    Image.new('RGB', (1600, 900), (200, 30, 30)).save(out, format='JPEG', quality=95)
+    original = out.getvalue()
+    client.post('/games/new', data={
+        'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+        'image_url': 'data:image/jpeg;base64,' + base64.b64encode(original).decode()
+    })
+    with app.app_context():
+        game = Game.query.filter_by(title='Halo').one()
+        game_id, version = game.id, game.image_hash[:16]
+    # Until the renditions exist the original stands in, and must not be cached for good
+    response = client.get(f'/games/{game_id}/image?v={version}&w=200')
+    assert response.data == original
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert 'no-cache' in response.headers['Cache-Control']
+
+    with app.app_context():
+        app.image_jobs.run_pending()
+
+    with app.app_context():
+        game = Game.query.filter_by(title='Halo').one()
+        assert sorted(game.image_renditions) == ['200.jpeg', '200.webp', '800.jpeg', '800.webp']
+    detail = client.get(f'/games/{game_id}').data
+    assert f'/games/{game_id}/image?v={version}&amp;w=800&amp;f=jpeg'.encode() in detail
+    assert f'type="image/webp" srcset="/games/{game_id}/image?v={version}&amp;w=200&amp;f=webp 1x'.encode() in detail
+    # A URL naming the rendition's format is one representation and may be cached by any CDN
+    response = client.get(f'/games/{game_id}/image?v={version}&w=200&f=webp', headers={'Accept': 'image/*'})
+    assert response.mimetype == 'image/webp'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Accept' not in response.headers.get('Vary', '')
+    # Negotiated by Accept: never public or immutable
+    response = client.get(f'/games/{game_id}/image?v={version}&w=200', headers={'Accept': 'image/webp'})
+    assert response.mimetype == 'image/webp'
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert 'Accept' in response.headers['Vary']
+
+    response = client.get(f'/games/{game_id}/image?w=200', headers={'Accept': 'image/webp,image/*'})
+    assert response.mimetype == 'image/webp'
+    assert 'Accept' in response.headers['Vary']
+    assert Image.open(BytesIO(response.data)).size == (200, 112)
+    assert len(response.data) < len(original)
+
+    response = client.get(f'/games/{game_id}/image?w=400', headers={'Accept': 'image/*'})
+    assert response.mimetype == 'image/jpeg'
+    assert Image.open(BytesIO(response.data)).size == (800, 450)
+
+    assert client.get(f'/games/{game_id}/image').data == original
+
+def test_backfill_renditions_command(tmp_path):
+    """Test generating renditions for games saved before the pipeline existed"""
+    from io import BytesIO
+    from PIL import Image
+    from app import create_app
+    from models import db, Game
+    from blob_store import content_hash
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0, 'IMAGE_RENDITION_WIDTHS': '200'})
+    out = BytesIO()
+    Image.new('RGBA', (300, 300), (0, 0, 0, 0)).save(out, format='PNG')
+    with app.app_context():
+        image_hash = content_hash(out.getvalue())
+        app.blob_store.put(image_hash, out.getvalue())
+        db.session.add(Game(title='Old', genre='RPG', platform='PC', image_hash=image_hash,
+                            image_size=len(out.getvalue()), image_mime='image/png'))
+        db.session.add(Game(title='Broken', genre='RPG', platform='PC', image_hash=content_hash(b'junk'),
+                            image_size=4, image_mime='image/png'))
+        app.blob_store.put(content_hash(b'junk'), b'junk')
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['backfill-renditions'])
+    assert result.exit_code == 0, result.output
+    assert 'Generated renditions for 2 games' in result.output
+
+    with app.app_context():
+        assert sorted(Game.query.filter_by(title='Old').one().image_renditions) == ['200.png', '200.webp']
+        assert Game.query.filter_by(title='Broken').one().image_renditions == {}
+
+@patch('http_client.requests.Session.get')
+def test_download_image_size_cap(mock_get):
+    """Test that streamed downloads are cut off at the byte cap"""
+    from routes import download_image_from_url
+    from flask import Flask, g
+
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.headers = {'content-type': 'image/png'}
+    mock_response.iter_content.return_value = [b'x' * 600, b'x' * 600]
+    mock_get.return_value = mock_response
+
+    app = Flask(__name__)
+    with app.app_context():
+        g.request_id = 'test-cap'
+        with patch('routes.logger'):
+            assert download_image_from_url('https://example.com/big.png', max_bytes=1000) == (None, None)
+            assert download_image_from_url('https://example.com/big.png', max_bytes=2000)[0] == b'x' * 1200
+
+        mock_response.headers = {'content-type': 'image/png', 'content-length': '5000'}
+        with patch('routes.logger'):
+            assert download_image_from_url('https://example.com/big.png', max_bytes=1000) == (None, None)
+    assert mock_response.close.called
+
+def test_remote_image_fetched_by_job_queue(tmp_path):
+    """Test that POST /games/new returns immediately and the image job fills the image in"""
+    from app import create_app
+    from models import Game, ImageJob
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0, 'IMAGE_JOB_MAX_ATTEMPTS': 2})
+    app.image_jobs.retry_backoff = 0
+    client = app.test_client()
+
+    with patch('routes.download_image_from_url') as download:
+        response = client.post('/games/new', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+                                                   'image_url': 'https://example.com/halo.png'})
+        assert response.status_code == 302
+        assert not download.called
+
+        with app.app_context():
+            game = Game.query.filter_by(title='Halo').one()
+            assert game.image_status == 'pending'
+            assert app.image_jobs.depth() == 1
+
+            download.return_value = (b'not-really-a-png', 'image/png')
+            assert app.image_jobs.run_pending() == 2
+            game = Game.query.filter_by(title='Halo').one()
+            assert game.image_status == 'ready'
+            assert app.blob_store.get(game.image_hash) == b'not-really-a-png'
+            assert game.image_renditions == {}
+            assert ImageJob.query.count() == 0
+            game_id = game.id
+
+        client.post(f'/games/{game_id}/edit', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+                                                    'image_url': 'https://example.com/missing.png'})
+        with app.app_context():
+            download.return_value = (None, None)
+            assert app.image_jobs.run_pending() == 2
+            game = Game.query.filter_by(title='Halo').one()
+            assert game.image_status == 'failed'
+            assert game.image_hash is not None
+            job = ImageJob.query.one()
+            assert job.status == 'failed'
+            assert job.attempts == 2
+
+def test_superseded_image_fetch_is_dropped(tmp_path):
+    """Test that an older fetch job finishing after a newer edit leaves the game alone"""
+    import time
+    from app import create_app
+    from blob_store import content_hash
+    from models import db, Game, ImageJob
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0})
+    client = app.test_client()
+
+    with patch('routes.download_image_from_url') as download:
+        client.post('/games/new', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+                                        'image_url': 'https://example.com/old.png'})
+        with app.app_context():
+            game_id = Game.query.filter_by(title='Halo').one().id
+        client.post(f'/games/{game_id}/edit', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+                                                    'image_url': 'https://example.com/new.png'})
+
+        with app.app_context():
+            old_job, new_job = ImageJob.query.order_by(ImageJob.id).all()
+            # The older job runs and finishes last
+            download.return_value = (b'new-image', 'image/png')
+            app.image_jobs._fetch_image(new_job)
+            download.return_value = (b'old-image', 'image/png')
+            app.image_jobs._fetch_image(old_job)
+
+            game = db.session.get(Game, game_id)
+            assert app.blob_store.get(game.image_hash) == b'new-image'
+            assert not app.blob_store.exists(content_hash(b'old-image'))
+
+    with app.app_context():
+        # Expired leases are requeued at most once per poll interval
+        ImageJob.query.delete()
+        app.image_jobs._maintained_at = time.time()
+        db.session.add(ImageJob(game_id=game_id, kind='renditions', status='running', attempts=1,
+                                created_at=0, run_after=0, started_at=0))
+        db.session.commit()
+        assert app.image_jobs._claim() is None
+        app.image_jobs._maintained_at -= app.image_jobs.poll_interval
+        assert app.image_jobs._claim() is not None
+
+def test_image_http_client_cache(tmp_path):
+    """Test that the disk cache serves hits, revalidates with ETag and evicts least recently used entries"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from http_client import DiskCache, ImageHttpClient
+
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append((self.path, self.headers.get('If-None-Match')))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = self.path.encode() * 100
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', '"v1"')
+            if self.path.startswith('/fresh'):
+                self.send_header('Cache-Control', 'max-age=3600')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        client = ImageHttpClient(cache=DiskCache(str(tmp_path), max_bytes=1500))
+
+        first = client.fetch(base + '/a.png', 10000)
+        second = client.fetch(base + '/a.png', 10000)
+        assert (first.cache_result, second.cache_result) == ('miss', 'revalidated')
+        assert second.content == first.content == b'/a.png' * 100
+        assert seen[-1] == ('/a.png', '"v1"')
+
+        client.fetch(base + '/fresh.png', 10000)
+        requests_before = len(seen)
+        assert client.fetch(base + '/fresh.png', 10000).cache_result == 'hit'
+        assert len(seen) == requests_before
+
+        # Entries over the byte budget are evicted least recently used first
+        client.fetch(base + '/b.png', 10000)
+        assert client.cache.get(base + '/a.png') is None
+        assert client.cache.get(base + '/b.png') is not None
+        assert client.cache.total_bytes() <= 1500
+    finally:
+        server.shutdown()
+
+def test_home_keyset_pagination():
+    """Test that the home page walks the catalogue by (title, id) cursors without loading image columns"""
+    import re
+    from app import create_app
+    from models import db, Game
+    from sqlalchemy import event
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0,
+                      'GAMES_PAGE_SIZE': 2})
+    with app.app_context():
+        for title in ['Doom', 'Halo', 'Doom', 'Zelda', 'Asteroids']:
+            db.session.add(Game(title=title, genre='Action', platform='PC'))
+        db.session.commit()
+        engine = db.engine
+    client = app.test_client()
+
+    def titles(html):
+        return re.findall(r'<a href="/games/(\d+)">([^<]+)</a>', html)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        first = client.get('/').get_data(as_text=True)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    listing = [s for s in statements if 'FROM game' in s and 'ORDER BY' in s]
+    assert listing and 'image_hash' not in listing[0] and 'LIMIT' in listing[0]
+
+    assert titles(first) == [('5', 'Asteroids'), ('1', 'Doom')]
+    after = re.search(r'after=([\w-]+)', first).group(1)
+    second = client.get(f'/?after={after}').get_data(as_text=True)
+    assert titles(second) == [('3', 'Doom'), ('2', 'Halo')]
+    after = re.search(r'after=([\w-]+)', second).group(1)
+    third = client.get(f'/?after={after}').get_data(as_text=True)
+    assert titles(third) == [('4', 'Zelda')] and 'after=' not in third
+
+    before = re.search(r'before=([\w-]+)', third).group(1)
+    assert titles(client.get(f'/?before={before}').get_data(as_text=True)) == [('3', 'Doom'), ('2', 'Halo')]
+    assert client.get('/?after=not-a-cursor').status_code == 400
+
+def test_game_search_uses_indexes():
+    """Test title/genre/platform search results, the JSON variant and that no search scans the game table"""
+    from app import create_app
+    from models import db, Game
+    from commands import check_search_plans
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0})
+    with app.app_context():
+        for title, genre, platform in [('Super Mario Odyssey', 'Platformer', 'Switch'),
+                                       ('Mario Kart 8', 'Racing', 'Switch'),
+                                       ('Halo 100%', 'Shooter', 'Xbox'),
+                                       ('Gran Turismo', 'Racing', 'PlayStation')]:
+            db.session.add(Game(title=title, genre=genre, platform=platform))
+        db.session.commit()
+        game = Game.query.filter_by(title='Gran Turismo').one()
+        game.title = 'Gran Turismo 7'
+        db.session.commit()
+    client = app.test_client()
+
+    def titles(**params):
+        return [game['title'] for game in client.get('/games/search.json', query_string=params).get_json()['games']]
+
+    assert titles(q='mario') == ['Mario Kart 8', 'Super Mario Odyssey']
+    assert titles(q='mario', match='prefix') == ['Mario Kart 8']
+    assert titles(q='mario', platform='Switch', genre='Racing') == ['Mario Kart 8']
+    assert titles(genre='Racing') == ['Gran Turismo 7', 'Mario Kart 8']
+    assert titles(q='0%') == ['Halo 100%']
+    assert titles(q='turismo 7') == ['Gran Turismo 7']
+    assert 'Super Mario Odyssey' in client.get('/games/search?q=odys').get_data(as_text=True)
+    assert client.get('/games/search?match=fuzzy').status_code == 400
+
+    with app.app_context():
+        assert check_search_plans('mar', 'Racing', 'Switch') == {
+            'title_substring': [], 'title_prefix': [], 'genre': [], 'platform': [], 'title_genre_platform': []
+        }
+
+def test_bulk_games_api():
+    """Test bulk create/update/delete with per-item results, ?ids= multi-get and one audit record per call"""
+    from app import create_app
+    from models import db, Game, ImageJob
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0})
+    client = app.test_client()
+
+    with patch('api.logger') as api_logger:
+        response = client.post('/api/v1/games', json=[
+            {'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'},
+            {'title': 'Zelda', 'genre': 'Adventure'},
+            {'title': 'Doom', 'genre': 'Shooter', 'platform': 'PC', 'image_url': 'https://example.com/doom.png'},
+            {'title': 'Tetris', 'genre': 'Puzzle', 'platform': 'Game Boy'}
+        ])
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [result['status'] for result in body['results']] == ['created', 'error', 'created', 'created']
+    assert "'platform' is required" in body['results'][1]['error']
+    assert api_logger.info.call_count == 1
+    assert api_logger.info.call_args.kwargs['extra']['extra_fields']['status_counts'] == {'created': 3, 'error': 1}
+
+    halo_id, doom_id, tetris_id = [body['results'][i]['id'] for i in (0, 2, 3)]
+    with app.app_context():
+        assert Game.query.count() == 3
+        assert db.session.get(Game, doom_id).image_status == 'pending'
+        assert [job.url for job in ImageJob.query.all()] == ['https://example.com/doom.png']
+    assert sorted(app.games_summary.summary()['game_names']) == ['Doom', 'Halo', 'Tetris']
+
+    games = client.get(f'/api/v1/games?ids={tetris_id},{halo_id},{doom_id},999').get_json()
+    assert [game['title'] for game in games['games']] == ['Tetris', 'Halo', 'Doom']
+    assert games['missing_ids'] == [999]
+
+    response = client.patch('/api/v1/games', json={'games': [
+        {'id': halo_id, 'title': 'Halo Infinite'},
+        {'id': 999, 'title': 'Ghost'},
+        {'id': tetris_id, 'platform': 'Switch', 'genre': 'Puzzle'}
+    ]})
+    assert [result['status'] for result in response.get_json()['results']] == ['updated', 'not_found', 'updated']
+    assert client.get(f'/api/v1/games/{tetris_id}').get_json()['platform'] == 'Switch'
+    assert 'Halo Infinite' in app.games_summary.summary()['game_names']
+
+    response = client.delete(f'/api/v1/games?ids={halo_id},{tetris_id},999')
+    assert [result['status'] for result in response.get_json()['results']] == ['deleted', 'deleted', 'not_found']
+    assert app.games_summary.summary()['game_names'] == ['Doom']
+    assert client.post('/api/v1/games', data='nope').status_code == 400
+    assert client.get('/api/v1/games/12345').status_code == 404
+
+def test_import_games_command(tmp_path):
+    """Test that import-games streams CSV/JSONL in batches, skips bad rows and fetches images concurrently"""
+    import json
+    import base64
+    from app import create_app
+    from models import db, Game, ImageJob
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'import.db'}",
+                      'BLOB_STORE_PATH': str(tmp_path / 'blobs'), 'IMAGE_JOB_WORKERS': 0})
+    jsonl = tmp_path / 'games.jsonl'
+    jsonl.write_text('\n'.join([
+        json.dumps({'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'}),
+        '{not json',
+        json.dumps({'title': 'Doom', 'genre': 'Shooter', 'platform': 'PC', 'image_url': 'https://example.com/doom.png'}),
+        json.dumps({'title': 'Zelda', 'genre': 'Adventure'}),
+        json.dumps({'title': 'Myst', 'genre': 'Puzzle', 'platform': 'Mac', 'image_url': 'https://example.com/myst.png'})
+    ]) + '\n')
+    csv_file = tmp_path / 'games.csv'
+    csv_file.write_text('title,genre,platform,image_url\nTetris,Puzzle,Game Boy,\nPortal,Puzzle,PC,https://example.com/portal.png\n')
+
+    png = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==")
+    runner = app.test_cli_runner()
+    with patch('routes.download_image_from_url', return_value=(png, 'image/png')) as download:
+        result = runner.invoke(args=['import-games', str(jsonl), '--batch-size', '2', '--fetch-images',
+                                     '--image-workers', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 rows' in result.output and 'skipped 2' in result.output
+    assert 'line 2: invalid JSON' in result.output and "line 4: 'platform' is required" in result.output
+    assert download.call_count == 2
+
+    result = runner.invoke(args=['import-games', str(csv_file)])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        games = {game.title: game for game in Game.query.all()}
+        assert sorted(games) == ['Doom', 'Halo', 'Myst', 'Portal', 'Tetris']
+        assert games['Doom'].image_status == 'ready' and games['Myst'].has_image
+        assert games['Portal'].image_status is None
+        assert ImageJob.query.filter_by(kind='fetch_image').count() == 0
+        assert 'Portal' in app.games_summary.summary()['game_names']
+
+def test_export_games_streams(tmp_path):
+    """Test NDJSON/CSV export over the API and CLI without buffering the body in after_request"""
+    import csv
+    import json
+    from app import create_app, _response_size
+    from models import db, Game
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0,
+                      'EXPORT_BATCH_SIZE': 2})
+    with app.app_context():
+        for i in range(5):
+            db.session.add(Game(title=f'Game {i}', genre='Action', platform='PC',
+                                image_hash='ab' * 32 if i == 0 else None))
+        db.session.commit()
+    client = app.test_client()
+
+    with patch('app._response_size', wraps=_response_size) as response_size:
+        response = client.get('/api/v1/games/export?images=url')
+    streamed = response_size.call_args.args[0]
+    assert streamed.is_streamed and _response_size(streamed) is None
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['id'] for record in records] == [1, 2, 3, 4, 5]
+    assert records[0]['image_url'].startswith('/games/1/image?v=abababab') and records[1]['image_url'] is None
+    assert response.mimetype == 'application/x-ndjson'
+
+    response = client.get('/api/v1/games/export?format=csv&images=hash')
+    rows = list(csv.DictReader(response.get_data(as_text=True).splitlines()))
+    assert len(rows) == 5 and rows[0]['image_hash'] == 'ab' * 32 and rows[4]['title'] == 'Game 4'
+    assert client.get('/api/v1/games/export?format=xml').status_code == 400
+
+    output = tmp_path / 'games.ndjson'
+    result = app.test_cli_runner().invoke(args=['export-games', '--output', str(output)])
+    assert result.exit_code == 0, result.output
+    assert len(output.read_text().splitlines()) == 5
+
+def test_worker_layout_from_cgroup_limits(tmp_path):
+    """Test gunicorn worker sizing from cgroup v2 and v1 limits"""
+    from server_sizing import cgroup_cpu_limit, cgroup_memory_limit, detect_worker_layout, worker_layout
+
+    v2 = tmp_path / 'v2'
+    v2.mkdir()
+    (v2 / 'cpu.max').write_text('50000 100000\n')
+    (v2 / 'memory.max').write_text(str(256 * 1024 * 1024))
+    assert cgroup_cpu_limit(str(v2)) == 0.5
+    assert detect_worker_layout({}, root=str(v2)) == (1, 4)
+    assert detect_worker_layout({'WEB_CONCURRENCY': '3', 'GUNICORN_THREADS': '8'}, root=str(v2)) == (3, 8)
+
+    v1 = tmp_path / 'v1'
+    (v1 / 'cpu').mkdir(parents=True)
+    (v1 / 'memory').mkdir()
+    (v1 / 'cpu' / 'cpu.cfs_quota_us').write_text('200000')
+    (v1 / 'cpu' / 'cpu.cfs_period_us').write_text('100000')
+    (v1 / 'memory' / 'memory.limit_in_bytes').write_text(str(2 ** 63 - 4096))
+    assert cgroup_cpu_limit(str(v1)) == 2.0
+    assert cgroup_memory_limit(str(v1)) is None
+    assert detect_worker_layout({}, root=str(v1)) == (4, 4)
+
+    # Memory caps the worker count even when there is CPU to spare
+    assert worker_layout(cpus=4, memory_bytes=512 * 1024 * 1024) == (3, 4)
+
+def test_multiprocess_metrics_archive_dead_workers(tmp_path):
+    """Test that archiving exited workers keeps counter/histogram totals and drops their live gauges"""
+    import os
+    import sys
+    import subprocess
+    import textwrap
+
+    script = textwrap.dedent('''
+        import os
+        from prometheus_client import Counter, Gauge, Histogram, generate_latest
+        from metrics_multiprocess import create_registry, worker_exited
+
+        operations = Counter('ops_total', 'ops', ['status'])
+        duration = Histogram('duration_seconds', 'duration', buckets=(0.1, 1))
+        active = Gauge('active_games', 'games', multiprocess_mode='livemostrecent')
+        depth = Gauge('log_depth', 'depth', multiprocess_mode='livesum')
+
+        def scrape():
+            return sorted(line for line in generate_latest(create_registry(os.environ['PROMETHEUS_MULTIPROC_DIR']))
+                          .decode().splitlines() if not line.startswith('#'))
+
+        pids = []
+        for worker in range(3):
+            pid = os.fork()
+            if pid == 0:
+                operations.labels(status='200').inc(worker + 1)
+                duration.observe(0.5)
+                active.set(10 + worker)
+                depth.set(5)
+                os._exit(0)
+            os.waitpid(pid, 0)
+            pids.append(pid)
+        before = scrape()
+        for pid in pids:
+            worker_exited(pid, os.environ['PROMETHEUS_MULTIPROC_DIR'])
+        after = scrape()
+        print(sorted(f for f in os.listdir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+                     if f.endswith('.db') and str(os.getpid()) not in f))
+        print([line for line in before if line.startswith(('active_games', 'log_depth'))])
+        gauges = ('active_games', 'log_depth')
+        print([line for line in before if not line.startswith(gauges)] == [line for line in after if not line.startswith(gauges)])
+        print(after)
+    ''')
+    app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=app_dir)
+    result = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    files, live_gauges, unchanged, after = result.stdout.splitlines()
+
+    assert files == "['counter_archive.db', 'histogram_archive.db']"
+    assert live_gauges == "['active_games 12.0', 'log_depth 15.0']"
+    assert unchanged == 'True'
+    assert "'ops_total{status=\"200\"} 6.0'" in after and "'duration_seconds_count 3.0'" in after
+    # Only the parent process' own (never set) gauges are left
+    assert "'log_depth 0.0'" in after and 'active_games' not in after
+
+
+def test_db_pool_options_metrics_and_prewarm(tmp_path):
+    """Pool settings come from config and pool activity is exported as metrics"""
+    import pytest
+    from sqlalchemy import exc
+    from prometheus_client import REGISTRY
+    from app import create_app
+    from config import Config
+    from db_pool import InstrumentedQueuePool, engine_options
+    from models import db
+
+    assert engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}) == {}
+    options = engine_options({
+        'SQLALCHEMY_DATABASE_URI': 'postgresql://user:pass@db/gamecon',
+        'DB_POOL_SIZE': Config.DB_POOL_SIZE, 'DB_MAX_OVERFLOW': 3, 'DB_POOL_TIMEOUT': 2.5,
+        'DB_POOL_RECYCLE': 600, 'DB_POOL_PRE_PING': True
+    })
+    assert options == {'poolclass': InstrumentedQueuePool, 'pool_size': 5, 'max_overflow': 3,
+                       'pool_timeout': 2.5, 'pool_recycle': 600, 'pool_pre_ping': True}
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    connects_before = sample('gamecon_db_pool_connects_total')
+    timeouts_before = sample('gamecon_db_pool_timeouts_total')
+    checked_out_before = sample('gamecon_db_pool_checked_out')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pool.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {'poolclass': InstrumentedQueuePool, 'pool_size': 2, 'max_overflow': 0,
+                                      'pool_timeout': 0.05, 'pool_pre_ping': True},
+        'DB_POOL_PREWARM': 2,
+        'IMAGE_JOB_WORKERS': 0
+    })
+    with app.app_context():
+        # Both pooled connections were opened at startup and are idle again
+        assert db.engine.pool.checkedin() == 2
+        assert sample('gamecon_db_pool_connects_total') - connects_before == 2
+        assert sample('gamecon_db_pool_checked_out') == checked_out_before
+
+        held = [db.engine.raw_connection(), db.engine.raw_connection()]
+        assert sample('gamecon_db_pool_checked_out') - checked_out_before == 2
+        with pytest.raises(exc.TimeoutError):
+            db.engine.raw_connection()
+        assert sample('gamecon_db_pool_timeouts_total') - timeouts_before == 1
+        for connection in held:
+            connection.close()
+        assert sample('gamecon_db_pool_checked_out') == checked_out_before
+        # Pre-warmed connections were reused, not reopened
+        assert sample('gamecon_db_pool_connects_total') - connects_before == 2
+        assert sample('gamecon_db_pool_checkout_wait_seconds_count') > 0
+        db.engine.dispose()
+
+
+def test_read_replica_routing(tmp_path):
+    """Read-only requests use the replica, writers are pinned to the primary, a dead replica falls back"""
+    import shutil
+    from prometheus_client import REGISTRY
+    from app import create_app
+    from db_routing import PIN_COOKIE
+    from models import db, Game
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'DATABASE_REPLICA_URL': f'sqlite:///{replica}',
+        'IMAGE_JOB_WORKERS': 0
+    })
+    with app.app_context():
+        db.session.add(Game(title='Replicated', genre='RPG', platform='PC'))
+        db.session.commit()
+        for engine in db.engines.values():
+            engine.dispose()
+    # The replica is a copy of the primary that has not seen later writes yet
+    shutil.copy(primary, replica)
+    with app.app_context():
+        db.session.add(Game(title='Primary Only', genre='RPG', platform='PC'))
+        db.session.commit()
+
+    def titles(client):
+        return [game['title'] for game in client.get('/api/v1/games').get_json()['games']]
+
+    replica_queries = sample('gamecon_db_queries_total', target='replica')
+    client = app.test_client()
+    assert titles(client) == ['Replicated']
+    assert sample('gamecon_db_queries_total', target='replica') > replica_queries
+
+    # A write goes to the primary and pins the writer's reads there
+    response = client.post('/api/v1/games', json=[{'title': 'Written', 'genre': 'RPG', 'platform': 'PC'}])
+    assert response.status_code == 201
+    assert client.get_cookie(PIN_COOKIE) is not None
+    assert titles(client) == ['Primary Only', 'Replicated', 'Written']
+    assert titles(app.test_client()) == ['Replicated']
+    assert sample('gamecon_db_read_routing_total', target='primary', reason='read_your_writes') >= 1
+
+    # An unreachable replica is taken out of rotation
+    down = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'DATABASE_REPLICA_URL': f"sqlite:///{tmp_path / 'missing' / 'replica.db'}",
+        'IMAGE_JOB_WORKERS': 0
+    })
+    assert titles(down.test_client()) == ['Primary Only', 'Replicated', 'Written']
+    assert down.replica_monitor.status() == (False, 'replica_down')
+    with app.app_context(), down.app_context():
+        for engine in list(db.engines.values()):
+            engine.dispose()
+
+
+def test_probes_are_cheap_and_cached():
+    """/livez never queries, /readyz and /health reuse their last check within the TTL"""
+    from app import create_app
+    from models import db, Game
+    from probes import CachedCheck
+
+    now = [0.0]
+    calls = []
+    check = CachedCheck(lambda: calls.append(1) or len(calls), ttl=5, clock=lambda: now[0])
+    assert check.get() == 1 and check.get() == 1
+    now[0] = 5.0
+    assert check.get() == 2
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'IMAGE_JOB_WORKERS': 0,
+        'READINESS_CACHE_SECONDS': 60,
+        'HEALTH_CACHE_SECONDS': 60
+    })
+    client = app.test_client()
+    with patch.object(app.image_jobs, 'ensure_started') as jobs_started, \
+            patch.object(app.catalogue_events, 'poll_if_due') as catalogue_polled:
+        assert client.get('/livez').get_json() == {'status': 'ok'}
+        assert client.get('/readyz').status_code == 200
+        assert not jobs_started.called and not catalogue_polled.called
+    assert client.get('/livez').get_json() == {'status': 'ok'}
+
+    ready = client.get('/readyz')
+    assert ready.status_code == 200
+    body = ready.get_json()
+    assert body['database'] == 'ok' and body['image_jobs_queued'] == 0
+    assert body['pool']['class'] == 'StaticPool'
+
+    health = client.get('/health').get_json()
+    with app.app_context():
+        db.session.add(Game(title='Added Later', genre='RPG', platform='PC'))
+        db.session.commit()
+    # Served from the cache until HEALTH_CACHE_SECONDS pass
+    assert client.get('/health').get_json() == health
+    assert client.get('/readyz').get_json()['check_ms'] == body['check_ms']
+
+
+def test_page_cache_conditional_get_and_invalidation():
+    """Rendered pages are served from the cache with ETags until a write changes the catalogue"""
+    from app import create_app
+    from page_cache import CachedPage, MemoryPageStore
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0, 'TESTING': True})
+    client = app.test_client()
+    client.post('/games/new', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'})
+
+    first = client.get('/')
+    assert first.headers['X-Page-Cache'] == 'miss'
+    assert first.headers['ETag'] and first.headers['Last-Modified']
+    second = client.get('/')
+    assert second.headers['X-Page-Cache'] == 'hit'
+    assert second.get_data() == first.get_data()
+    assert client.get('/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/games/1').headers['X-Page-Cache'] == 'miss'
+    assert client.get('/games/1').headers['X-Page-Cache'] == 'hit'
+    assert client.get('/games/999').status_code == 404
+
+    # The edit commit retires every page rendered before it
+    client.post('/games/1/edit', data={'title': 'Halo 2', 'genre': 'Shooter', 'platform': 'Xbox'})
+    after_edit = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert after_edit.status_code == 200 and after_edit.headers['X-Page-Cache'] == 'miss'
+    assert b'Halo 2' in after_edit.get_data()
+    assert b'Halo 2' in client.get('/games/1').get_data()
+
+    # LRU by total body size
+    store = MemoryPageStore(max_bytes=10)
+    for key in 'abc':
+        store.put(key, CachedPage(b'1234', key, 0, 'text/html', 0))
+    assert store.get('a') is None and store.get('c') is not None and store.total_bytes == 8
+
+
+def test_catalogue_changes_reach_other_processes(tmp_path):
+    """Writes bump the catalogue version; other apps apply events or notice the version moved"""
+    import time
+    from app import create_app
+    from models import db
+
+    config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'catalogue.db'}", 'IMAGE_JOB_WORKERS': 0,
+              'TESTING': True, 'GAMES_SUMMARY_TTL': 3600, 'CATALOGUE_VERSION_CHECK_INTERVAL': 0}
+    writer, reader = create_app(config), create_app(config)
+    writer_client, reader_client = writer.test_client(), reader.test_client()
+    assert b'Halo' not in reader_client.get('/').get_data()
+
+    writer_client.post('/games/new', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'})
+    # The writer recorded its own version and keeps its incrementally updated caches
+    assert writer.catalogue_events.known_version == 1
+    assert writer.games_summary.summary()['game_names'] == ['Halo']
+
+    # Without a listener (SQLite) the reader notices the new version on its next request
+    assert b'Halo' in reader_client.get('/').get_data()
+    with reader.app_context():
+        assert reader.games_summary.summary()['game_names'] == ['Halo']
+    assert reader.catalogue_events.known_version == 1
+
+    # NOTIFY payloads are applied to the summary without re-reading the table
+    reader.games_summary._loader = lambda: (_ for _ in ()).throw(AssertionError('table re-read'))
+    reader.catalogue_events.apply({'v': 2, 'op': 'added', 'id': 7, 'game': ['Zelda', 'Adventure', 'Switch'],
+                                   'origin': 'other-host:1', 'ts': time.time()})
+    reader.catalogue_events.apply({'v': 3, 'op': 'removed', 'id': 1, 'origin': 'other-host:1', 'ts': time.time()})
+    assert reader.games_summary.summary()['game_names'] == ['Zelda']
+    assert reader.catalogue_events.known_version == 3
+    for app in (writer, reader):
+        with app.app_context():
+            db.engine.dispose()
+
+
+def test_catalogue_listener_applies_notifications(tmp_path):
+    """The listen loop waits on the LISTEN connection and applies the NOTIFY payloads it receives"""
+    import json
+    import socket
+    from types import SimpleNamespace
+    import pytest
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'listen.db'}", 'IMAGE_JOB_WORKERS': 0,
+                      'TESTING': True})
+    app.games_summary.summary()
+    events = app.catalogue_events
+    events.reconnect_delay = 0
+
+    class StopListening(BaseException):
+        pass
+
+    readable, writable = socket.socketpair()
+    writable.send(b'x')
+    payload = {'v': 1, 'op': 'added', 'id': 7, 'game': ['Zelda', 'Adventure', 'Switch'], 'origin': 'other-host:1'}
+
+    class FakeConnection:
+        notifies = []
+        polls = 0
+
+        def fileno(self):
+            return readable.fileno()
+
+        def poll(self):
+            self.polls += 1
+            if self.polls > 1:
+                raise RuntimeError('connection lost')
+            self.notifies.append(SimpleNamespace(payload=json.dumps(payload)))
+
+        def close(self):
+            pass
+
+    connections = [FakeConnection()]
+
+    def connect():
+        if not connections:
+            raise StopListening()
+        return connections.pop()
+
+    with patch.object(events, '_connect', side_effect=connect), pytest.raises(StopListening):
+        events._listen_loop()
+    readable.close()
+    writable.close()
+
+    assert app.games_summary.summary()['game_names'] == ['Zelda']
+    assert events.known_version == 1
+    assert events.connected is False
+
+
+def test_sql_instrumentation_per_request():
+    """Statements are counted per request, tagged with the request id and repeated ones are flagged"""
+    import logging
+    from flask import g
+    from prometheus_client import REGISTRY
+    from sqlalchemy import event
+    from app import create_app
+    from models import db, Game
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'IMAGE_JOB_WORKERS': 0,
+        'TESTING': True,
+        'SQL_REPEAT_THRESHOLD': 3,
+        'SQL_SLOW_QUERY_MS': 60000
+    })
+    with app.app_context():
+        games = [Game(title=f'Game {i}', genre='RPG', platform='PC') for i in range(3)]
+        db.session.add_all(games)
+        db.session.commit()
+        ids = [game.id for game in games]
+
+    @app.route('/_n_plus_one')
+    def n_plus_one():
+        # One SELECT per game instead of one for all of them
+        return ','.join(db.session.get(Game, game_id).title for game_id in ids)
+
+    seen, executed = {}, []
+
+    @app.after_request
+    def capture(response):
+        seen['stats'], seen['request_id'] = g.sql_stats, g.request_id
+        return response
+
+    with app.app_context():
+        event.listen(db.engine, 'after_cursor_execute', lambda conn, cursor, statement, *args: executed.append(statement))
+
+    def observed():
+        return REGISTRY.get_sample_value('gamecon_request_db_queries_count', {'endpoint': 'n_plus_one'}) or 0
+
+    warnings = []
+    handler = logging.Handler()
+    handler.emit = warnings.append
+    logging.getLogger('sql_instrumentation').addHandler(handler)
+    before = observed()
+    try:
+        assert app.test_client().get('/_n_plus_one').get_data(as_text=True) == 'Game 0,Game 1,Game 2'
+    finally:
+        logging.getLogger('sql_instrumentation').removeHandler(handler)
+
+    stats = seen['stats']
+    assert stats.count >= 3 and stats.seconds > 0
+    assert stats.repeated(3)[0][1] == 3
+    assert any(f"request_id='{seen['request_id']}'" in statement for statement in executed)
+    assert observed() == before + 1
+    assert [record.extra_fields['operation'] for record in warnings] == ['sql_repeated_statements']
+
+
+def test_request_phases_histogram_and_trace_file(tmp_path):
+    """Requests record time per phase, export it by endpoint and append their spans to the trace file"""
+    import os
+    import json
+    import base64
+    from prometheus_client import REGISTRY
+    from app import create_app
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'BLOB_STORE_PATH': str(tmp_path / 'blobs'),
+        'IMAGE_JOB_WORKERS': 0,
+        'TESTING': True,
+        'TRACE_FILE': str(tmp_path / 'trace-{pid}.json')
+    })
+    client = app.test_client()
+
+    def observed(endpoint, phase):
+        return REGISTRY.get_sample_value('gamecon_request_phase_seconds_count',
+                                         {'endpoint': endpoint, 'phase': phase}) or 0
+
+    before = {phase: observed('routes.new_game', phase) for phase in ('image_fetch', 'image_store', 'commit', 'db')}
+    rendered_before = observed('routes.new_game', 'render')
+    png = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==")
+    client.post('/games/new', data={
+        'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+        'image_url': 'data:image/png;base64,' + base64.b64encode(png).decode()
+    })
+    for phase, count in before.items():
+        assert observed('routes.new_game', phase) == count + 1
+    # The POST redirects without rendering; the form does render
+    assert observed('routes.new_game', 'render') == rendered_before
+    client.get('/games/new')
+    assert observed('routes.new_game', 'render') == rendered_before + 1
+
+    trace = (tmp_path / f'trace-{os.getpid()}.json').read_text()
+    assert trace.startswith('[\n')
+    events = json.loads(trace.rstrip(',\n') + ']')
+    names = [event['name'] for event in events]
+    assert 'POST routes.new_game' in names and 'image_fetch' in names and 'commit' in names and 'render' in names
+    request_event = events[names.index('POST routes.new_game')]
+    commit_event = events[names.index('commit')]
+    assert request_event['ts'] <= commit_event['ts'] <= request_event['ts'] + request_event['dur']
+
+
+def test_sampling_profiler_collects_collapsed_stacks(tmp_path):
+    """Requests with the profiling secret are sampled per endpoint; without it the profiles stay hidden"""
+    import os
+    import time
+    from app import create_app
+
+    disabled = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0, 'TESTING': True})
+    assert disabled.profiler is None
+    assert disabled.test_client().get('/admin/profiles').status_code == 404
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'IMAGE_JOB_WORKERS': 0,
+        'TESTING': True,
+        'PROFILING_ENABLED': True,
+        'PROFILE_SECRET': 's3cret',
+        'PROFILE_INTERVAL_MS': 1,
+        'PROFILE_DIR': str(tmp_path)
+    })
+
+    def busy_for_a_while():
+        time.sleep(0.05)
+        return 'done'
+
+    app.add_url_rule('/_slow', 'slow', busy_for_a_while)
+    client = app.test_client()
+    headers = {'X-Gamecon-Profile': 's3cret'}
+
+    assert 'X-Profile-Samples' not in client.get('/_slow').headers
+    assert client.get('/admin/profiles').status_code == 404
+    assert client.get('/admin/profiles', headers={'X-Gamecon-Profile': 'wrong'}).status_code == 404
+
+    response = client.get('/_slow', headers=headers)
+    assert int(response.headers['X-Profile-Samples']) > 0
+    assert client.get('/admin/profiles', headers=headers).get_json()['samples']['slow'] > 0
+
+    collapsed = client.get('/admin/profiles/slow', headers=headers).get_data(as_text=True)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in collapsed.splitlines())
+    assert any('test_basic.py:busy_for_a_while' in line for line in collapsed.splitlines())
+    assert (tmp_path / f'slow.{os.getpid()}.collapsed').read_text() == collapsed
+
+    assert client.delete('/admin/profiles', headers=headers).status_code == 204
+    assert client.get('/admin/profiles/slow', headers=headers).status_code == 404
+
+
+def test_synthetic_games_and_scale_report(tmp_path):
+    """Generated games follow the requested size and image mix; the scale report measures each size"""
+    from app import create_app
+    from models import Game
+    from synthetic import generate_games, parse_sizes
+    from scale_report import run_scale_report, exponents_over
+
+    assert parse_sizes('20k, 1m,512') == [20 * 1024, 1024 * 1024, 512]
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'BLOB_STORE_PATH': str(tmp_path),
+        'IMAGE_JOB_WORKERS': 0,
+        'TESTING': True
+    })
+    with app.app_context():
+        result = generate_games(300, app.blob_store, image_fraction=0.5, image_sizes=(8 * 1024,), seed=1,
+                                batch_size=100)
+        assert result['games_generated'] == Game.query.count() == 300
+        assert 100 < result['games_with_images'] < 200
+        image = Game.query.filter(Game.image_hash.isnot(None)).first()
+        assert abs(image.image_size - 8 * 1024) < 8 * 1024 * 0.2
+        assert app.blob_store.get(image.image_hash)[:3] == b'\xff\xd8\xff'  # JPEG
+
+        grown = []
+        report = run_scale_report(
+            app, [300, 600], lambda count: grown.append(count) or generate_games(count, app.blob_store, seed=2),
+            repeat=2, routes=(('home', 'GET', '/'), ('game', 'GET', '/games/{id}'))
+        )
+    assert grown == [300]
+    assert list(report['sizes']) == ['300', '600']
+    home = report['sizes']['600']['home']
+    assert home['status'] == 200 and home['response_bytes'] > 0 and home['db_query_count'] >= 1
+    assert set(report['growth_exponents']) == {'home', 'game'}
+    assert exponents_over(report, 100) == []
+
+
+def test_scale_report_command(tmp_path):
+    """The scale-report CLI grows the catalogue and writes the JSON report"""
+    import json
+    from app import create_app
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'BLOB_STORE_PATH': str(tmp_path / 'blobs'),
+        'IMAGE_JOB_WORKERS': 0
+    })
+    output = tmp_path / 'report.json'
+    result = app.test_cli_runner().invoke(args=['scale-report', '--sizes', '20,40', '--repeat', '1',
+                                                '--image-fraction', '0', '--output', str(output)])
+    assert result.exit_code == 0, result.output
+    assert 'Measured 40 rows' in result.output
+    report = json.loads(output.read_text())
+    assert list(report['sizes']) == ['20', '40']
+    assert report['sizes']['40']['home']['log_bytes'] >= 0
+
+
+def test_cursor_with_wrong_value_types_is_rejected():
+    """Cursors whose values are not (str title, int id) are a 400, not a database error"""
+    from app import create_app
+    from pagination import InvalidCursor, decode_cursor, encode_cursor
+    import pytest
+
+    assert decode_cursor(encode_cursor(['Halo', 3]), (str, int)) == ['Halo', 3]
+    for values in ([[1], {'a': 1}], ['Halo', True], ['Halo', '3'], [3, 'Halo'], ['Halo', 3.5]):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(encode_cursor(values), (str, int))
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0, 'TESTING': True})
+    client = app.test_client()
+    crafted = encode_cursor([[1], {'a': 1}])
+    for path in ('/', '/games/search', '/api/v1/games'):
+        assert client.get(path, query_string={'after': crafted}).status_code == 400
+        assert client.get(path, query_string={'before': crafted}).status_code == 400
+
+def test_search_indexes_skip_trigram_without_extension_privilege():
+    """Test that a role that may not create pg_trgm gets no trigram index instead of a startup failure"""
+    from unittest.mock import MagicMock
+    from sqlalchemy.exc import ProgrammingError
+    from search import install_search_indexes
+
+    engine = MagicMock()
+    engine.dialect.name = 'postgresql'
+    conn = engine.begin.return_value.__enter__.return_value
+    conn.execute.side_effect = ProgrammingError('CREATE EXTENSION', {}, Exception('permission denied'))
+
+    assert install_search_indexes(engine) == []
+    assert conn.execute.call_count == 1
+
+def test_api_rejects_blank_image_url():
+    """Test that the API keeps rejecting a blank image_url that the bulk importer reads as no image"""
+    from models import validate_game
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0})
+    client = app.test_client()
+
+    response = client.post('/api/v1/games', json=[{'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox',
+                                                   'image_url': ' '}])
+    result = response.get_json()['results'][0]
+    assert result['status'] == 'error'
+    assert "'image_url' must be a non-empty string" in result['error']
+
+    row = {'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox', 'image_url': ''}
+    assert validate_game(row, lenient=True) == ({'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'}, None, None)
+
+def test_store_image_blob_rewrites_existing_key(tmp_path):
+    """Test that storing an image writes the blob even when the key looked present a moment ago"""
+    from app import create_app
+    from routes import store_image_blob
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'BLOB_STORE_PATH': str(tmp_path),
+                      'IMAGE_JOB_WORKERS': 0})
+    with app.app_context():
+        # A release deleted the blob after the existence check would have passed
+        with patch.object(app.blob_store, 'exists', return_value=True):
+            image_hash, size = store_image_blob(b'image-bytes', 'image/png')
+        assert app.blob_store.get(image_hash) == b'image-bytes'
+        assert size == len(b'image-bytes')
+
+def test_setup_logging_closes_replaced_handlers(monkeypatch):
+    """Re-running setup_logging closes the previous batching handler instead of leaking its writer thread"""
+    import logging
+    from app import setup_logging
+    from log_pipeline import BatchingQueueHandler
+
+    monkeypatch.setenv('LOG_ASYNC', 'true')
+    setup_logging()
+    first = logging.getLogger().handlers[0]
+    assert isinstance(first, BatchingQueueHandler)
+    logging.getLogger('test').warning("queued before the reset")
+    writer = first._writer
+
+    monkeypatch.setenv('LOG_ASYNC', 'false')
+    setup_logging()
+    assert first not in logging.getLogger().handlers
+    assert writer is None or not writer.is_alive()
+    assert not first._queue
+
+def test_import_source_leaves_stdin_open():
+    """Reading an import from '-' does not close the process's stdin"""
+    import io
+    from bulk_import import open_import_source
+
+    stdin = io.StringIO('title,genre,platform\nHalo,Shooter,Xbox\n')
+    with patch('sys.stdin', stdin):
+        with open_import_source('-') as stream:
+            assert stream.readline() == 'title,genre,platform\n'
+    assert not stdin.closed
+
+def test_request_logs_carry_catalogue_count_not_names():
+    """Per-request logs report the game count and catalogue version instead of every title"""
+    import logging
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'IMAGE_JOB_WORKERS': 0})
+    client = app.test_client()
+    client.post('/games/new', data={'title': 'Halo', 'genre': 'Shooter', 'platform': 'Xbox'})
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logging.getLogger('app').addHandler(handler)
+    try:
+        client.get('/')
+    finally:
+        logging.getLogger('app').removeHandler(handler)
+
+    completed = [record for record in records if record.getMessage() == 'Request completed'][0]
+    assert completed.extra_fields['app_state_after_request'] == {
+        'total_games': 1, 'catalogue_version': app.games_summary.version
+    }